@@ -0,0 +1,269 @@
+"""
+HTTP load benchmark for the sweet shop API.
+
+Run from the `server` directory:
+
+    python -m benchmarks.load --transport asgi --requests 500 --concurrency 50
+    python -m benchmarks.load --transport uvicorn --mongo memory --output run.json
+
+Transports:
+    asgi     Drives the app in-process through `httpx.ASGITransport`, like the tests.
+    uvicorn  Starts a real uvicorn server on a free local port and uses HTTP.
+
+MongoDB:
+    local    Uses `MONGO_URI` with a dedicated benchmark database (dropped before
+             and after the run).
+    memory   Uses `mongomock_motor` as an in-memory Motor stand-in. It is not a
+             project dependency and must be installed separately; numbers only
+             reflect the app's own overhead.
+
+Each scenario sends `--requests` requests with at most `--concurrency` in flight
+and reports throughput and p50/p95/p99 latency. Failed requests, including ones
+that raise, are counted in `errors` instead of stopping the run. The report is printed as JSON
+(or written to `--output`) together with the git commit, so runs can be compared
+between commits.
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import time
+import uuid
+from typing import Optional
+from contextlib import asynccontextmanager
+from httpx import AsyncClient, ASGITransport
+from asgi_lifespan import LifespanManager
+import uvicorn
+from src.main import app
+from src.utils import db
+from src.utils.env import env_settings
+from src.utils.rate_limit import auth_rate_limiter
+
+SCENARIOS = ["register", "login", "list", "search", "purchase", "restock"]
+ADMIN = {"username": "Bench", "email": "bench@example.com", "password": "Bench123"}
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(
+    latencies: list[float], statuses: list[Optional[int]], elapsed: float
+) -> dict:
+    """
+    Builds the report of one scenario. Latencies are in seconds, and a None status
+    is a request that raised instead of returning a response.
+    """
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for code in statuses if code is None or code >= 400),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+    }
+
+
+def git_commit() -> str:
+    """Returns the current commit hash, or "unknown" outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def use_memory_mongo():
+    """Makes `init_db` use an in-memory Motor stand-in instead of a real server."""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--mongo memory requires `pip install mongomock-motor`")
+
+    from mongomock.collection import BulkOperationBuilder
+
+    # pymongo's bulk_write passes `sort=None` to every update, which mongomock
+    # does not accept yet.
+    add_update = BulkOperationBuilder.add_update
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        if sort is not None:
+            raise NotImplementedError("mongomock cannot sort bulk updates")
+        return add_update(self, *args, **kwargs)
+
+    BulkOperationBuilder.add_update = add_update_without_sort
+
+    mock_client = AsyncMongoMockClient()
+    db.AsyncIOMotorClient = lambda *args, **kwargs: mock_client
+
+
+async def drop_database(name: str):
+    """Drops the benchmark database before the app starts on it."""
+    client = db.AsyncIOMotorClient(env_settings.MONGO_URI)
+    await client.drop_database(name)
+    client.close()
+
+
+@asynccontextmanager
+async def open_client(transport: str):
+    """Starts the app with its lifespan and yields an HTTP client pointed at it."""
+    if transport == "asgi":
+        async with LifespanManager(app) as manager:
+            async with AsyncClient(
+                transport=ASGITransport(app=manager.app, raise_app_exceptions=False),
+                base_url="http://bench",
+            ) as client:
+                yield client
+        return
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        async with AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            yield client
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def run_scenario(make_request, requests: int, concurrency: int) -> dict:
+    """Sends `requests` requests built by `make_request(i)`, `concurrency` at a time."""
+    latencies, statuses = [], []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                status_code = (await make_request(i)).status_code
+            except Exception:
+                status_code = None
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, requests))])
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+async def seed(client, catalog: int) -> tuple[dict, list[str]]:
+    """Creates the admin user, a category and `catalog` sweets."""
+    await client.post("/api/auth/register", json={**ADMIN, "is_admin": True})
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": ADMIN["email"], "password": ADMIN["password"]},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+
+    await client.post("/api/sweets/categories", json={"name": "Bench"}, headers=headers)
+    rows = "\n".join(
+        json.dumps(
+            {
+                "name": f"Bench Sweet {i}",
+                "category": "Bench",
+                "price": 10 + i % 50,
+                "quantity": 1_000_000,
+            }
+        )
+        for i in range(catalog)
+    )
+    await client.post(
+        "/api/sweets/bulk",
+        content=rows.encode(),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    response = await client.get("/api/sweets", headers=headers)
+    sweet_ids = [sweet["id"] for sweet in response.json()["data"]]
+    return headers, sweet_ids
+
+
+async def main(args):
+    if args.mongo == "memory":
+        use_memory_mongo()
+    env_settings.MONGO_DB = args.db
+    # Every scenario runs from one client, far past the auth rate limits.
+    auth_rate_limiter.enabled = False
+
+    report = {
+        "commit": git_commit(),
+        "transport": args.transport,
+        "mongo": args.mongo,
+        "catalog": args.catalog,
+        "concurrency": args.concurrency,
+        "scenarios": {},
+    }
+    # Dropped before the app starts, so its lifespan builds the indexes.
+    await drop_database(args.db)
+    async with open_client(args.transport) as client:
+        headers, sweet_ids = await seed(client, args.catalog)
+        login = {"email": ADMIN["email"], "password": ADMIN["password"]}
+        run_id = uuid.uuid4().hex[:8]
+
+        requests = {
+            "register": lambda i: client.post(
+                "/api/auth/register",
+                json={
+                    "username": "Bench",
+                    "email": f"bench-{run_id}-{i}@example.com",
+                    "password": ADMIN["password"],
+                },
+            ),
+            "login": lambda i: client.post("/api/auth/login", json=login),
+            "list": lambda i: client.get("/api/sweets", headers=headers),
+            "search": lambda i: client.get(
+                f"/api/sweets/search?name=sweet {i % 100}&maxPrice=40",
+                headers=headers,
+            ),
+            "purchase": lambda i: client.post(
+                f"/api/sweets/{sweet_ids[i % len(sweet_ids)]}/purchase",
+                json={"quantity": 1},
+                headers=headers,
+            ),
+            "restock": lambda i: client.post(
+                f"/api/sweets/{sweet_ids[i % len(sweet_ids)]}/restock",
+                json={"quantity": 1},
+                headers=headers,
+            ),
+        }
+        for name in args.scenarios:
+            report["scenarios"][name] = await run_scenario(
+                requests[name], args.requests, args.concurrency
+            )
+
+        await db.get_client().drop_database(args.db)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--mongo", choices=["local", "memory"], default="local")
+    parser.add_argument("--db", default="sweet_shop_bench")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--catalog", type=int, default=1000)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    asyncio.run(main(parser.parse_args()))
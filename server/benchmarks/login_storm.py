@@ -0,0 +1,91 @@
+"""
+Measures `GET /api/sweets` latency while a storm of logins is running.
+
+Run from the `server` directory against a local MongoDB:
+
+    python -m benchmarks.login_storm --logins 200 --samples 50
+
+The result is printed as JSON. With bcrypt running on the worker pool the
+`during_storm` latencies should stay close to the `baseline` ones.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from src.utils.db import init_db
+from src.models import UserModel
+from src.utils.rate_limit import auth_rate_limiter
+
+EMAIL = "benchmark@example.com"
+PASSWORD = "Benchmark123"
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Returns p50/p95/max of a list of latencies, in milliseconds."""
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+async def sample_list_latency(client, token, samples):
+    """Times `samples` sequential list requests."""
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = await client.get("/api/sweets", headers={"Authorization": token})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main(logins: int, samples: int):
+    # The storm is one client logging in far past the auth rate limits.
+    auth_rate_limiter.enabled = False
+    await init_db()
+    await UserModel.find(UserModel.email == EMAIL).delete()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post(
+            "/api/auth/register",
+            json={"username": "Bench", "email": EMAIL, "password": PASSWORD},
+        )
+        login = {"email": EMAIL, "password": PASSWORD}
+        response = await client.post("/api/auth/login", json=login)
+        token = f"Bearer {response.json()['data']['token']}"
+
+        baseline = await sample_list_latency(client, token, samples)
+
+        storm = asyncio.gather(
+            *[client.post("/api/auth/login", json=login) for _ in range(logins)]
+        )
+        during_storm = await sample_list_latency(client, token, samples)
+        results = await storm
+
+    await UserModel.find(UserModel.email == EMAIL).delete()
+    print(
+        json.dumps(
+            {
+                "logins": logins,
+                "login_status_codes": sorted({r.status_code for r in results}),
+                "baseline": summarize(baseline),
+                "during_storm": summarize(during_storm),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.samples))
@@ -0,0 +1,86 @@
+"""
+Compares the cost of serializing sweet listings before and after `fast_response`.
+
+Run from the `server` directory (no database needed):
+
+    python -m benchmarks.serialization --rows 10000 --repeat 20
+
+`response_model` mirrors what FastAPI does when a route returns a `ResponseData`
+with `response_model=ResponseData`: dump the model, validate it against the
+response model, dump it again in JSON mode and encode it with `json`.
+`fast_response` is the orjson path used by the listing routes.
+"""
+
+import argparse
+import json
+import time
+from pydantic import TypeAdapter
+from src.schemas.response import ResponseData, fast_response
+from src.schemas.sweets import CategoryRow, SweetRow
+
+
+def build_rows(count: int) -> list[SweetRow]:
+    """Builds `count` listing rows shaped like `serialize_sweets` output."""
+    return [
+        SweetRow(
+            id=f"{i:024x}",
+            name=f"Sweet {i}",
+            category=CategoryRow(id=f"{i % 20:024x}", name=f"Category {i % 20}"),
+            price=10.5 + i,
+            quantity=i % 100,
+        )
+        for i in range(count)
+    ]
+
+
+def response_model_path(rows: list[SweetRow]) -> bytes:
+    """Serializes rows the way FastAPI does for `response_model=ResponseData`."""
+    adapter = TypeAdapter(ResponseData)
+    content = ResponseData(status="success", data=rows).model_dump()
+    validated = adapter.validate_python(content)
+    payload = adapter.dump_python(validated, mode="json")
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_path(rows: list[SweetRow]) -> bytes:
+    """Serializes rows through `fast_response`."""
+    return fast_response(rows).body
+
+
+def measure(func, rows, repeat: int) -> float:
+    """Returns the best time of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(count: int, repeat: int):
+    rows = build_rows(count)
+    assert json.loads(response_model_path(rows)) == json.loads(fast_path(rows))
+
+    before = measure(response_model_path, rows, repeat)
+    after = measure(fast_path, rows, repeat)
+    print(
+        json.dumps(
+            {
+                "rows": count,
+                "response_model_ms": round(before, 2),
+                "fast_response_ms": round(after, 2),
+                "speedup": round(before / after, 1),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
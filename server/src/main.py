@@ -1,8 +1,20 @@
 from fastapi import FastAPI
-from .utils.db import init_db
+from fastapi.responses import ORJSONResponse
+from .utils.db import init_db, close_db
+from .utils.category_cache import category_cache
+from .utils.metrics import metrics_middleware
+from .utils.stock_events import stock_broadcaster
+from .utils.reservations import reservation_sweeper
+from .utils.expiry import expiry_sweeper
+from .utils.invalidation import invalidation_bus
+from .models import SweetModel, InvalidationModel
 from contextlib import asynccontextmanager
 from .routes.auth import auth_router
 from .routes.sweets import sweet_router
+from .routes.health import health_router
+from .routes.metrics import metrics_router
+from .routes.reservations import reservation_router
+from .routes.reports import report_router
 
 
 @asynccontextmanager
@@ -18,12 +30,28 @@ async def lifespan(app: FastAPI):
     """
     await init_db()
     print("📦 Beanie initialized with MongoDB.")
+    await category_cache.warm()
+    print(f"🗂️ Category cache warmed with {category_cache.stats()['size']} categories.")
+    await invalidation_bus.start(InvalidationModel.get_pymongo_collection())
+    stock_broadcaster.start(SweetModel.get_pymongo_collection())
+    reservation_sweeper.start()
+    expiry_sweeper.start()
     yield
     print("👋 App is shutting down...")
+    await expiry_sweeper.stop()
+    await reservation_sweeper.stop()
+    await stock_broadcaster.stop()
+    await invalidation_bus.stop()
+    await close_db()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.middleware("http")(metrics_middleware)
 
 # NOTE - Auth router
 app.include_router(auth_router)
 app.include_router(sweet_router)
+app.include_router(reservation_router)
+app.include_router(report_router)
+app.include_router(health_router)
+app.include_router(metrics_router)
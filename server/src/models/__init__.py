@@ -1,3 +1,9 @@
 from .users import UserModel
 from .category import CategoryModel
 from .sweets import SweetModel
+from .reservation import ReservationModel
+from .sales import SaleModel, DailySalesModel
+from .rate_limit import RateLimitModel
+from .invalidation import InvalidationModel
+from .idempotency import IdempotencyModel
+from .catalog_version import CatalogVersionModel
@@ -0,0 +1,25 @@
+from beanie import Document
+
+
+class CatalogVersionModel(Document):
+    """Catalog Version Model, the shared version of one kind of listed data.
+
+    Only written when `INVALIDATION_BUS` is "change_stream". Every worker tags
+    its listings with these versions, so a listing has the same ETag whichever
+    worker serves it.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        id (str): The kind of data, e.g. "sweets" or "categories".
+        version (int): Bumped on every change, and never below the time of the
+            change in milliseconds, so versions never repeat even if the
+            collection is dropped.
+    """
+
+    id: str
+    version: int = 0
+
+    class Settings:
+        name = "catalog_versions"
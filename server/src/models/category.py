@@ -1,5 +1,6 @@
 from beanie import Document
 from pydantic import Field
+from pymongo import ASCENDING, IndexModel
 
 
 class CategoryModel(Document):
@@ -12,7 +13,10 @@ class CategoryModel(Document):
         name (str): The name of the category, Unique and not longer then 30 characters.
     """
 
-    name: str = Field(..., max_length=30, json_schema_extra={"unique": "True"})
+    name: str = Field(..., max_length=30)
 
     class Settings:
         name = "categories"
+        indexes = [
+            IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+        ]
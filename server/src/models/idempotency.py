@@ -0,0 +1,49 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Any, Optional
+import datetime
+
+# Seconds a completed request is remembered; retries after that run again.
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+
+
+class IdempotencyModel(Document):
+    """Idempotency Model, the outcome of a request sent with an `Idempotency-Key`.
+
+    The record is inserted before the request runs, which claims the key, and
+    completed with the response once it ran. Retries with the same key get the
+    stored response instead of running the request again. A claim that is never
+    completed, because its worker died, is taken over once its lease runs out.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        id (str): Digest of the user, the route and the key.
+        fingerprint (str): Digest of the request body, to refuse a reused key.
+        status_code (Optional[int]): The response status, None while running.
+        body (Optional[Any]): The JSON response body, None while running.
+        created_at (datetime.datetime): When the key was first used (UTC).
+        claimed_at (Optional[datetime.datetime]): When the running request
+            claimed the key (UTC).
+    """
+
+    id: str
+    fingerprint: str
+    status_code: Optional[int] = None
+    body: Optional[Any] = None
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+    claimed_at: Optional[datetime.datetime] = None
+
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            IndexModel(
+                [("created_at", ASCENDING)],
+                name="created_at_ttl",
+                expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS,
+            ),
+        ]
@@ -0,0 +1,45 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Optional
+import datetime
+
+# Seconds an invalidation message is kept. Workers read messages from the change
+# stream as they are inserted, so the documents only need to outlive a restart.
+INVALIDATION_TTL_SECONDS = 60 * 60
+
+
+class InvalidationModel(Document):
+    """Invalidation Model, one message of the cross-worker invalidation bus.
+
+    Only written when `INVALIDATION_BUS` is "change_stream". Every worker watches
+    the collection and drops the cached data named by the messages of the others.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        kind (str): The kind of data that changed, e.g. "sweets" or "categories".
+        key (Optional[str]): The changed document, None when unknown.
+        origin (str): The worker that made the change.
+        version (Optional[int]): The new shared catalog version of the kind.
+        created_at (datetime.datetime): When the message was sent (UTC).
+    """
+
+    kind: str
+    key: Optional[str] = None
+    origin: str
+    version: Optional[int] = None
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+
+    class Settings:
+        name = "invalidations"
+        indexes = [
+            IndexModel(
+                [("created_at", ASCENDING)],
+                name="created_at_ttl",
+                expireAfterSeconds=INVALIDATION_TTL_SECONDS,
+            ),
+        ]
@@ -0,0 +1,37 @@
+from beanie import Document
+from pymongo import ASCENDING, IndexModel
+import datetime
+
+
+class RateLimitModel(Document):
+    """Rate Limit Model holding one token bucket of the shared rate limiter.
+
+    Only used when `RATE_LIMIT_BACKEND` is "mongo", so that every worker draws
+    from the same buckets. Buckets are deleted by MongoDB once they are sure to be
+    full again, since a missing bucket starts full.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        id (str): The bucket key, e.g. "login:ip:203.0.113.7".
+        tokens (float): Requests left in the bucket at `updated_at`.
+        updated_at (datetime.datetime): When the bucket was last drawn from.
+        expires_at (datetime.datetime): One limit period after `updated_at`, when
+            the bucket is full whatever it held.
+    """
+
+    id: str
+    tokens: float
+    updated_at: datetime.datetime
+    expires_at: datetime.datetime
+
+    class Settings:
+        name = "rate_limits"
+        indexes = [
+            IndexModel(
+                [("expires_at", ASCENDING)],
+                name="expires_at_ttl",
+                expireAfterSeconds=0,
+            ),
+        ]
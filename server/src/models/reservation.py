@@ -0,0 +1,48 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Optional
+import datetime
+
+# Seconds a reservation is kept after expiring before MongoDB deletes it. The
+# sweeper returns held stock long before that; the TTL index only removes
+# reservations a crashed sweeper left behind.
+RESERVATION_TTL_GRACE_SECONDS = 24 * 60 * 60
+
+
+class ReservationModel(Document):
+    """Reservation Model that holds stock of a sweet for a user during checkout.
+
+    The held quantity is taken off the sweet's `quantity` when the reservation is
+    made, so the available quantity is always the sweet's own `quantity`.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        sweet_id (PydanticObjectId): The reserved sweet.
+        user (str): Email of the user holding the reservation.
+        quantity (int): The held quantity, Greater then 0.
+        expires_at (datetime.datetime): When the held stock goes back on sale.
+        claim (Optional[str]): Set by the expiry sweeper while it returns the stock.
+        claimed_at (Optional[datetime.datetime]): When the sweeper claimed it; a
+            claim left this long by a crashed sweep is taken over.
+    """
+
+    sweet_id: PydanticObjectId
+    user: str
+    quantity: int = Field(..., gt=0)
+    expires_at: datetime.datetime
+    claim: Optional[str] = None
+    claimed_at: Optional[datetime.datetime] = None
+
+    class Settings:
+        name = "reservations"
+        indexes = [
+            IndexModel(
+                [("expires_at", ASCENDING)],
+                name="expires_at_ttl",
+                expireAfterSeconds=RESERVATION_TTL_GRACE_SECONDS,
+            ),
+            IndexModel([("claim", ASCENDING)], name="claim"),
+        ]
@@ -0,0 +1,84 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Literal, Optional
+import datetime
+
+
+class SaleModel(Document):
+    """Sale Model, one append-only ledger entry per purchase or restock.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        sweet_id (PydanticObjectId): The sweet whose stock moved.
+        category_id (Optional[PydanticObjectId]): The category of the sweet.
+        kind (str): "purchase" or "restock".
+        quantity (int): The quantity sold or restocked, Greater then 0.
+        unit_price (float): The price of the sweet at that moment.
+        user (str): Email of the user who made the change.
+        created_at (datetime.datetime): When the stock moved (UTC).
+    """
+
+    sweet_id: PydanticObjectId
+    category_id: Optional[PydanticObjectId] = None
+    kind: Literal["purchase", "restock"]
+    quantity: int = Field(..., gt=0)
+    unit_price: float
+    user: str
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+
+    class Settings:
+        name = "sales"
+        indexes = [
+            IndexModel(
+                [("sweet_id", ASCENDING), ("created_at", ASCENDING)],
+                name="sweet_created_at",
+            ),
+        ]
+
+
+class DailySalesModel(Document):
+    """Daily Sales Model, the sales of one day rolled up for the shop, a category
+    or a sweet.
+
+    Rollups are only ever changed with `$inc` upserts as sales are recorded, so
+    reports read one document per day instead of every sale.
+
+    Inherits from:
+        Document (Beanie): Enables asynchronous ODM features with MongoDB.
+
+    Attributes:
+        scope (str): "shop", "category" or "sweet".
+        key (Optional[PydanticObjectId]): The category or sweet ID, None for the shop.
+        day (str): The UTC day, as YYYY-MM-DD.
+        orders (int): Number of purchases.
+        units_sold (int): Quantity purchased.
+        revenue (float): Sum of quantity times unit price of the purchases.
+        units_restocked (int): Quantity restocked.
+    """
+
+    scope: Literal["shop", "category", "sweet"]
+    key: Optional[PydanticObjectId] = None
+    day: str
+    orders: int = 0
+    units_sold: int = 0
+    revenue: float = 0
+    units_restocked: int = 0
+
+    class Settings:
+        name = "daily_sales"
+        indexes = [
+            IndexModel(
+                [("scope", ASCENDING), ("key", ASCENDING), ("day", ASCENDING)],
+                name="scope_key_day",
+                unique=True,
+            ),
+            IndexModel(
+                [("scope", ASCENDING), ("day", ASCENDING)],
+                name="scope_day",
+            ),
+        ]
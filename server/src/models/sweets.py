@@ -1,7 +1,10 @@
-from beanie import Document, Link
+from beanie import Document, Link, Insert, Replace, Save, before_event
 from pydantic import Field
 from .category import CategoryModel
+from ..utils.clock import utc_today
+from ..utils.search import name_grams
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 import datetime
 
 
@@ -16,16 +19,55 @@ class SweetModel(Document):
         category (Category): The link between the sweet and category, The category of the sweets.
         price (int): The price of the sweets, Greater then 0.
         quantity (int): The remaining quantity of the sweets, Greater then 0.
+            Stock held by reservations is not included.
+        reserved (int): The quantity currently held by reservations.
+        expiry_date (datetime.date): The last day the sweet may be sold.
+        expired (bool): Whether the expiry date has passed. Set on every write and
+            by the expiry sweeper; expired sweets are hidden and cannot be bought.
+        search_grams (list[str]): N-grams of the name used by the name search index,
+            kept in sync on every write and never returned by the API.
+        released_claims (list[str]): The latest reservation sweeps that returned
+            stock to the sweet, so a sweep that is retried never returns it twice.
+            Never returned by the API.
     """
 
     name: str = Field(..., max_length=50)
     category: Link[CategoryModel]
     price: float = Field(..., ge=0)
     quantity: int = Field(..., ge=0)
+    reserved: int = Field(0, ge=0)
     expiry_date: datetime.date = Field(...)
+    expired: bool = False
+    search_grams: list[str] = Field(default_factory=list, exclude=True)
+    released_claims: list[str] = Field(default_factory=list, exclude=True)
+
+    @before_event(Insert, Replace, Save)
+    def update_search_grams(self):
+        """Recomputes the name search n-grams before the sweet is written."""
+        self.search_grams = name_grams(self.name)
+
+    @before_event(Insert, Replace, Save)
+    def update_expired(self):
+        """Flags the sweet as expired if it is written after its expiry date."""
+        self.expired = self.expiry_date < utc_today()
 
     class Settings:
         name = "sweets"
+        indexes = [
+            IndexModel(
+                [("category.$id", ASCENDING), ("price", ASCENDING)],
+                name="category_price",
+            ),
+            # Price-only searches, which category_price cannot serve.
+            IndexModel([("price", ASCENDING)], name="price"),
+            IndexModel([("quantity", ASCENDING)], name="quantity"),
+            IndexModel([("expiry_date", ASCENDING)], name="expiry_date"),
+            IndexModel(
+                [("expired", ASCENDING), ("expiry_date", ASCENDING)],
+                name="expired_expiry_date",
+            ),
+            IndexModel([("search_grams", ASCENDING)], name="search_grams"),
+        ]
 
     class Config:
         json_encoders = {ObjectId: str}
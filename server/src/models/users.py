@@ -1,5 +1,6 @@
 from beanie import Document
 from pydantic import Field, EmailStr
+from pymongo import ASCENDING, IndexModel
 
 
 class UserModel(Document):
@@ -16,9 +17,12 @@ class UserModel(Document):
     """
 
     username: str = Field(..., max_length=50)
-    email: EmailStr = Field(..., json_schema_extra={"unique": "True"})
+    email: EmailStr = Field(...)
     password: str = Field(...)
     is_admin: bool = False
 
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        ]
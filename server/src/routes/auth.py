@@ -1,8 +1,10 @@
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Request
+from pymongo.errors import DuplicateKeyError
 from ..models import UserModel
 from ..schemas.user_login import UserLogin
 from ..utils.auth import create_access_token
-from ..utils.password import hash_password, verify_password
+from ..utils.rate_limit import auth_rate_limiter
+from ..utils.password import hash_password_async, verify_and_update_password_async
 from datetime import timedelta
 from ..utils.env import env_settings
 from ..schemas.response import ResponseData
@@ -13,24 +15,31 @@ auth_router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 # NOTE: Auth routes
 @auth_router.post("/register", response_model=ResponseData[None])
-async def register_user(user: UserModel):
+async def register_user(user: UserModel, request: Request):
     """
     Registers a new user.
 
+    Attempts are rate limited per client IP and per email before any lookup or
+    hashing, see `auth_rate_limiter`.
+
     Args:
         user (UserModel): The user information from the request body.
+        request (Request): The incoming request, used to identify the client.
 
     Raises:
-        HTTPException: If the email is already registered.
+        HTTPException: If the email is already registered, or 429 when too many
+            attempts were made.
 
     Returns:
         ResponseData[None]: Standard success message.
     """
+    await auth_rate_limiter.check("register", request, user.email)
+
     existing_user = await UserModel.find_one(UserModel.email == user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="User already registered")
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
 
     user_doc = UserModel(
         username=user.username,
@@ -38,31 +47,48 @@ async def register_user(user: UserModel):
         password=hashed_pw,
         is_admin=user.is_admin if user.is_admin else False,
     )
-    await user_doc.insert()
+    try:
+        await user_doc.insert()
+    except DuplicateKeyError:
+        # A concurrent registration with the same email won the unique index.
+        raise HTTPException(status_code=400, detail="User already registered")
 
     return ResponseData(status="success", message="User successfully registered")
 
 
 @auth_router.post("/login", response_model=ResponseData[Token])
-async def login_user(user: UserLogin):
+async def login_user(user: UserLogin, request: Request):
     """
     Authenticates a user and returns a JWT access token.
 
+    If the stored hash was made with a different bcrypt cost than the one
+    configured, it is transparently replaced with a fresh hash. Attempts are rate
+    limited per client IP and per email before any lookup or hashing.
+
     Args:
         user (UserLogin): Email and password credentials from request body.
+        request (Request): The incoming request, used to identify the client.
 
     Raises:
-        HTTPException: If user does not exist or password is incorrect.
+        HTTPException: If user does not exist or password is incorrect, or 429
+            when too many attempts were made.
 
     Returns:
         ResponseData[Token]: Success response with JWT token and role.
     """
+    await auth_rate_limiter.check("login", request, user.email)
+
     stored_user = await UserModel.find_one(UserModel.email == user.email)
     if not stored_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_password(user.password, stored_user.password):
+    is_valid, new_hash = await verify_and_update_password_async(
+        user.password, stored_user.password
+    )
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Incorrect password")
+    if new_hash:
+        await stored_user.set({UserModel.password: new_hash})
 
     token_data = {
         "sub": user.email,
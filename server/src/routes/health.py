@@ -0,0 +1,50 @@
+from fastapi import APIRouter, status
+import asyncio
+from fastapi.responses import ORJSONResponse
+from ..schemas.response import ResponseData
+from ..utils.db import get_client
+from ..utils.env import env_settings
+from ..utils.pool_monitor import pool_monitor
+
+health_router = APIRouter(prefix="/api/health", tags=["Health"])
+
+# Seconds to wait for the ping, so a readiness probe never hangs on
+# server selection.
+PING_TIMEOUT = 2
+
+
+@health_router.get("/ready", response_model=ResponseData)
+async def readiness():
+    """
+    Report whether the app can serve requests, with connection pool usage.
+
+    The database is pinged through the managed client. Pool counters show how
+    many connections are checked out and how many operations wait for one, which
+    is what to watch when tuning the worker count against `MONGO_MAX_POOL_SIZE`.
+
+    Returns:
+        ResponseData: The pool statistics, with status 503 if MongoDB is unreachable.
+    """
+    pool = pool_monitor.stats(env_settings.MONGO_MAX_POOL_SIZE)
+    client = get_client()
+    if client is None:
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=ResponseData(
+                status="fail", data={"pool": pool}, message="Database not initialized"
+            ).model_dump(),
+        )
+
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), PING_TIMEOUT)
+    except Exception as exc:
+        # The probe is unauthenticated; driver errors name hosts and replica sets.
+        print(f"⚠️ Readiness ping failed: {exc!r}")
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=ResponseData(
+                status="fail", data={"pool": pool}, message="Database unavailable"
+            ).model_dump(),
+        )
+
+    return ResponseData(status="success", data={"pool": pool})
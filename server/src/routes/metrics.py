@@ -0,0 +1,76 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..utils.category_cache import category_cache
+from ..utils.env import env_settings
+from ..utils.idempotency import idempotency_store
+from ..utils.metrics import Gauge, registry
+from ..utils.invalidation import invalidation_bus
+from ..utils.pool_monitor import pool_monitor
+from ..utils.rate_limit import auth_rate_limiter
+from ..utils.stock import purchase_coalescer
+from ..utils.stock_events import stock_broadcaster
+from ..utils.token_cache import token_cache
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+def stats_gauge(name: str, documentation: str, stats: dict) -> Gauge:
+    """Builds a gauge with one `stat` labelled sample per entry of a stats dict."""
+    gauge = Gauge(name, documentation, ["stat"])
+    for stat, value in stats.items():
+        gauge.inc(stat, amount=value)
+    return gauge
+
+
+def collect_component_stats():
+    """Exports the counters kept by the caches and the connection pool monitor."""
+    return [
+        stats_gauge(
+            "category_cache", "Category cache counters.", category_cache.stats()
+        ),
+        stats_gauge("token_cache", "Verified JWT cache counters.", token_cache.stats()),
+        stats_gauge(
+            "mongo_pool",
+            "MongoDB connection pool usage.",
+            pool_monitor.stats(env_settings.MONGO_MAX_POOL_SIZE),
+        ),
+        stats_gauge(
+            "stock_events", "Stock event stream counters.", stock_broadcaster.stats()
+        ),
+        stats_gauge(
+            "purchase_coalescer",
+            "Coalesced purchase intents and batch writes.",
+            purchase_coalescer.stats(),
+        ),
+        stats_gauge(
+            "invalidation_bus",
+            "Cross-worker invalidation counters.",
+            invalidation_bus.stats(),
+        ),
+        stats_gauge(
+            "auth_rate_limit", "Auth rate limiter counters.", auth_rate_limiter.stats()
+        ),
+        stats_gauge(
+            "idempotency", "Idempotency key counters.", idempotency_store.stats()
+        ),
+    ]
+
+
+registry.add_collector(collect_component_stats)
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expose the app metrics in Prometheus text format.
+
+    Includes per-route request counts and latency histograms, in-flight requests,
+    MongoDB command counts and durations per collection and command, and the
+    cache and connection pool counters.
+
+    Returns:
+        PlainTextResponse: The metrics, one sample per line.
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
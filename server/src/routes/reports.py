@@ -0,0 +1,105 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal, Optional
+from bson import ObjectId
+from ..models import SweetModel
+from ..schemas.response import ResponseData
+from ..utils.auth import get_admin_user
+from ..utils.category_cache import category_cache
+from ..utils.sales import daily_sales, top_sellers
+
+report_router = APIRouter(prefix="/api/reports", tags=["Reports"])
+
+# Longest period a report covers, in days.
+MAX_REPORT_DAYS = 366
+
+
+@report_router.get("/sales/daily", response_model=ResponseData)
+async def sales_by_day(
+    days: int = Query(30, ge=1, le=MAX_REPORT_DAYS, description="Days, ending today"),
+    sweet_id: Optional[str] = Query(None, description="Only this sweet"),
+    category: Optional[str] = Query(None, description="Only this category name"),
+    user=Depends(get_admin_user),
+):
+    """
+    Report orders, units, revenue and restocks per day (admin only).
+
+    Reads one rollup document per day, for the whole shop, a category or a sweet.
+
+    Args:
+        days (int): Number of days, ending today (UTC).
+        sweet_id (Optional[str]): Restrict the report to a sweet.
+        category (Optional[str]): Restrict the report to a category.
+        user (_type_): Authenticated admin user.
+
+    Raises:
+        HTTPException:
+            - 400 if both a sweet and a category are given, or the sweet ID is invalid.
+            - 404 if the category does not exist.
+
+    Returns:
+        ResponseData: One row per day, oldest first.
+    """
+    if sweet_id and category:
+        raise HTTPException(
+            status_code=400, detail="Filter by either a sweet or a category"
+        )
+
+    scope, key = "shop", None
+    if sweet_id:
+        if not ObjectId.is_valid(sweet_id):
+            raise HTTPException(status_code=400, detail="Invalid sweet ID")
+        scope, key = "sweet", ObjectId(sweet_id)
+    elif category:
+        category_doc = await category_cache.get_by_name(category)
+        if not category_doc:
+            raise HTTPException(
+                status_code=404, detail=f"Category '{category}' not found"
+            )
+        scope, key = "category", category_doc.id
+
+    return ResponseData(status="success", data=await daily_sales(scope, key, days))
+
+
+@report_router.get("/sales/top", response_model=ResponseData)
+async def top_sales(
+    by: Literal["sweet", "category"] = Query("sweet"),
+    days: int = Query(30, ge=1, le=MAX_REPORT_DAYS, description="Days, ending today"),
+    limit: int = Query(10, ge=1, le=100),
+    user=Depends(get_admin_user),
+):
+    """
+    Rank sweets or categories by revenue over a period (admin only).
+
+    Args:
+        by (str): Rank "sweet"s or "category"s.
+        days (int): Number of days, ending today (UTC).
+        limit (int): Number of rows returned.
+        user (_type_): Authenticated admin user.
+
+    Returns:
+        ResponseData: The best sellers with their name, orders, units and revenue.
+    """
+    rows = await top_sellers(by, days, limit)
+    keys = [row["_id"] for row in rows]
+    if by == "category":
+        names = {
+            key: category.name
+            for key, category in (await category_cache.get_many(keys)).items()
+        }
+    else:
+        sweets = await SweetModel.find({"_id": {"$in": keys}}).to_list()
+        names = {sweet.id: sweet.name for sweet in sweets}
+
+    return ResponseData(
+        status="success",
+        data=[
+            {
+                "id": str(row["_id"]),
+                "name": names.get(row["_id"]),
+                "orders": row["orders"],
+                "units_sold": row["units_sold"],
+                "revenue": row["revenue"],
+            }
+            for row in rows
+        ],
+    )
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from ..schemas.reservations import ReservationCreate
+from ..schemas.response import ResponseData
+from ..utils.auth import get_current_user
+from ..utils.sales import record_committed_movements
+from ..utils.stock import raise_stock_miss
+from ..utils.reservations import (
+    reserve_stock,
+    confirm_reservation,
+    cancel_reservation,
+)
+
+reservation_router = APIRouter(prefix="/api/reservations", tags=["Reservations"])
+
+
+@reservation_router.post(
+    "", status_code=status.HTTP_201_CREATED, response_model=ResponseData
+)
+async def create_reservation(data: ReservationCreate, user=Depends(get_current_user)):
+    """
+    Hold stock of a sweet for the current user during checkout.
+
+    The quantity is taken off the sweet's available stock right away and goes
+    back on sale if the reservation is not confirmed within `minutes`.
+
+    Args:
+        data (ReservationCreate): The sweet, quantity and hold time.
+        user (_type_): Authenticated user making the request.
+
+    Raises:
+        HTTPException:
+            - 404 if the sweet does not exist.
+            - 400 if the sweet has expired or requested quantity exceeds
+              available stock.
+
+    Returns:
+        ResponseData: The reservation with its expiry and the available quantity left.
+    """
+    result = await reserve_stock(
+        data.sweet_id, user["email"], data.quantity, data.minutes
+    )
+    if not result:
+        await raise_stock_miss(data.sweet_id)
+
+    reservation, sweet = result
+    return ResponseData(
+        status="success",
+        data={
+            "id": str(reservation.id),
+            "sweet_id": str(reservation.sweet_id),
+            "quantity": reservation.quantity,
+            "expires_at": reservation.expires_at,
+            "available": sweet.quantity,
+        },
+    )
+
+
+@reservation_router.post("/{reservation_id}/confirm", response_model=ResponseData)
+async def confirm(reservation_id: str, user=Depends(get_current_user)):
+    """
+    Complete the purchase of a reservation's stock.
+
+    Args:
+        reservation_id (str): The ID of the reservation to confirm.
+        user (_type_): Authenticated user holding the reservation.
+
+    Raises:
+        HTTPException: 404 if the reservation does not exist or has expired.
+
+    Returns:
+        ResponseData: The purchased sweet.
+    """
+    confirmed = await confirm_reservation(reservation_id, user["email"])
+    if not confirmed:
+        raise HTTPException(status_code=404, detail="Reservation not found or expired")
+    sweet, quantity = confirmed
+    await record_committed_movements([(sweet, quantity, user["email"])], "purchase")
+    return ResponseData(status="success", data=sweet)
+
+
+@reservation_router.delete("/{reservation_id}", response_model=ResponseData)
+async def cancel(reservation_id: str, user=Depends(get_current_user)):
+    """
+    Release a reservation and put its stock back on sale.
+
+    Args:
+        reservation_id (str): The ID of the reservation to cancel.
+        user (_type_): Authenticated user holding the reservation.
+
+    Raises:
+        HTTPException: 404 if the reservation does not exist.
+
+    Returns:
+        ResponseData: The sweet with its stock returned.
+    """
+    sweet = await cancel_reservation(reservation_id, user["email"])
+    if not sweet:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return ResponseData(status="success", data=sweet)
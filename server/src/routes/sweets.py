@@ -1,14 +1,356 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import Header
+from fastapi.responses import Response, StreamingResponse
+from typing import AsyncIterator, Optional
+from bson import ObjectId
+from beanie.odm.utils.parsing import parse_obj
+from beanie.odm.utils.projection import get_projection
+import orjson
 from ..models import SweetModel, CategoryModel
 from ..utils.auth import get_current_user, get_admin_user
-from ..schemas.response import ResponseData
+from ..utils.catalog_version import catalog_versions, etag_matches
+from ..utils.category_cache import category_cache
+from ..utils.invalidation import invalidation_bus
+from ..utils.expiry import NOT_EXPIRED, expiring_sweets
+from ..utils.idempotency import idempotent
+from ..utils.sales import record_committed_movements
+from ..utils.stock import adjust_stock, purchase_stock, raise_stock_miss
+from ..utils.stock_events import stock_broadcaster, sweet_event, deleted_event
+from ..utils.search import facet_pipeline, name_search_filter, rank_by_relevance
+from ..utils.search import relevance_stages, results_projection
+from ..utils.bulk_import import import_sweets, iter_lines, iter_rows
+from ..utils.bulk_update import delete_sweets, price_change, reprice_sweets
+from ..utils.bulk_update import restock_sweets, sweet_filter
+from ..schemas.response import ResponseData, fast_response
 from ..schemas.sweets import SweetCreate, CategoryCreate, SweetUpdate
 from ..schemas.sweets import SweetPurchaseRequest, SweetRestockRequest
-from typing import Optional
+from ..schemas.bulk import BulkDeleteRequest, BulkPriceUpdate, BulkRestockRequest
+from ..schemas.sweets import CategoryRow, SweetRow
+from ..schemas.sweets import SWEET_ROW_FIELDS, sweet_projection
+from pymongo.errors import DuplicateKeyError
 
 sweet_router = APIRouter(prefix="/api/sweets", tags=["Sweets"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+# Listings are revalidated on every use: clients keep them but must send
+# `If-None-Match`, which costs no database work when nothing changed.
+LISTING_CACHE_CONTROL = "private, no-cache"
+# Seconds between keep-alive comments on an idle event stream, so proxies do
+# not close it.
+EVENT_STREAM_HEARTBEAT = 15
+
+
+async def serialize_sweets(sweets: list[SweetModel]) -> list[SweetRow]:
+    """Convert sweets into response rows with their category details.
+
+    Categories are resolved through the category cache. Any that are not cached
+    yet are fetched with a single ``$in`` query, so the number of database round
+    trips does not grow with the number of sweets.
+
+    Args:
+        sweets (list[SweetModel]): Sweets loaded without their category links fetched.
+
+    Returns:
+        list[SweetRow]: One row per sweet with id, name, category, price and quantity.
+    """
+    categories = await category_cache.get_many(
+        sweet.category.ref.id for sweet in sweets
+    )
+
+    sweet_list = []
+    for sweet in sweets:
+        category = categories.get(sweet.category.ref.id)
+        sweet_list.append(
+            SweetRow(
+                id=str(sweet.id),
+                name=sweet.name,
+                category=(
+                    CategoryRow(id=str(category.id), name=category.name)
+                    if category
+                    else None
+                ),
+                price=sweet.price,
+                quantity=sweet.quantity,
+            )
+        )
+    return sweet_list
+
+
+def parse_fields(fields: Optional[str]) -> Optional[frozenset[str]]:
+    """Parse the `fields` query parameter of the listing and search endpoints.
+
+    Args:
+        fields (Optional[str]): Comma-separated field names, e.g. "id,name,price".
+
+    Raises:
+        HTTPException: If a field is not one of `SWEET_ROW_FIELDS`.
+
+    Returns:
+        Optional[frozenset[str]]: The requested fields, None for all of them.
+    """
+    if fields is None:
+        return None
+    names = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    if not names:
+        return None
+    unknown = names.difference(SWEET_ROW_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return names
+
+
+async def serialize_sparse(sweets: list, fields: frozenset[str]) -> list[dict]:
+    """Convert projected sweets into rows holding only the requested fields.
+
+    Categories are only resolved, through the category cache, when the category
+    is requested.
+
+    Args:
+        sweets (list): Sweets loaded with a `sweet_projection` model.
+        fields (frozenset[str]): The requested fields.
+
+    Returns:
+        list[dict]: One row per sweet, keys in `SWEET_ROW_FIELDS` order.
+    """
+    categories = {}
+    if "category" in fields:
+        categories = await category_cache.get_many(
+            sweet.category.id for sweet in sweets
+        )
+
+    sweet_list = []
+    for sweet in sweets:
+        row = {}
+        for name in SWEET_ROW_FIELDS:
+            if name not in fields:
+                continue
+            if name == "id":
+                row["id"] = str(sweet.id)
+            elif name == "category":
+                category = categories.get(sweet.category.id)
+                row["category"] = (
+                    CategoryRow(id=str(category.id), name=category.name)
+                    if category
+                    else None
+                )
+            else:
+                row[name] = getattr(sweet, name)
+        sweet_list.append(row)
+    return sweet_list
+
+
+async def serialize_rows(sweets: list, fields: Optional[frozenset[str]]) -> list:
+    """Serialize sweets in full, or sparsely when fields were requested."""
+    if fields is None:
+        return await serialize_sweets(sweets)
+    return await serialize_sparse(sweets, fields)
+
+
+def keyset_filter(after: Optional[str]) -> dict:
+    """Build the filter selecting sweets that come after the given cursor.
+
+    Args:
+        after (Optional[str]): ID of the last sweet already returned, if any.
+
+    Raises:
+        HTTPException: If the cursor is not a valid ObjectId.
+
+    Returns:
+        dict: A MongoDB filter on `_id`, empty when there is no cursor.
+    """
+    if after is None:
+        return {}
+    if not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"_id": {"$gt": ObjectId(after)}}
+
+
+async def stream_sweets(
+    query, fields: Optional[frozenset[str]] = None
+) -> AsyncIterator[bytes]:
+    """Stream sweets as NDJSON, serializing them one cursor batch at a time.
+
+    Only a single batch of documents is held in memory at once, and each batch
+    costs at most one extra query to resolve its categories.
+
+    Args:
+        query (FindMany): The sweet query to walk.
+        fields (Optional[frozenset[str]]): The requested fields, None for all.
+
+    Yields:
+        bytes: One JSON encoded sweet per line.
+    """
+    batch = []
+    async for sweet in query:
+        batch.append(sweet)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            for row in await serialize_rows(batch, fields):
+                yield orjson.dumps(row) + b"\n"
+            batch = []
+    if batch:
+        for row in await serialize_rows(batch, fields):
+            yield orjson.dumps(row) + b"\n"
+
+
+def listing_etag(request: Request, *kinds: str) -> str:
+    """Compute the ETag of a listing built from the given kinds of data.
+
+    The query string and the negotiated format are part of the tag, since the
+    same data yields a different body for another page or for NDJSON.
+
+    Args:
+        request (Request): The incoming listing request.
+        *kinds (str): The kinds of data the listing reads, e.g. "sweets".
+
+    Returns:
+        str: The strong ETag of the response.
+    """
+    variant = f"{request.url.query}|{request.headers.get('accept', '')}"
+    return catalog_versions.etag(kinds, variant)
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds the current listing."""
+    if not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": LISTING_CACHE_CONTROL},
+    )
+
+
+async def search_with_facets(
+    query,
+    price_bucket: float,
+    projection_model=None,
+    skip: int = 0,
+    limit: int = MAX_PAGE_SIZE,
+    term: Optional[str] = None,
+) -> tuple[list, dict]:
+    """Run a sweet search and compute its facets in the same aggregation.
+
+    Args:
+        query (FindMany): The search query, whose filter is reused.
+        price_bucket (float): Width of the price histogram buckets.
+        projection_model (Optional[type]): Loads the results with only its fields.
+        skip (int): Matching sweets skipped before the page.
+        limit (int): Most sweets returned; the facets still cover every match.
+        term (Optional[str]): The searched name; the page is then taken in
+            relevance order rather than ID order.
+
+    Returns:
+        tuple[list, dict]: The page of matching sweets and the facets:
+        per-category counts, the price histogram, the in-stock count and the
+        total.
+    """
+    collection = SweetModel.get_pymongo_collection()
+    projection = get_projection(projection_model) if projection_model else None
+    pipeline = facet_pipeline(
+        query.get_filter_query(), price_bucket, projection, skip, limit, term
+    )
+    (result,) = await collection.aggregate(pipeline).to_list(None)
+
+    sweets = [
+        parse_obj(projection_model or SweetModel, doc) for doc in result["results"]
+    ]
+    category_ids = [group["_id"].id for group in result["categories"]]
+    categories = await category_cache.get_many(category_ids)
+    facets = {
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "in_stock": result["in_stock"][0]["count"] if result["in_stock"] else 0,
+        "categories": [
+            {
+                "id": str(group["_id"].id),
+                "name": (
+                    categories[group["_id"].id].name
+                    if group["_id"].id in categories
+                    else None
+                ),
+                "count": group["count"],
+            }
+            for group in sorted(result["categories"], key=lambda g: -g["count"])
+        ],
+        "price_histogram": [
+            {
+                "min": bucket["_id"],
+                "max": bucket["_id"] + price_bucket,
+                "count": bucket["count"],
+            }
+            for bucket in result["prices"]
+        ],
+    }
+    return sweets, facets
+
+
+async def ranked_search_page(
+    query, term: str, projection_model=None, skip: int = 0, limit: Optional[int] = None
+) -> list:
+    """Run a name search ranked by relevance in MongoDB, then take one page.
+
+    Args:
+        query (FindMany): The search query, whose filter is reused.
+        term (str): The searched name.
+        projection_model (Optional[type]): Loads the results with only its fields.
+        skip (int): Ranked matches skipped before the page.
+        limit (Optional[int]): Most sweets returned, all when omitted.
+
+    Returns:
+        list: The page of matching sweets, best match first.
+    """
+    projection = get_projection(projection_model) if projection_model else None
+    pipeline = [
+        {"$match": query.get_filter_query()},
+        *relevance_stages(term),
+        {"$skip": skip},
+        *([{"$limit": limit}] if limit is not None else []),
+        {"$project": results_projection(projection)},
+    ]
+    documents = (
+        await SweetModel.get_pymongo_collection().aggregate(pipeline).to_list(None)
+    )
+    return [parse_obj(projection_model or SweetModel, doc) for doc in documents]
+
+
+async def stream_stock_events(
+    subscription,
+    heartbeat: float = EVENT_STREAM_HEARTBEAT,
+    request: Optional[Request] = None,
+) -> AsyncIterator[bytes]:
+    """Stream a subscriber's stock events as server-sent events.
+
+    Events queued while the client was reading are sent together. A subscriber
+    that fell too far behind gets a final `resync` event, telling it to re-fetch
+    the list before subscribing again. When idle, the stream ends as soon as the
+    client has disconnected, and otherwise sends a heartbeat.
+
+    Args:
+        subscription (Subscription): The subscriber registered with the broadcaster.
+        heartbeat (float): Seconds between keep-alive comments when idle.
+        request (Optional[Request]): The streaming request, checked for a
+            disconnected client.
+
+    Yields:
+        bytes: Server-sent event frames.
+    """
+    try:
+        while True:
+            events = await subscription.next_batch(timeout=heartbeat)
+            if subscription.overflowed:
+                yield b"event: resync\ndata: {}\n\n"
+                return
+            if not events:
+                if request is not None and await request.is_disconnected():
+                    return
+                yield b": keep-alive\n\n"
+            for event in events:
+                yield b"event: stock\ndata: " + orjson.dumps(event) + b"\n\n"
+    finally:
+        stock_broadcaster.unsubscribe(subscription)
+
 
 @sweet_router.post("", status_code=201, response_model=ResponseData)
 async def add_sweet(data: SweetCreate, user=Depends(get_current_user)):
@@ -24,7 +366,7 @@ async def add_sweet(data: SweetCreate, user=Depends(get_current_user)):
     Returns:
         ResponseData: Contains the created sweet object.
     """
-    category = await CategoryModel.find_one(CategoryModel.name == data.category)
+    category = await category_cache.get_by_name(data.category)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
 
@@ -36,10 +378,117 @@ async def add_sweet(data: SweetCreate, user=Depends(get_current_user)):
         expiry_date=data.expiry_date,
     )
     await sweet.insert()
+    await invalidation_bus.publish("sweets")
+    stock_broadcaster.publish(sweet_event(sweet))
     await sweet.fetch_link(SweetModel.category)
     return ResponseData(status="success", data=sweet)
 
 
+@sweet_router.post("/bulk", status_code=200, response_model=ResponseData)
+async def bulk_import_sweets(
+    request: Request,
+    chunk_size: int = Query(
+        1000, ge=1, le=10000, description="Number of sweets written per batch"
+    ),
+    user=Depends(get_admin_user),
+):
+    """Import many sweets from a streamed CSV or NDJSON upload (admin only).
+
+    The body is parsed as it arrives and written in chunks of `chunk_size` with
+    unordered `insert_many`, so memory stays bounded for arbitrarily large
+    uploads. CSV uploads need a header line naming the `SweetCreate` fields.
+    Stock event subscribers are told to resync once sweets were imported.
+
+    Args:
+        request (Request): The incoming request whose body is streamed.
+        chunk_size (int): Number of sweets written per batch.
+        user (_type_, optional): Authenticated admin user. Defaults to Depends(get_admin_user).
+
+    Raises:
+        HTTPException: If the content type is neither `text/csv` nor NDJSON.
+
+    Returns:
+        ResponseData: The number of inserted and failed rows with per-row errors.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in ("text/csv", NDJSON_MEDIA_TYPE):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content type must be text/csv or {NDJSON_MEDIA_TYPE}",
+        )
+
+    rows = iter_rows(iter_lines(request.stream()), content_type)
+    report = await import_sweets(rows, chunk_size)
+    if report.inserted:
+        await invalidation_bus.publish("sweets")
+        stock_broadcaster.publish_resync()
+    return ResponseData(status="success", data=report.to_dict())
+
+
+@sweet_router.post("/bulk/price", response_model=ResponseData)
+async def bulk_update_prices(data: BulkPriceUpdate, user=Depends(get_admin_user)):
+    """Change the price of every sweet matching a filter (admin only).
+
+    Prices change by `percent` or by `amount` in a single `update_many`, however
+    many sweets match. With `dry_run` the matching sweets are only counted.
+
+    Args:
+        data (BulkPriceUpdate): The filter, the price change and the dry-run flag.
+        user (_type_, optional): Authenticated admin user. Defaults to Depends(get_admin_user).
+
+    Raises:
+        HTTPException:
+            - 400 if the filter is empty or both or neither changes are given.
+            - 404 if the category does not exist.
+
+    Returns:
+        ResponseData: The number of matched and modified sweets.
+    """
+    pipeline = price_change(data.percent, data.amount)
+    match = await sweet_filter(data.filter)
+    report = await reprice_sweets(match, pipeline, data.dry_run)
+    return ResponseData(status="success", data=report)
+
+
+@sweet_router.post("/bulk/restock", response_model=ResponseData)
+async def bulk_restock_sweets(data: BulkRestockRequest, user=Depends(get_admin_user)):
+    """Restock many sweets by ID in a single `bulk_write` (admin only).
+
+    Args:
+        data (BulkRestockRequest): The sweets with the quantity to add to each.
+        user (_type_, optional): Authenticated admin user. Defaults to Depends(get_admin_user).
+
+    Raises:
+        HTTPException: 400 if an ID is invalid.
+
+    Returns:
+        ResponseData: The number of restocked sweets and the IDs not found.
+    """
+    report = await restock_sweets(data.items, user["email"], data.dry_run)
+    return ResponseData(status="success", data=report)
+
+
+@sweet_router.post("/bulk/delete", response_model=ResponseData)
+async def bulk_delete_sweets(data: BulkDeleteRequest, user=Depends(get_admin_user)):
+    """Delete every sweet matching a filter in a single `delete_many` (admin only).
+
+    Args:
+        data (BulkDeleteRequest): The filter and the dry-run flag.
+        user (_type_, optional): Authenticated admin user. Defaults to Depends(get_admin_user).
+
+    Raises:
+        HTTPException:
+            - 400 if the filter is empty.
+            - 404 if the category does not exist.
+
+    Returns:
+        ResponseData: The number of matched and deleted sweets.
+    """
+    match = await sweet_filter(data.filter)
+    report = await delete_sweets(match, data.dry_run)
+    return ResponseData(status="success", data=report)
+
+
 @sweet_router.post(
     "/categories", status_code=status.HTTP_201_CREATED, response_model=ResponseData
 )
@@ -57,7 +506,7 @@ async def add_sweet_category(data: CategoryCreate, user=Depends(get_admin_user))
         ResponseData: The created category object with its ID and name.
     """
 
-    category_exists = await CategoryModel.find_one(CategoryModel.name == data.name)
+    category_exists = await category_cache.get_by_name(data.name)
 
     if category_exists:
         raise HTTPException(
@@ -65,7 +514,15 @@ async def add_sweet_category(data: CategoryCreate, user=Depends(get_admin_user))
         )
 
     category = CategoryModel(name=data.name)
-    await category.insert()
+    try:
+        await category.insert()
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Category already exists."
+        )
+    # Publishing evicts the category locally too, so cache it afterwards.
+    await invalidation_bus.publish("categories", str(category.id))
+    category_cache.put(category)
 
     return ResponseData(
         status="success", data={"_id": str(category.id), "name": category.name}
@@ -75,56 +532,177 @@ async def add_sweet_category(data: CategoryCreate, user=Depends(get_admin_user))
 @sweet_router.get(
     "/categories", status_code=status.HTTP_200_OK, response_model=ResponseData
 )
-async def get_sweet_categories(user=Depends(get_current_user)):
+async def get_sweet_categories(request: Request, user=Depends(get_current_user)):
     """
     Retrieve all sweet categories.
 
+    The response carries an `ETag`; sending it back in `If-None-Match` returns
+    304 Not Modified until a category is added.
+
     Args:
+        request (Request): The incoming request, used to read `If-None-Match`.
         user (_type_): Authenticated user making the request.
 
     Returns:
         ResponseData: A list of all sweet categories with their IDs and names.
     """
-    categories = await CategoryModel.find_all().to_list()
+    etag = listing_etag(request, "categories")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
 
-    results = [{"id": str(cat.id), "name": cat.name} for cat in categories]
-    return ResponseData(status="success", data=results)
+    categories = await category_cache.all()
+
+    results = [CategoryRow(id=str(cat.id), name=cat.name) for cat in categories]
+    return fast_response(
+        results, headers={"ETag": etag, "Cache-Control": LISTING_CACHE_CONTROL}
+    )
 
 
 @sweet_router.get("", status_code=200, response_model=ResponseData)
-async def list_sweets(user=Depends(get_current_user)):
-    """Retrieve a list of all sweets along with their category info.
+async def list_sweets(
+    request: Request,
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of sweets to return"
+    ),
+    after: Optional[str] = Query(
+        None, description="Cursor: return sweets after this sweet ID"
+    ),
+    include_expired: bool = Query(False, description="Also return expired sweets"),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return: " + ", ".join(SWEET_ROW_FIELDS),
+    ),
+    user=Depends(get_current_user),
+):
+    """Retrieve a list of sweets along with their category info.
+
+    Sweets are ordered by ID. When `limit` is given the page is cut after that many
+    rows and the ID to pass as `after` for the next page is returned in the
+    `X-Next-Cursor` header. Clients sending `Accept: application/x-ndjson` get the
+    rows streamed one JSON object per line instead of a single response body.
+
+    Sweets flagged as expired are left out unless `include_expired` is set.
+
+    `fields` selects the row fields, e.g. `fields=id,name,price`. Only those are
+    loaded from MongoDB, and categories are not resolved unless requested.
+
+    Responses carry an `ETag` that changes with every sweet or category write.
+    Sending it back in `If-None-Match` returns 304 Not Modified without querying
+    the database.
+
+    Args:
+        request (Request): The incoming request, used to read the `Accept` and
+            `If-None-Match` headers.
+        limit (Optional[int]): Page size, unlimited when omitted.
+        after (Optional[str]): ID of the last sweet of the previous page.
+        include_expired (bool): Whether expired sweets are listed.
+        fields (Optional[str]): Comma-separated fields to return, all by default.
+        user (_type_): Authenticated user making the request.
+
+    Raises:
+        HTTPException: If `after` is not a valid sweet ID or a field is unknown.
 
     Returns:
-        ResponseData: A list of all sweets, each including its name and category details.
+        ResponseData: A list of sweets, each including its name and category details.
     """
-    sweets = await SweetModel.find_all().to_list()
-    sweet_list = []
+    query = SweetModel.find(
+        keyset_filter(after),
+        {} if include_expired else NOT_EXPIRED,
+        batch_size=STREAM_BATCH_SIZE,
+    ).sort("_id")
+    selected = parse_fields(fields)
+    if selected is not None:
+        query = query.project(sweet_projection(selected))
+
+    # Read the versions before querying, so a write racing with the query
+    # can only make the tag older than the body, never newer.
+    etag = listing_etag(request, "sweets", "categories")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    headers = {"ETag": etag, "Cache-Control": LISTING_CACHE_CONTROL}
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(
+            stream_sweets(query, selected),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers,
+        )
 
-    for sweet in sweets:
-        category_id = sweet.category.ref.id
-        category = await CategoryModel.get(category_id)
+    if limit is not None:
+        sweets = await query.limit(limit + 1).to_list()
+        if len(sweets) > limit:
+            sweets = sweets[:limit]
+            headers["X-Next-Cursor"] = str(sweets[-1].id)
+    else:
+        sweets = await query.to_list()
 
-        sweet_list.append(
-            {
-                "id": str(sweet.id),
-                "name": sweet.name,
-                "category": {
-                    "id": str(category.id),
-                    "name": category.name,
-                },
-                "price": sweet.price,
-                "quantity": sweet.quantity,
-            }
-        )
+    sweet_list = await serialize_rows(sweets, selected)
+    return fast_response(sweet_list, headers=headers)
+
+
+@sweet_router.get("/expiring", response_model=ResponseData)
+async def get_expiring_sweets(
+    days: int = Query(7, ge=0, le=365, description="Days ahead, starting today"),
+    user=Depends(get_admin_user),
+):
+    """
+    List the sweets expiring within the next `days` days (admin only).
+
+    Served by a range scan on the expiry date index, soonest first.
+
+    Args:
+        days (int): Days ahead; 0 lists the sweets expiring today.
+        user (_type_): Authenticated admin user.
 
-    return ResponseData(status="success", data=sweet_list)
+    Returns:
+        ResponseData: The sweets with their stock and expiry date.
+    """
+    sweets = await expiring_sweets(days)
+    rows = await serialize_sweets(sweets)
+    return fast_response(
+        [
+            {**row, "expiry_date": sweet.expiry_date.isoformat()}
+            for row, sweet in zip(rows, sweets)
+        ]
+    )
+
+
+@sweet_router.get("/events")
+async def sweet_stock_events(request: Request, user=Depends(get_current_user)):
+    """Subscribe to stock changes as a server-sent event stream.
+
+    Each `stock` event carries `{"type": "upsert", "id", "quantity", "price"}`
+    after a sweet is added, updated, purchased or restocked, or
+    `{"type": "delete", "id"}` after it is deleted. Instead of polling the list,
+    clients fetch it once and apply these deltas.
+
+    Args:
+        request (Request): The incoming request, ending the stream once the
+            client disconnects.
+        user (_type_): Authenticated user making the request.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response that stays open until
+        the client disconnects.
+    """
+    subscription = stock_broadcaster.subscribe()
+    return StreamingResponse(
+        stream_stock_events(subscription, request=request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @sweet_router.get("/search", response_model=ResponseData)
 async def search_sweets(
     name: Optional[str] = Query(
-        None, description="Search sweets by name (partial match, case-insensitive)"
+        None,
+        description="Search sweets by name (partial match, case-insensitive, "
+        "best matches first)",
     ),
     category: Optional[str] = Query(None, description="Exact category name"),
     minPrice: Optional[float] = Query(None, ge=0, description="Minimum price"),
@@ -132,22 +710,55 @@ async def search_sweets(
     min_quantity: Optional[int] = Query(
         None, ge=0, description="Minimum quantity available"
     ),
+    facets: bool = Query(
+        False, description="Also return category counts and a price histogram"
+    ),
+    price_bucket: float = Query(
+        10, gt=0, description="Width of the price histogram buckets"
+    ),
+    include_expired: bool = Query(False, description="Also return expired sweets"),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return: " + ", ".join(SWEET_ROW_FIELDS),
+    ),
+    skip: int = Query(0, ge=0, description="Number of matching sweets to skip"),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Maximum number of sweets to return",
+    ),
     user=Depends(get_current_user),
 ):
     """
     Search sweets by name, category, price range, and minimum quantity.
     Returns a list of sweets matching the criteria with populated category details.
+    Expired sweets are left out unless `include_expired` is set.
+
+    With `facets=true`, `data` becomes `{"results": [...], "facets": {...}}`, where
+    the facets hold the number of matches per category, a price histogram with
+    buckets `price_bucket` wide, the in-stock count and the total. Results and
+    facets are computed by one `$facet` aggregation.
+
+    `skip` and `limit` page through the matches, best name match first when a
+    name is searched and in ID order otherwise. Name matches are ranked in the
+    database before the page is taken. Faceted results are capped at
+    `MAX_PAGE_SIZE`, while the facets still count every match.
+
+    `fields` selects the result fields as for the sweet list.
     """
+    selected = parse_fields(fields)
+
     # Start with a base query
-    query = SweetModel.find()
+    query = SweetModel.find({} if include_expired else NOT_EXPIRED)
 
-    # Filter by name using regex
+    # Filter by name using the n-gram index
     if name:
-        query = query.find({"name": {"$regex": f".*{name}.*", "$options": "i"}})
+        query = query.find(name_search_filter(name))
 
     # Filter by category (assuming category is a Link field)
     if category:
-        category_doc = await CategoryModel.find_one(CategoryModel.name == category)
+        category_doc = await category_cache.get_by_name(category)
         if not category_doc:
             raise HTTPException(
                 status_code=404, detail=f"Category '{category}' not found"
@@ -164,26 +775,30 @@ async def search_sweets(
         query = query.find(SweetModel.quantity >= min_quantity)
 
     # Execute the query and return the results
-    sweets = await query.to_list()
-    sweet_list = []
-    for sweet in sweets:
-        category_id = sweet.category.ref.id
-        category = await CategoryModel.get(category_id)
-        print(category.name)
-
-        sweet_list.append(
-            {
-                "id": str(sweet.id),
-                "name": sweet.name,
-                "category": {
-                    "id": str(category.id),
-                    "name": category.name,
-                },
-                "price": sweet.price,
-                "quantity": sweet.quantity,
-            }
+    # Ranking needs the names even when they are not returned
+    projection_model = None
+    if selected is not None:
+        projection_model = sweet_projection(selected | {"name"} if name else selected)
+
+    facet_counts = None
+    paged = bool(skip) or limit is not None
+    if facets:
+        sweets, facet_counts = await search_with_facets(
+            query, price_bucket, projection_model, skip, limit or MAX_PAGE_SIZE, name
         )
-    return ResponseData(status="success", data=sweet_list)
+    elif name and paged:
+        sweets = await ranked_search_page(query, name, projection_model, skip, limit)
+    else:
+        query = query.project(projection_model)
+        if paged:
+            query = query.sort("_id").skip(skip).limit(limit)
+        sweets = await query.to_list()
+        if name:
+            sweets = rank_by_relevance(sweets, name, key=lambda sweet: sweet.name)
+    sweet_list = await serialize_rows(sweets, selected)
+    if facet_counts is not None:
+        return fast_response({"results": sweet_list, "facets": facet_counts})
+    return fast_response(sweet_list)
 
 
 @sweet_router.put("/{sweet_id}", response_model=ResponseData, status_code=200)
@@ -221,6 +836,8 @@ async def update_sweet(
         sweet.quantity = update_data.quantity
 
     await sweet.save()
+    await invalidation_bus.publish("sweets")
+    stock_broadcaster.publish(sweet_event(sweet))
 
     return ResponseData(
         status="success",
@@ -252,6 +869,8 @@ async def delete_sweet(sweet_id: str, user=Depends(get_admin_user)):
         raise HTTPException(status_code=404, detail="Sweet not found")
 
     await sweet.delete()
+    await invalidation_bus.publish("sweets")
+    stock_broadcaster.publish(deleted_event(sweet.id))
     return ResponseData(status="success", message="Sweet successfully deleted")
 
 
@@ -259,17 +878,29 @@ async def delete_sweet(sweet_id: str, user=Depends(get_admin_user)):
 async def purchase_sweet(
     sweet_id: str,
     purchase: SweetPurchaseRequest,
+    request: Request,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
     user=Depends(get_current_user),
 ):
     """
     Purchase a sweet item by reducing its quantity.
 
     This endpoint allows a logged-in user to purchase a specific quantity of a sweet.
-    It checks if the item exists and if there's enough stock before proceeding.
+    The stock check and the decrement happen in a single atomic update, so
+    concurrent purchases can never drive the quantity below zero. With
+    `PURCHASE_COALESCING` enabled, concurrent purchases of one sweet share that
+    update, and their sales are recorded together, see `PurchaseCoalescer`.
+
+    A purchase sent with an `Idempotency-Key` header runs at most once: a retry
+    with the same key gets the first response back, see `IdempotencyStore`.
 
     Args:
         sweet_id (str): The ID of the sweet to purchase.
         purchase (SweetPurchaseRequest): Object containing the quantity to purchase.
+        request (Request): The incoming request, scoping the idempotency key.
+        idempotency_key (Optional[str]): Client key making retries safe.
         user (UserModel): The authenticated user making the purchase (injected via dependency).
 
     Returns:
@@ -278,35 +909,42 @@ async def purchase_sweet(
     Raises:
         HTTPException:
             - 404 if the sweet does not exist.
-            - 400 if requested quantity exceeds available stock.
+            - 400 if the sweet has expired or requested quantity exceeds
+              available stock.
+            - 422 if the idempotency key was used for a different purchase.
     """
-    sweet = await SweetModel.get(sweet_id)
-    if not sweet:
-        raise HTTPException(status_code=404, detail="Sweet not found")
 
-    if sweet.quantity < purchase.quantity:
-        raise HTTPException(status_code=400, detail="Not enough stock available")
+    async def purchase_once():
+        sweet = await purchase_stock(sweet_id, purchase.quantity, user["email"])
+        if not sweet:
+            await raise_stock_miss(sweet_id)
+        return ResponseData(status="success", data=sweet)
 
-    sweet.quantity -= purchase.quantity
-    await sweet.save()
-    return ResponseData(status="success", data=sweet)
+    return await idempotent(idempotency_key, request, user, purchase, purchase_once)
 
 
 @sweet_router.post("/{sweet_id}/restock")
 async def restock_sweet(
     sweet_id: str,
     restock: SweetRestockRequest,
+    request: Request,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
     user=Depends(get_admin_user),
 ):
     """
     Restock a sweet item by increasing its quantity (Admin-only).
 
     Only admins can use this endpoint to add more inventory to a sweet item.
-    The endpoint checks if the item exists and then increases its quantity.
+    The quantity is increased with a single atomic `$inc` update. Like
+    purchases, restocks sent with an `Idempotency-Key` header run at most once.
 
     Args:
         sweet_id (str): The ID of the sweet to restock.
         restock (SweetRestockRequest): Object containing the quantity to add.
+        request (Request): The incoming request, scoping the idempotency key.
+        idempotency_key (Optional[str]): Client key making retries safe.
         user (UserModel): The authenticated admin user (injected via dependency).
 
     Returns:
@@ -315,11 +953,17 @@ async def restock_sweet(
     Raises:
         HTTPException:
             - 404 if the sweet does not exist.
+            - 422 if the idempotency key was used for a different restock.
     """
-    sweet = await SweetModel.get(sweet_id)
-    if not sweet:
-        raise HTTPException(status_code=404, detail="Sweet not found")
 
-    sweet.quantity += restock.quantity
-    await sweet.save()
-    return ResponseData(status="success", data=sweet)
+    async def restock_once():
+        sweet = await adjust_stock(sweet_id, restock.quantity)
+        if not sweet:
+            raise HTTPException(status_code=404, detail="Sweet not found")
+
+        await record_committed_movements(
+            [(sweet, restock.quantity, user["email"])], "restock"
+        )
+        return ResponseData(status="success", data=sweet)
+
+    return await idempotent(idempotency_key, request, user, restock, restock_once)
@@ -0,0 +1,70 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# Most sweets a single bulk restock may list.
+MAX_BULK_ITEMS = 10000
+
+
+class SweetFilter(BaseModel):
+    """Selects the sweets a bulk operation applies to.
+
+    Criteria are combined with AND, and at least one of them is required so that
+    a forgotten filter never touches the whole catalog.
+
+    Args:
+        BaseModel (_type_): Pydantic base model used for request validation.
+    """
+
+    ids: Optional[list[str]] = Field(None, max_length=MAX_BULK_ITEMS)
+    category: Optional[str] = Field(None, description="Exact category name")
+    name: Optional[str] = Field(None, description="Partial name match")
+    min_price: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+
+
+class BulkPriceUpdate(BaseModel):
+    """Schema for changing the price of many sweets at once.
+
+    Exactly one of `percent` and `amount` must be given. Prices never go below 0.
+
+    Args:
+        BaseModel (_type_): Pydantic base model used for request validation.
+    """
+
+    filter: SweetFilter
+    percent: Optional[float] = Field(
+        None, gt=-100, description="Relative change, e.g. -10 for 10% off"
+    )
+    amount: Optional[float] = Field(
+        None, description="Absolute change, e.g. 5 to add 5 to every price"
+    )
+    dry_run: bool = Field(False, description="Only count the matching sweets")
+
+
+class BulkRestockItem(BaseModel):
+    """One sweet of a bulk restock."""
+
+    id: str
+    quantity: int = Field(..., gt=0)
+
+
+class BulkRestockRequest(BaseModel):
+    """Schema for restocking many sweets at once.
+
+    Args:
+        BaseModel (_type_): Pydantic base model used for request validation.
+    """
+
+    items: list[BulkRestockItem] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+    dry_run: bool = Field(False, description="Only count the existing sweets")
+
+
+class BulkDeleteRequest(BaseModel):
+    """Schema for deleting many sweets at once.
+
+    Args:
+        BaseModel (_type_): Pydantic base model used for request validation.
+    """
+
+    filter: SweetFilter
+    dry_run: bool = Field(False, description="Only count the matching sweets")
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+
+# Longest a checkout may hold stock, in minutes.
+MAX_RESERVATION_MINUTES = 60
+
+
+class ReservationCreate(BaseModel):
+    """Schema for holding stock of a sweet during checkout.
+
+    Args:
+        BaseModel (_type_): Pydantic base model used for request validation.
+    """
+
+    sweet_id: str
+    quantity: int = Field(..., gt=0)
+    minutes: int = Field(
+        15,
+        ge=1,
+        le=MAX_RESERVATION_MINUTES,
+        description="How long the stock is held before it goes back on sale",
+    )
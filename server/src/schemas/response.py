@@ -1,6 +1,7 @@
 from typing import Generic, TypeVar, Optional
 from typing_extensions import Literal
 from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
 
 T = TypeVar("T")
 
@@ -21,3 +22,26 @@ class ResponseData(BaseModel, Generic[T]):
     status: Literal["success", "fail"]
     data: Optional[T] = None
     message: Optional[str] = None
+
+
+def fast_response(
+    data=None, message: Optional[str] = None, headers: Optional[dict] = None
+) -> ORJSONResponse:
+    """
+    Builds a successful `ResponseData`-shaped response serialized with orjson.
+
+    Returning a response object makes FastAPI skip validating and re-encoding the
+    payload against `response_model`, so this is meant for large payloads made of
+    plain, already trusted data such as `SweetRow` lists.
+
+    Args:
+        data: The payload, made of JSON-compatible types.
+        message (Optional[str]): A human-readable message.
+        headers (Optional[dict]): Extra response headers.
+
+    Returns:
+        ORJSONResponse: The encoded response.
+    """
+    return ORJSONResponse(
+        {"status": "success", "data": data, "message": message}, headers=headers
+    )
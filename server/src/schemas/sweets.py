@@ -1,6 +1,9 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from typing import Optional, TypedDict
+from beanie import PydanticObjectId
+from bson import DBRef
 import datetime
+import functools
 
 
 class SweetCreate(BaseModel):
@@ -57,3 +60,57 @@ class SweetPurchaseRequest(BaseModel):
 
 class SweetRestockRequest(BaseModel):
     quantity: int = Field(..., gt=0)
+
+
+class CategoryRow(TypedDict):
+    """Category details embedded in a sweet listing row.
+
+    Rows are plain typed dicts built from already validated documents, so they are
+    serialized directly without another round of Pydantic validation.
+    """
+
+    id: str
+    name: str
+
+
+class SweetRow(TypedDict):
+    """A sweet as returned by the listing and search endpoints."""
+
+    id: str
+    name: str
+    category: Optional[CategoryRow]
+    price: float
+    quantity: int
+
+
+# Fields a client can select with `fields=`, in response order.
+SWEET_ROW_FIELDS = tuple(SweetRow.__annotations__)
+
+# Stored type of each selectable field; the category is loaded as the raw link.
+_PROJECTED_TYPES = {"name": str, "category": DBRef, "price": float, "quantity": int}
+
+
+@functools.lru_cache(maxsize=None)
+def sweet_projection(fields: frozenset[str]) -> type[BaseModel]:
+    """Builds the projection model loading only the given fields of a sweet.
+
+    Beanie derives the MongoDB projection from the model fields, so documents come
+    back with just these fields and the ID, which is always kept for cursors.
+    Models are cached per field set.
+
+    Args:
+        fields (frozenset[str]): Names from `SWEET_ROW_FIELDS`.
+
+    Returns:
+        type[BaseModel]: A model to pass to `FindMany.project`.
+    """
+    return create_model(
+        "SweetProjection",
+        __config__=ConfigDict(arbitrary_types_allowed=True),
+        id=(PydanticObjectId, Field(alias="_id")),
+        **{
+            name: (field_type, ...)
+            for name, field_type in _PROJECTED_TYPES.items()
+            if name in fields
+        },
+    )
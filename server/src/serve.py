@@ -0,0 +1,65 @@
+import uvicorn
+from .utils.env import EnvSettings, env_settings
+
+
+def check_serving_settings(settings: EnvSettings) -> list[str]:
+    """
+    Checks that the settings are safe for the configured number of workers.
+
+    Each worker keeps its own in-memory caches, so with several workers their
+    invalidations must travel through MongoDB rather than the in-process broker.
+
+    Args:
+        settings (EnvSettings): The settings every worker will load.
+
+    Raises:
+        ValueError: If several workers would serve stale cached data.
+
+    Returns:
+        list[str]: Warnings about features that stay per worker.
+    """
+    if settings.WORKERS == 1:
+        return []
+    if settings.INVALIDATION_BUS != "change_stream":
+        raise ValueError(
+            "WORKERS > 1 needs INVALIDATION_BUS=change_stream so that every worker "
+            "drops the cached data changed by the others"
+        )
+
+    warnings = []
+    if settings.STOCK_EVENTS_SOURCE != "change_stream":
+        warnings.append(
+            "STOCK_EVENTS_SOURCE=local: event stream clients only see the writes "
+            "of the worker they are connected to"
+        )
+    if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_BACKEND != "mongo":
+        warnings.append(
+            "RATE_LIMIT_BACKEND=local: each worker allows the full rate limit"
+        )
+    return warnings
+
+
+def main():
+    """
+    Serves the app with `WORKERS` worker processes on `HOST:PORT`.
+
+    The settings are validated once here, before any worker starts, and every
+    worker then loads the same environment and `.env` file. Uvicorn's supervisor
+    starts the workers, restarts any that die and shuts them all down together.
+    """
+    for warning in check_serving_settings(env_settings):
+        print(f"⚠️ {warning}")
+    print(
+        f"🚀 Serving on {env_settings.HOST}:{env_settings.PORT} "
+        f"with {env_settings.WORKERS} worker(s)."
+    )
+    uvicorn.run(
+        "src.main:app",
+        host=env_settings.HOST,
+        port=env_settings.PORT,
+        workers=env_settings.WORKERS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from .env import env_settings
+from .token_cache import token_cache
 from ..models import UserModel
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
@@ -33,6 +34,9 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Decodes the JWT and extracts user information from it.
 
+    Verified tokens are remembered in `token_cache` until they expire, so a
+    token seen before skips the decode and signature check.
+
     Args:
         token (str): JWT token extracted from the request Authorization header.
 
@@ -47,6 +51,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    claims = token_cache.get(token)
+    if claims is not None:
+        return dict(claims)
+
     try:
         payload = jwt.decode(
             token, env_settings.SECRET_KEY, algorithms=[env_settings.ALGORITHM]
@@ -55,7 +63,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         role: str = payload.get("role")
         if not email or not role:
             raise credentials_exception
-        return {"email": email, "role": role}
+        claims = {"email": email, "role": role}
+        if payload.get("exp") is not None:
+            token_cache.put(token, claims, float(payload["exp"]))
+        return dict(claims)
     except JWTError:
         raise credentials_exception
 
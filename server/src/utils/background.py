@@ -0,0 +1,51 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+
+
+class PeriodicTask:
+    """
+    Runs an async job every `interval` seconds in the background.
+
+    Used for the sweepers started from the app lifespan. A failing run is
+    reported and retried on the next tick, so one bad run never stops the loop.
+
+    Attributes:
+        name (str): Shown in error messages.
+        interval (float): Seconds between the end of a run and the next one.
+        runs (int): Completed runs since start.
+    """
+
+    def __init__(self, name: str, interval: float, job: Callable[[], Awaitable]):
+        self.name = name
+        self.interval = interval
+        self.job = job
+        self.runs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        """Runs the job until cancelled."""
+        while True:
+            try:
+                await self.job()
+                self.runs += 1
+            except Exception as exc:
+                print(f"⚠️ {self.name} failed: {exc}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the loop if it is not running."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stops the loop, if running."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+__all__ = ["PeriodicTask"]
@@ -0,0 +1,227 @@
+from typing import AsyncIterator, Optional
+import codecs
+import csv
+import json
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from ..models import SweetModel
+from ..schemas.sweets import SweetCreate
+from .category_cache import category_cache
+from .clock import utc_today
+from .search import name_grams
+
+# Error details kept in the report; further failures are only counted.
+MAX_REPORTED_ERRORS = 1000
+# Longest line accepted, in characters. A longer line is rejected as it streams
+# in, so a body without line breaks cannot be buffered whole.
+MAX_LINE_LENGTH = 64 * 1024
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_length: int = MAX_LINE_LENGTH
+) -> AsyncIterator[Optional[str]]:
+    """
+    Splits a stream of UTF-8 bytes into lines without buffering the whole body.
+
+    A line longer than `max_length` is dropped as soon as it grows past it, and
+    the rest of it is skipped up to the next line break.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw request body chunks.
+        max_length (int): The longest line accepted, in characters.
+
+    Yields:
+        Optional[str]: Each line, without its line ending, or None in place of a
+        line that was too long.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if skipping:
+                # The end of a line already reported as too long.
+                skipping = False
+                continue
+            yield line.rstrip("\r") if len(line) <= max_length else None
+        if len(pending) > max_length:
+            if not skipping:
+                yield None
+                skipping = True
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.rstrip("\r") if len(pending) <= max_length else None
+
+
+async def iter_rows(
+    lines: AsyncIterator[Optional[str]], content_type: str
+) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parses CSV (with a header line) or NDJSON lines into raw row dicts.
+
+    Blank lines are skipped. CSV fields must not contain line breaks. Lines that
+    were too long, None from `iter_lines`, are reported as failed rows.
+
+    Args:
+        lines (AsyncIterator[Optional[str]]): The body lines.
+        content_type (str): `text/csv` or `application/x-ndjson`.
+
+    Yields:
+        tuple: The 1-based row number, the row (None if it could not be parsed)
+        and the parse error, if any.
+    """
+    header = None
+    row_number = 0
+    async for line in lines:
+        if line is None:
+            row_number += 1
+            yield row_number, None, f"Line longer than {MAX_LINE_LENGTH} characters"
+            continue
+        if not line.strip():
+            continue
+        if content_type == "text/csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [value.strip() for value in values]
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, None, "Wrong number of columns"
+                continue
+            # Empty cells fall back to the schema defaults
+            yield row_number, {
+                key: value for key, value in zip(header, values) if value != ""
+            }, None
+        else:
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield row_number, None, f"Invalid JSON: {exc.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, "Row must be a JSON object"
+                continue
+            yield row_number, row, None
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    """Flattens a pydantic validation error into a single readable line."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in exc.errors()
+    )
+
+
+class ImportReport:
+    """
+    Per-row outcome of a bulk import.
+
+    Attributes:
+        inserted (int): Number of sweets written.
+        failed (int): Number of rows rejected.
+        errors (list[dict]): The first `MAX_REPORTED_ERRORS` failures, each with
+            its row number and reason.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row: int, error: str):
+        """Records a rejected row."""
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self) -> dict:
+        """Returns the report as the response payload."""
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def _write_chunk(chunk: list[tuple[int, SweetCreate]], report: ImportReport):
+    """Resolves the chunk's categories in one lookup and inserts it unordered."""
+    categories = await category_cache.get_many_by_name(
+        data.category for _, data in chunk
+    )
+
+    rows, documents = [], []
+    for row_number, data in chunk:
+        category = categories.get(data.category)
+        if category is None:
+            report.add_error(row_number, f"Category '{data.category}' not found")
+            continue
+        try:
+            document = SweetModel(
+                name=data.name,
+                category=category,
+                price=data.price,
+                quantity=data.quantity,
+                expiry_date=data.expiry_date,
+                # insert_many bypasses document events, so set the grams
+                # and the expired flag here
+                search_grams=name_grams(data.name),
+                expired=data.expiry_date < utc_today(),
+            )
+        except ValidationError as exc:
+            report.add_error(row_number, format_validation_error(exc))
+            continue
+        rows.append(row_number)
+        documents.append(document)
+
+    if not documents:
+        return
+    try:
+        result = await SweetModel.insert_many(documents, ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as exc:
+        details = exc.details
+        report.inserted += details.get("nInserted", 0)
+        for error in details.get("writeErrors", []):
+            report.add_error(rows[error["index"]], error.get("errmsg", "Write failed"))
+
+
+async def import_sweets(
+    rows: AsyncIterator[tuple[int, Optional[dict], Optional[str]]], chunk_size: int
+) -> ImportReport:
+    """
+    Validates rows against `SweetCreate` and writes them in chunks.
+
+    At most `chunk_size` rows are held in memory at a time, whatever the size of
+    the upload. Each chunk costs one category lookup (usually answered by the
+    category cache) and one unordered `insert_many`.
+
+    Args:
+        rows (AsyncIterator): Rows as produced by `iter_rows`.
+        chunk_size (int): Number of rows written per `insert_many`.
+
+    Returns:
+        ImportReport: Counts and per-row errors.
+    """
+    report = ImportReport()
+    chunk = []
+    async for row_number, row, error in rows:
+        if error is not None:
+            report.add_error(row_number, error)
+            continue
+        try:
+            chunk.append((row_number, SweetCreate(**row)))
+        except ValidationError as exc:
+            report.add_error(row_number, format_validation_error(exc))
+            continue
+        if len(chunk) >= chunk_size:
+            await _write_chunk(chunk, report)
+            chunk = []
+
+    if chunk:
+        await _write_chunk(chunk, report)
+    return report
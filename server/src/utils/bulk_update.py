@@ -0,0 +1,215 @@
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from ..models import SweetModel
+from ..schemas.bulk import BulkRestockItem, SweetFilter
+from .category_cache import category_cache
+from .invalidation import invalidation_bus
+from .sales import record_committed_movements
+from .search import name_search_filter, normalize
+from .stock_events import stock_broadcaster, sweet_event
+
+
+def parse_ids(ids: list[str]) -> list[ObjectId]:
+    """
+    Converts sweet IDs from a request body into ObjectIds.
+
+    Raises:
+        HTTPException: 400 listing the IDs that are not valid ObjectIds.
+    """
+    invalid = [sweet_id for sweet_id in ids if not ObjectId.is_valid(sweet_id)]
+    if invalid:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid sweet IDs: {', '.join(invalid[:10])}"
+        )
+    return [ObjectId(sweet_id) for sweet_id in ids]
+
+
+async def sweet_filter(criteria: SweetFilter) -> dict:
+    """
+    Builds the MongoDB filter selecting the sweets of a bulk operation.
+
+    Args:
+        criteria (SweetFilter): The criteria from the request.
+
+    Raises:
+        HTTPException:
+            - 400 if no criterion selects anything, e.g. only an empty name,
+              or an ID is invalid.
+            - 404 if the category does not exist.
+
+    Returns:
+        dict: The filter on the sweets collection.
+    """
+    match = {}
+    if criteria.ids is not None:
+        match["_id"] = {"$in": parse_ids(criteria.ids)}
+    if criteria.category is not None:
+        category = await category_cache.get_by_name(criteria.category)
+        if not category:
+            raise HTTPException(
+                status_code=404, detail=f"Category '{criteria.category}' not found"
+            )
+        match["category.$id"] = category.id
+    if criteria.name and normalize(criteria.name):
+        match.update(name_search_filter(criteria.name))
+    price = {}
+    if criteria.min_price is not None:
+        price["$gte"] = criteria.min_price
+    if criteria.max_price is not None:
+        price["$lte"] = criteria.max_price
+    if price:
+        match["price"] = price
+    # An empty filter would select the whole catalog.
+    if not match:
+        raise HTTPException(
+            status_code=400, detail="At least one filter criterion is required"
+        )
+    return match
+
+
+def price_change(percent: Optional[float], amount: Optional[float]) -> list[dict]:
+    """
+    Builds the update pipeline changing prices relatively or absolutely.
+
+    New prices are rounded to 2 decimals and never go below 0.
+
+    Raises:
+        HTTPException: 400 unless exactly one of `percent` and `amount` is given.
+    """
+    if (percent is None) == (amount is None):
+        raise HTTPException(
+            status_code=400, detail="Give either a percent or an amount change"
+        )
+    if percent is not None:
+        new_price = {"$multiply": ["$price", 1 + percent / 100]}
+    else:
+        new_price = {"$add": ["$price", amount]}
+    return [{"$set": {"price": {"$max": [0, {"$round": [new_price, 2]}]}}}]
+
+
+async def reprice_sweets(match: dict, pipeline: list[dict], dry_run: bool) -> dict:
+    """
+    Changes the price of every matching sweet with a single `update_many`.
+
+    Args:
+        match (dict): The sweets to reprice.
+        pipeline (list[dict]): The price update, see `price_change`.
+        dry_run (bool): Only count the matching sweets.
+
+    Returns:
+        dict: The number of matched and modified sweets.
+    """
+    collection = SweetModel.get_pymongo_collection()
+    if dry_run:
+        matched = await collection.count_documents(match)
+        return {"matched": matched, "modified": 0, "dry_run": True}
+
+    result = await collection.update_many(match, pipeline)
+    if result.modified_count:
+        await invalidation_bus.publish("sweets")
+        stock_broadcaster.publish_resync()
+    return {
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "dry_run": False,
+    }
+
+
+async def restock_sweets(
+    items: list[BulkRestockItem], user: str, dry_run: bool
+) -> dict:
+    """
+    Adds stock to many sweets with a single unordered `bulk_write`.
+
+    Quantities listed twice for the same sweet are added up. The restocked sweets
+    are then read back in one query to record the ledger and push stock events.
+
+    Args:
+        items (list[BulkRestockItem]): The sweets and quantities to add.
+        user (str): Email of the admin restocking.
+        dry_run (bool): Only look up which sweets exist.
+
+    Raises:
+        HTTPException: 400 if an ID is invalid.
+
+    Returns:
+        dict: The number of restocked sweets and the IDs that were not found.
+    """
+    quantities: dict[ObjectId, int] = {}
+    for sweet_id, item in zip(parse_ids([item.id for item in items]), items):
+        quantities[sweet_id] = quantities.get(sweet_id, 0) + item.quantity
+
+    collection = SweetModel.get_pymongo_collection()
+    if dry_run:
+        existing = await collection.find(
+            {"_id": {"$in": list(quantities)}}, projection={"_id": 1}
+        ).to_list(None)
+        found = {doc["_id"] for doc in existing}
+        return {
+            "matched": len(found),
+            "modified": 0,
+            "not_found": [str(key) for key in quantities if key not in found],
+            "dry_run": True,
+        }
+
+    result = await collection.bulk_write(
+        [
+            UpdateOne({"_id": sweet_id}, {"$inc": {"quantity": quantity}})
+            for sweet_id, quantity in quantities.items()
+        ],
+        ordered=False,
+    )
+    sweets = await SweetModel.find({"_id": {"$in": list(quantities)}}).to_list()
+    if sweets:
+        await invalidation_bus.publish("sweets")
+        for sweet in sweets:
+            stock_broadcaster.publish(sweet_event(sweet))
+        await record_committed_movements(
+            [(sweet, quantities[sweet.id], user) for sweet in sweets], "restock"
+        )
+
+    found = {sweet.id for sweet in sweets}
+    return {
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "not_found": [str(key) for key in quantities if key not in found],
+        "dry_run": False,
+    }
+
+
+async def delete_sweets(match: dict, dry_run: bool) -> dict:
+    """
+    Deletes every matching sweet with a single `delete_many`.
+
+    Args:
+        match (dict): The sweets to delete.
+        dry_run (bool): Only count the matching sweets.
+
+    Returns:
+        dict: The number of matched and deleted sweets.
+    """
+    collection = SweetModel.get_pymongo_collection()
+    if dry_run:
+        matched = await collection.count_documents(match)
+        return {"matched": matched, "deleted": 0, "dry_run": True}
+
+    result = await collection.delete_many(match)
+    if result.deleted_count:
+        await invalidation_bus.publish("sweets")
+        stock_broadcaster.publish_resync()
+    return {
+        "matched": result.deleted_count,
+        "deleted": result.deleted_count,
+        "dry_run": False,
+    }
+
+
+__all__ = [
+    "sweet_filter",
+    "price_change",
+    "reprice_sweets",
+    "restock_sweets",
+    "delete_sweets",
+]
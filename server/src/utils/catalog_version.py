@@ -0,0 +1,120 @@
+from typing import Optional
+import hashlib
+import time
+import uuid
+from pymongo import ReturnDocument
+from ..models import CatalogVersionModel
+
+# Epoch of workers that take their versions from the shared counters, which
+# never repeat, so a fixed epoch is enough for their ETags to agree.
+SHARED_EPOCH = "shared"
+
+
+class CatalogVersions:
+    """
+    In-process version counters for the data behind the listing endpoints.
+
+    Every sweet or category write bumps the matching counter, and listing
+    responses are tagged with a strong ETag derived from the counters. Answering
+    `If-None-Match` therefore only compares strings: a 304 costs no database work.
+
+    A single worker counts in memory, with an epoch that is random per process,
+    so a tag issued before a restart never matches by accident. Workers sharing a
+    change stream bus take their versions from the shared counters instead, see
+    `next_shared_version`, and use the fixed `SHARED_EPOCH`, so every worker
+    gives a listing the same ETag.
+    """
+
+    def __init__(self, epoch: Optional[str] = None):
+        self.epoch = epoch or uuid.uuid4().hex[:8]
+        self._versions: dict[str, int] = {}
+
+    def bump(self, *kinds: str):
+        """Marks the given kinds of data (e.g. "sweets", "categories") as changed."""
+        for kind in kinds:
+            self._versions[kind] = self._versions.get(kind, 0) + 1
+
+    def advance(self, kind: str, version: int):
+        """Moves a kind to a shared version, never backwards."""
+        if version > self.version(kind):
+            self._versions[kind] = version
+
+    def version(self, kind: str) -> int:
+        """Returns the current version of a kind of data."""
+        return self._versions.get(kind, 0)
+
+    def etag(self, kinds: tuple[str, ...], variant: str = "") -> str:
+        """
+        Builds the strong ETag of a listing.
+
+        Args:
+            kinds (tuple[str, ...]): The kinds of data the listing is built from.
+            variant (str): Anything else that changes the body for the same data,
+                such as query parameters or the response format.
+
+        Returns:
+            str: The quoted ETag value.
+        """
+        versions = "-".join(f"{kind}.{self.version(kind)}" for kind in kinds)
+        digest = hashlib.blake2s(variant.encode(), digest_size=4).hexdigest()
+        return f'"{self.epoch}-{versions}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Tells whether an `If-None-Match` header matches an ETag.
+
+    Uses the weak comparison required for `If-None-Match`, so `W/"x"` matches
+    `"x"`, and `*` matches anything.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def next_shared_version(kind: str) -> int:
+    """
+    Bumps the shared version of a kind of data and returns it.
+
+    The new version is the previous one plus one, or the current time in
+    milliseconds if that is higher, so counters restarted from an empty
+    collection never reuse a version an ETag was issued for.
+    """
+    now_ms = int(time.time() * 1000)
+    document = await CatalogVersionModel.get_pymongo_collection().find_one_and_update(
+        {"_id": kind},
+        [
+            {
+                "$set": {
+                    "version": {
+                        "$max": [{"$add": [{"$ifNull": ["$version", 0]}, 1]}, now_ms]
+                    }
+                }
+            }
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["version"]
+
+
+async def shared_versions() -> dict[str, int]:
+    """Returns the shared version of every kind of data written so far."""
+    documents = await CatalogVersionModel.get_pymongo_collection().find().to_list(None)
+    return {document["_id"]: document["version"] for document in documents}
+
+
+catalog_versions = CatalogVersions()
+
+__all__ = [
+    "catalog_versions",
+    "etag_matches",
+    "next_shared_version",
+    "shared_versions",
+    "CatalogVersions",
+    "SHARED_EPOCH",
+]
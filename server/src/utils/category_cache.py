@@ -0,0 +1,165 @@
+from typing import Iterable, Optional
+from beanie import PydanticObjectId
+from beanie.operators import In
+from ..models import CategoryModel
+
+
+class CategoryCache:
+    """
+    In-process cache of categories, indexed by both ID and name.
+
+    Categories are written far less often than they are read, so every route
+    resolves them through this cache. Writes go through `put` and `remove`, which
+    keep both indexes in sync. A lookup that misses falls back to MongoDB and
+    caches the result, so the cache is never wrong, only cold.
+
+    Attributes:
+        hits (int): Number of lookups answered from memory.
+        misses (int): Number of lookups that needed a database round trip.
+    """
+
+    def __init__(self):
+        self._by_id: dict[PydanticObjectId, CategoryModel] = {}
+        self._by_name: dict[str, CategoryModel] = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    async def warm(self):
+        """Loads every category from the database, replacing the cached ones."""
+        categories = await CategoryModel.find_all().to_list()
+        self._by_id.clear()
+        self._by_name.clear()
+        for category in categories:
+            self.put(category)
+        self._loaded = True
+
+    def clear(self):
+        """Drops every cached category and resets the counters."""
+        self._by_id.clear()
+        self._by_name.clear()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, category_id: Optional[str] = None):
+        """
+        Drops a category changed by another worker, or all of them without an ID.
+
+        The full listing is reloaded on its next use, since it may now be missing
+        a category.
+        """
+        if category_id is None:
+            self._by_id.clear()
+            self._by_name.clear()
+        else:
+            self.remove(PydanticObjectId(category_id))
+        self._loaded = False
+
+    def put(self, category: CategoryModel):
+        """Adds or replaces a category in the cache (write-through)."""
+        previous = self._by_id.get(category.id)
+        if previous is not None:
+            self._by_name.pop(previous.name, None)
+        self._by_id[category.id] = category
+        self._by_name[category.name] = category
+
+    def remove(self, category_id: PydanticObjectId):
+        """Evicts a category from the cache."""
+        category = self._by_id.pop(category_id, None)
+        if category is not None:
+            self._by_name.pop(category.name, None)
+
+    async def get_by_id(self, category_id: PydanticObjectId) -> Optional[CategoryModel]:
+        """Returns the category with the given ID, or None if it does not exist."""
+        categories = await self.get_many([category_id])
+        return categories.get(category_id)
+
+    async def get_by_name(self, name: str) -> Optional[CategoryModel]:
+        """Returns the category with the given name, or None if it does not exist."""
+        category = self._by_name.get(name)
+        if category is not None:
+            self.hits += 1
+            return category
+
+        self.misses += 1
+        category = await CategoryModel.find_one(CategoryModel.name == name)
+        if category is not None:
+            self.put(category)
+        return category
+
+    async def get_many_by_name(self, names: Iterable[str]) -> dict[str, CategoryModel]:
+        """
+        Resolves several category names at once.
+
+        Names that are not cached are fetched together with a single `$in` query.
+
+        Returns:
+            dict: The found categories keyed by name. Unknown names are left out.
+        """
+        found = {}
+        missing = []
+        for name in set(names):
+            category = self._by_name.get(name)
+            if category is not None:
+                found[name] = category
+            else:
+                missing.append(name)
+
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            for category in await CategoryModel.find(
+                In(CategoryModel.name, missing)
+            ).to_list():
+                self.put(category)
+                found[category.name] = category
+        return found
+
+    async def get_many(
+        self, category_ids: Iterable[PydanticObjectId]
+    ) -> dict[PydanticObjectId, CategoryModel]:
+        """
+        Resolves several category IDs at once.
+
+        IDs that are not cached are fetched together with a single `$in` query.
+
+        Returns:
+            dict: The found categories keyed by ID. Unknown IDs are left out.
+        """
+        found = {}
+        missing = []
+        for category_id in set(category_ids):
+            category = self._by_id.get(category_id)
+            if category is not None:
+                found[category_id] = category
+            else:
+                missing.append(category_id)
+
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            for category in await CategoryModel.find(
+                In(CategoryModel.id, missing)
+            ).to_list():
+                self.put(category)
+                found[category.id] = category
+        return found
+
+    async def all(self) -> list[CategoryModel]:
+        """Returns every category, loading them all on first use."""
+        if self._loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+            await self.warm()
+        return list(self._by_id.values())
+
+    def stats(self) -> dict[str, int]:
+        """Returns the hit and miss counters and the number of cached categories."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._by_id)}
+
+
+category_cache = CategoryCache()
+
+__all__ = ["category_cache", "CategoryCache"]
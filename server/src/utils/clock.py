@@ -0,0 +1,20 @@
+import datetime
+
+
+def utcnow() -> datetime.datetime:
+    """Returns the current time as stored by MongoDB (naive UTC, millisecond precision)."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def utc_today() -> datetime.date:
+    """Returns the current UTC day."""
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def start_of_day(day: datetime.date) -> datetime.datetime:
+    """Returns midnight of a day, the way dates are stored by MongoDB (naive UTC)."""
+    return datetime.datetime.combine(day, datetime.time.min)
+
+
+__all__ = ["utcnow", "utc_today", "start_of_day"]
@@ -1,7 +1,66 @@
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from .env import env_settings
-from ..models import UserModel, CategoryModel, SweetModel
+from .pool_monitor import pool_monitor
+from .metrics import command_metrics
+from .indexes import reconcile_indexes
+from .search import name_grams
+from pymongo import UpdateOne
+from ..models import (
+    UserModel,
+    CategoryModel,
+    SweetModel,
+    ReservationModel,
+    SaleModel,
+    DailySalesModel,
+    RateLimitModel,
+    InvalidationModel,
+    IdempotencyModel,
+    CatalogVersionModel,
+)
+
+DOCUMENT_MODELS = [
+    UserModel,
+    CategoryModel,
+    SweetModel,
+    ReservationModel,
+    SaleModel,
+    DailySalesModel,
+    RateLimitModel,
+    InvalidationModel,
+    IdempotencyModel,
+    CatalogVersionModel,
+]
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def client_options() -> dict:
+    """
+    Builds the Motor client options from the environment settings.
+
+    Returns:
+        dict: Keyword arguments for `AsyncIOMotorClient`.
+    """
+    options = {
+        "maxPoolSize": env_settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": env_settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": env_settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": env_settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": env_settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": env_settings.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": env_settings.MONGO_SOCKET_TIMEOUT_MS,
+        "event_listeners": [pool_monitor, command_metrics],
+    }
+    if env_settings.MONGO_COMPRESSORS:
+        options["compressors"] = env_settings.MONGO_COMPRESSORS
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def get_client() -> Optional[AsyncIOMotorClient]:
+    """Returns the client created by `init_db`, or None if it is not running."""
+    return _client
 
 
 async def init_db():
@@ -12,13 +71,68 @@ async def init_db():
         - UserModel
         - CategoryModel
         - SweetModel
+        - ReservationModel
+        - SaleModel
+        - DailySalesModel
+        - RateLimitModel
+        - InvalidationModel
+        - IdempotencyModel
+        - CatalogVersionModel
 
     Environment Variables Required (via `env_settings`):
         - MONGO_URI (str): MongoDB connection URI (e.g., "mongodb://localhost:27017").
         - MONGO_DB (str): Name of the MongoDB database to use.
+
+    Connection pool and timeout settings come from the `MONGO_*` settings, see
+    `client_options`. The single client is kept for the lifetime of the app, warmed
+    up with a ping and closed by `close_db`.
+
+    Indexes declared on the models are reconciled with the database afterwards,
+    see `reconcile_indexes`.
     """
-    client = AsyncIOMotorClient(env_settings.MONGO_URI)
+    global _client
+    if _client is not None:
+        _client.close()
+    client = AsyncIOMotorClient(env_settings.MONGO_URI, **client_options())
+    await client.admin.command("ping")
+    _client = client
+
     database = client[env_settings.MONGO_DB]
     await init_beanie(
-        database=database, document_models=[UserModel, CategoryModel, SweetModel]
+        database=database, document_models=DOCUMENT_MODELS, skip_indexes=True
+    )
+    await reconcile_indexes(DOCUMENT_MODELS)
+    await backfill_search_grams()
+
+
+async def close_db():
+    """Closes the client created by `init_db` and all its pooled connections."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+async def backfill_search_grams(batch_size: int = 500):
+    """
+    Computes the name search n-grams of sweets stored before they existed.
+
+    Args:
+        batch_size (int): Number of sweets updated per `bulk_write`.
+    """
+    collection = SweetModel.get_pymongo_collection()
+    cursor = collection.find(
+        {"search_grams": {"$exists": False}}, projection={"name": 1}
     )
+    operations = []
+    async for doc in cursor:
+        operations.append(
+            UpdateOne(
+                {"_id": doc["_id"]}, {"$set": {"search_grams": name_grams(doc["name"])}}
+            )
+        )
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
+from typing import Literal, Optional
 
 
 class EnvSettings(BaseSettings):
@@ -13,6 +14,36 @@ class EnvSettings(BaseSettings):
     SECRET_KEY: str = Field(...)
     ALGORITHM: str = Field(...)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(...)
+    TOKEN_CACHE_SIZE: int = Field(10000)
+    BCRYPT_ROUNDS: int = Field(12, ge=4, le=31)
+    PASSWORD_HASH_WORKERS: int = Field(4, ge=1)
+    PASSWORD_HASH_QUEUE_LIMIT: int = Field(100, ge=0)
+    MONGO_MAX_POOL_SIZE: int = Field(100, ge=1)
+    MONGO_MIN_POOL_SIZE: int = Field(10, ge=0)
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = Field(None, ge=0)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = Field(None, ge=0)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = Field(30000, ge=0)
+    MONGO_CONNECT_TIMEOUT_MS: int = Field(20000, ge=0)
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = Field(None, ge=0)
+    MONGO_COMPRESSORS: str = Field("", description="e.g. 'zstd,snappy,zlib'")
+    STOCK_EVENTS_SOURCE: Literal["local", "change_stream"] = Field("local")
+    STOCK_EVENTS_MAX_PENDING: int = Field(1000, ge=1)
+    PURCHASE_COALESCING: bool = Field(False)
+    PURCHASE_COALESCE_WINDOW_MS: float = Field(5, ge=0)
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = Field(30, gt=0)
+    EXPIRY_SWEEP_INTERVAL_SECONDS: float = Field(300, gt=0)
+    RATE_LIMIT_ENABLED: bool = Field(True)
+    RATE_LIMIT_BACKEND: Literal["local", "mongo"] = Field("local")
+    RATE_LIMIT_LOGIN: str = Field("10/minute", description="Per client IP and email")
+    RATE_LIMIT_REGISTER: str = Field("5/minute", description="Per client IP and email")
+    RATE_LIMIT_TRUSTED_PROXIES: int = Field(
+        0, ge=0, description="Reverse proxies appending to X-Forwarded-For"
+    )
+    INVALIDATION_BUS: Literal["local", "change_stream"] = Field("local")
+    INVALIDATION_COALESCE_MS: float = Field(50, ge=0)
+    HOST: str = Field("0.0.0.0")
+    PORT: int = Field(8000, ge=1, le=65535)
+    WORKERS: int = Field(1, ge=1)
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,82 @@
+import datetime
+from ..models import SweetModel
+from .background import PeriodicTask
+from .invalidation import invalidation_bus
+from .clock import start_of_day, utc_today
+from .env import env_settings
+
+# Sweets flagged per `update_many` by the expiry sweeper.
+EXPIRY_SWEEP_BATCH_SIZE = 1000
+
+# Filter hiding expired sweets from listings and searches.
+NOT_EXPIRED = {"expired": {"$ne": True}}
+
+
+async def flag_expired_sweets(batch_size: int = EXPIRY_SWEEP_BATCH_SIZE) -> int:
+    """
+    Flags the sweets whose expiry date has passed.
+
+    Unflagged expired sweets, including ones written before the flag existed,
+    are found through the `expired_expiry_date` index a batch of IDs at a time
+    and flagged with one `update_many` per batch, so a sweep never holds a long
+    write. Sweets whose expiry date was moved forward are unflagged the same way.
+
+    Args:
+        batch_size (int): Number of sweets flagged per `update_many`.
+
+    Returns:
+        int: The number of sweets flagged as expired.
+    """
+    collection = SweetModel.get_pymongo_collection()
+    today = start_of_day(utc_today())
+
+    flagged = 0
+    while True:
+        batch = await (
+            collection.find(
+                {**NOT_EXPIRED, "expiry_date": {"$lt": today}},
+                projection={"_id": 1},
+            )
+            .limit(batch_size)
+            .to_list(None)
+        )
+        if not batch:
+            break
+        result = await collection.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in batch]}},
+            {"$set": {"expired": True}},
+        )
+        flagged += result.modified_count
+
+    unflagged = await collection.update_many(
+        {"expired": True, "expiry_date": {"$gte": today}},
+        {"$set": {"expired": False}},
+    )
+    if flagged or unflagged.modified_count:
+        await invalidation_bus.publish("sweets")
+    return flagged
+
+
+async def expiring_sweets(days: int) -> list[SweetModel]:
+    """
+    Returns the sweets expiring from today up to `days` days ahead, soonest first.
+
+    Served by a range scan on the `expiry_date` index.
+    """
+    today = utc_today()
+    return (
+        await SweetModel.find(
+            SweetModel.expiry_date >= start_of_day(today),
+            SweetModel.expiry_date
+            <= start_of_day(today + datetime.timedelta(days=days)),
+        )
+        .sort("expiry_date", "_id")
+        .to_list()
+    )
+
+
+expiry_sweeper = PeriodicTask(
+    "Expiry sweep", env_settings.EXPIRY_SWEEP_INTERVAL_SECONDS, flag_expired_sweets
+)
+
+__all__ = ["flag_expired_sweets", "expiring_sweets", "expiry_sweeper", "NOT_EXPIRED"]
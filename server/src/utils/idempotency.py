@@ -0,0 +1,289 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+import asyncio
+import hashlib
+import time
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from ..models import IdempotencyModel
+from .clock import utcnow
+
+# Seconds a completed response stays in memory in front of the collection.
+IDEMPOTENCY_CACHE_SECONDS = 60
+IDEMPOTENCY_CACHE_SIZE = 10000
+# How long a duplicate waits for the worker running the first request, and how
+# often it checks.
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+# Seconds after which a claim that never completed is taken to belong to a dead
+# worker and may be taken over. Must exceed the time a request can take.
+IDEMPOTENCY_LEASE_SECONDS = 60
+# Header added to responses that were replayed rather than produced.
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def digest(*parts: str) -> str:
+    """Hashes the given strings into a fixed-size key."""
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Runs each request sent with an `Idempotency-Key` at most once.
+
+    Completed responses, including client errors, are stored in the
+    TTL-indexed `idempotency_keys` collection, and the recent ones are also
+    kept in memory. A repeated key is answered from there without running the
+    request again. A duplicate that arrives while the first request is still
+    running waits for it: in the same worker on the first request's future,
+    across workers by polling the stored record, which the first request
+    claims before running. A claim is a lease: if it is not completed within
+    `lease_seconds`, its worker is assumed dead and the next request with the
+    key takes it over.
+
+    Server errors are not stored, so the request can be retried.
+
+    Attributes:
+        hits (int): Repeats answered from memory.
+        replays (int): Repeats answered from the collection.
+        waits (int): Duplicates that waited for a running request.
+        runs (int): Requests that actually ran.
+    """
+
+    def __init__(
+        self,
+        cache_seconds: float = IDEMPOTENCY_CACHE_SECONDS,
+        cache_size: int = IDEMPOTENCY_CACHE_SIZE,
+        wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS,
+        lease_seconds: float = IDEMPOTENCY_LEASE_SECONDS,
+    ):
+        self.cache_seconds = cache_seconds
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self._cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._running: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.replays = 0
+        self.waits = 0
+        self.runs = 0
+
+    def _cached(self, record_id: str) -> Optional[dict]:
+        entry = self._cache.get(record_id)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at <= time.monotonic():
+            del self._cache[record_id]
+            return None
+        return record
+
+    def _remember(self, record: dict):
+        self._cache[record["_id"]] = (time.monotonic() + self.cache_seconds, record)
+        self._cache.move_to_end(record["_id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def run(
+        self,
+        record_id: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable],
+    ) -> ORJSONResponse:
+        """
+        Runs `handler` unless the same key already ran, and returns the response.
+
+        Args:
+            record_id (str): Digest of the user, the route and the key.
+            fingerprint (str): Digest of the request body.
+            handler (Callable): Runs the request and returns its response data.
+
+        Raises:
+            HTTPException:
+                - 422 if the key was used with a different request body.
+                - 409 if another worker is still running the key after waiting.
+
+        Returns:
+            ORJSONResponse: The response of the first request with this key.
+        """
+        record = self._cached(record_id)
+        if record is not None:
+            self.hits += 1
+            return self._respond(record, fingerprint, replayed=True)
+
+        running = self._running.get(record_id)
+        if running is not None:
+            self.waits += 1
+            record = await asyncio.shield(running)
+            return self._respond(record, fingerprint, replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._running[record_id] = future
+        try:
+            record, replayed = await self._claim_and_run(
+                record_id, fingerprint, handler
+            )
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Waiters re-raise it; without any, it must not be reported as lost.
+            future.exception()
+            raise
+        else:
+            future.set_result(record)
+        finally:
+            del self._running[record_id]
+
+        self._remember(record)
+        return self._respond(record, fingerprint, replayed=replayed)
+
+    async def _claim_and_run(
+        self, record_id: str, fingerprint: str, handler
+    ) -> tuple[dict, bool]:
+        """Claims the key in the collection and runs the request, or waits for it."""
+        collection = IdempotencyModel.get_pymongo_collection()
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            now = utcnow()
+            try:
+                await collection.insert_one(
+                    {
+                        "_id": record_id,
+                        "fingerprint": fingerprint,
+                        "created_at": now,
+                        "claimed_at": now,
+                    }
+                )
+                break
+            except DuplicateKeyError:
+                stored = await collection.find_one({"_id": record_id})
+            if stored is not None and stored.get("status_code") is not None:
+                self.replays += 1
+                return stored, True
+            if stored is not None and await self._take_over(stored, fingerprint, now):
+                break
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            # Claimed by another worker; if that request failed, the claim is
+            # gone and the next attempt takes it over.
+            self.waits += 1
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+        self.runs += 1
+        try:
+            status_code, body = status.HTTP_200_OK, jsonable_encoder(await handler())
+        except HTTPException as exc:
+            if exc.status_code >= 500:
+                await collection.delete_one({"_id": record_id})
+                raise
+            status_code, body = exc.status_code, {"detail": exc.detail}
+        except BaseException:
+            await collection.delete_one({"_id": record_id})
+            raise
+
+        try:
+            await collection.update_one(
+                {"_id": record_id},
+                {"$set": {"status_code": status_code, "body": body}},
+            )
+        except PyMongoError:
+            # Without the result, release the key rather than hold it until the
+            # lease runs out; if this fails too, the lease still frees it.
+            try:
+                await collection.delete_one({"_id": record_id})
+            except PyMongoError:
+                pass
+            raise
+        record = {
+            "_id": record_id,
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "body": body,
+        }
+        return record, False
+
+    async def _take_over(self, stored: dict, fingerprint: str, now) -> bool:
+        """Claims a pending record whose lease ran out, if no one else did."""
+        claimed_at = stored.get("claimed_at")
+        if claimed_at is not None:
+            if claimed_at.tzinfo is None:
+                claimed_at = claimed_at.replace(tzinfo=now.tzinfo)
+            if (now - claimed_at).total_seconds() < self.lease_seconds:
+                return False
+        result = await IdempotencyModel.get_pymongo_collection().update_one(
+            {"_id": stored["_id"], "status_code": None, "claimed_at": claimed_at},
+            {"$set": {"fingerprint": fingerprint, "claimed_at": now}},
+        )
+        return result.modified_count == 1
+
+    def _respond(self, record: dict, fingerprint: str, replayed: bool):
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        headers = {REPLAYED_HEADER: "true"} if replayed else None
+        return ORJSONResponse(
+            record["body"], status_code=record["status_code"], headers=headers
+        )
+
+    def clear(self):
+        """Drops the responses kept in memory and resets the counters."""
+        self._cache.clear()
+        self.hits = 0
+        self.replays = 0
+        self.waits = 0
+        self.runs = 0
+
+    def stats(self) -> dict[str, int]:
+        """Returns the store counters and the number of responses in memory."""
+        return {
+            "hits": self.hits,
+            "replays": self.replays,
+            "waits": self.waits,
+            "runs": self.runs,
+            "size": len(self._cache),
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def idempotent(
+    idempotency_key: Optional[str],
+    request: Request,
+    user: dict,
+    payload: BaseModel,
+    handler: Callable[[], Awaitable],
+):
+    """
+    Runs a route handler at most once per `Idempotency-Key`.
+
+    Keys are scoped to the user and the route, so the same key sent by another
+    user or to another sweet is a different request.
+
+    Args:
+        idempotency_key (Optional[str]): The header value; without it the
+            handler simply runs.
+        request (Request): The incoming request.
+        user (dict): The authenticated user.
+        payload (BaseModel): The request body, which must match on retries.
+        handler (Callable): Runs the request and returns its response data.
+
+    Returns:
+        The handler's response data, or the stored response of the first request.
+    """
+    if idempotency_key is None:
+        return await handler()
+    record_id = digest(user["email"], request.method, request.url.path, idempotency_key)
+    fingerprint = digest(payload.model_dump_json())
+    return await idempotency_store.run(record_id, fingerprint, handler)
+
+
+__all__ = ["idempotency_store", "idempotent", "IdempotencyStore", "REPLAYED_HEADER"]
@@ -0,0 +1,76 @@
+from typing import Sequence, Type
+from beanie import Document
+from pymongo import IndexModel
+
+# Options that MongoDB reports back but that do not change what an index does.
+IGNORED_INDEX_OPTIONS = {"key", "name", "v", "ns", "background"}
+
+
+def _index_options(spec: dict) -> dict:
+    """Strip the key and bookkeeping fields from an index description."""
+    return {k: v for k, v in spec.items() if k not in IGNORED_INDEX_OPTIONS}
+
+
+def _index_key(key) -> list:
+    """Normalize an index key (SON, dict or list of pairs) to a list of pairs."""
+    if hasattr(key, "items"):
+        key = key.items()
+    return [(field, direction) for field, direction in key]
+
+
+async def reconcile_indexes(
+    document_models: Sequence[Type[Document]],
+) -> dict[str, dict[str, list[str]]]:
+    """
+    Brings the indexes of each collection in line with the indexes declared in
+    the model's `Settings.indexes`.
+
+    Indexes that already exist with the same key and options are left untouched.
+    Missing indexes are created, and an existing index on the same key but with
+    different options (e.g. missing `unique`) is dropped and rebuilt. Indexes
+    that are not declared are never dropped.
+
+    Args:
+        document_models (Sequence[Type[Document]]): Initialized Beanie models.
+
+    Returns:
+        dict: Per collection, the names of the created, dropped and unchanged indexes.
+    """
+    report = {}
+    for model in document_models:
+        collection = model.get_pymongo_collection()
+        existing = await collection.index_information()
+        declared: list[IndexModel] = [
+            index.index for index in model.get_settings().indexes
+        ]
+
+        created, dropped, unchanged = [], [], []
+        to_create = []
+        for index in declared:
+            spec = index.document
+            match = next(
+                (
+                    (name, info)
+                    for name, info in existing.items()
+                    if _index_key(info["key"]) == _index_key(spec["key"])
+                ),
+                None,
+            )
+            if match:
+                name, info = match
+                if _index_options(info) == _index_options(spec):
+                    unchanged.append(name)
+                    continue
+                await collection.drop_index(name)
+                dropped.append(name)
+            to_create.append(index)
+
+        if to_create:
+            created = await collection.create_indexes(to_create)
+
+        report[model.get_collection_name()] = {
+            "created": created,
+            "dropped": dropped,
+            "unchanged": unchanged,
+        }
+    return report
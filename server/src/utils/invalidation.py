@@ -0,0 +1,283 @@
+from typing import Callable, Optional
+import asyncio
+import uuid
+from pymongo.errors import OperationFailure, PyMongoError
+from ..models import InvalidationModel
+from .clock import utcnow
+from .catalog_version import CatalogVersions, catalog_versions, SHARED_EPOCH
+from .catalog_version import next_shared_version, shared_versions
+from .category_cache import CategoryCache, category_cache
+from .env import env_settings
+from .stock_events import CHANGE_STREAM_MAX_RETRY_DELAY, CHANGE_STREAM_RETRY_DELAY
+
+# Called with the changed document, if known, and the shared version, if any.
+Handler = Callable[[Optional[str], Optional[int]], None]
+
+
+class LocalBroker:
+    """
+    Stand-in for a message broker, relaying messages between buses of one process.
+
+    Used when a single worker serves the app, and by tests to run several buses
+    side by side as if they were separate workers.
+    """
+
+    def __init__(self):
+        self._buses: list["InvalidationBus"] = []
+
+    def attach(self, bus: "InvalidationBus"):
+        """Connects a bus, which then receives every message sent."""
+        self._buses.append(bus)
+
+    def send(self, message: dict):
+        """Delivers a message to every connected bus."""
+        for bus in list(self._buses):
+            bus.receive(message)
+
+
+class InvalidationBus:
+    """
+    Tells every worker which in-memory data changed, so none of them serves it stale.
+
+    Writers call `publish` after a committed write. The change is applied to this
+    worker at once, then sent to the other workers, which apply it when they
+    receive it. Applying a change runs the handlers subscribed to its kind, which
+    drop or bump the matching cached data.
+
+    With the `local` transport, messages go through a `LocalBroker` and only reach
+    buses of the same process. With the `change_stream` transport, they are
+    inserted in the `invalidations` collection, which every worker watches through
+    a MongoDB change stream (this needs a replica set or sharded cluster). Each
+    message then also carries the new shared version of its kind, see
+    `next_shared_version`, which handlers receive along with the key.
+
+    Since every purchase publishes a change, the change stream transport
+    coalesces them: the changes of a kind published within `coalesce_ms` share
+    one shared version bump and one message, so a flash sale does not turn the
+    kind's version document into a hot spot. Other workers see the changes up to
+    `coalesce_ms` later; this worker applies them at once.
+
+    Attributes:
+        transport (str): "local" or "change_stream".
+        coalesce_ms (float): How long changes are collected before they are
+            sent, with the change stream transport. 0 sends each change at once.
+        origin (str): Random ID of this worker, used to skip its own messages.
+        published (int): Changes published by this worker.
+        sent (int): Messages sent by this worker, one per coalesced batch.
+        received (int): Messages applied from other workers.
+        resyncs (int): Times every kind was invalidated because messages may have
+            been missed.
+    """
+
+    def __init__(
+        self,
+        transport: str = "local",
+        broker: Optional[LocalBroker] = None,
+        coalesce_ms: float = 0,
+    ):
+        self.transport = transport
+        self.coalesce_ms = coalesce_ms
+        self.origin = uuid.uuid4().hex
+        self.broker = broker or LocalBroker()
+        self.broker.attach(self)
+        self.published = 0
+        self.sent = 0
+        self.received = 0
+        self.resyncs = 0
+        self._handlers: dict[str, list[Handler]] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        self._pending: dict[str, set[Optional[str]]] = {}
+        self._senders: set[asyncio.Task] = set()
+
+    def subscribe(self, kind: str, handler: Handler):
+        """Runs `handler(key, version)` whenever data of the given kind changes."""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def apply(
+        self, kind: str, key: Optional[str] = None, version: Optional[int] = None
+    ):
+        """Runs the handlers of a change, in this worker only."""
+        for handler in self._handlers.get(kind, []):
+            handler(key, version)
+
+    def resync(self, versions: Optional[dict[str, int]] = None):
+        """
+        Invalidates every kind of data, after messages may have been missed.
+
+        Args:
+            versions (Optional[dict[str, int]]): The shared versions, when the
+                change stream transport is used.
+        """
+        self.resyncs += 1
+        for kind in list(self._handlers):
+            self.apply(kind, None, None if versions is None else versions.get(kind, 0))
+
+    async def sync(self):
+        """Resyncs with the shared versions; a no-op with the local transport."""
+        if self.transport == "change_stream":
+            self.resync(await shared_versions())
+
+    async def publish(self, kind: str, key: Optional[str] = None):
+        """
+        Applies a change to this worker and sends it to the others.
+
+        A message that cannot be sent is logged rather than raised, since the
+        write it describes is already committed.
+
+        Args:
+            kind (str): The kind of data that changed, e.g. "sweets".
+            key (Optional[str]): The changed document, if only one changed.
+        """
+        self.published += 1
+        self.apply(kind, key)
+        if self.transport != "change_stream":
+            self.sent += 1
+            self.broker.send(self._message(kind, key))
+            return
+        if self.coalesce_ms <= 0:
+            await self._send(kind, {key})
+            return
+        if kind not in self._pending:
+            self._pending[kind] = set()
+            sender = asyncio.create_task(self._send_later(kind))
+            self._senders.add(sender)
+            sender.add_done_callback(self._senders.discard)
+        self._pending[kind].add(key)
+
+    def _message(self, kind: str, key: Optional[str]) -> dict:
+        return {"kind": kind, "key": key, "origin": self.origin, "created_at": utcnow()}
+
+    async def _send_later(self, kind: str):
+        await asyncio.sleep(self.coalesce_ms / 1000)
+        keys = self._pending.pop(kind, None)
+        if keys:
+            await self._send(kind, keys)
+
+    async def _send(self, kind: str, keys: set[Optional[str]]):
+        """Bumps the shared version of a kind and sends one message for `keys`."""
+        key = next(iter(keys)) if len(keys) == 1 else None
+        message = self._message(kind, key)
+        try:
+            message["version"] = await next_shared_version(kind)
+            self.apply(kind, key, message["version"])
+            await InvalidationModel.get_pymongo_collection().insert_one(message)
+            self.sent += 1
+        except PyMongoError as exc:
+            print(f"⚠️ Could not send the '{kind}' invalidation: {exc}")
+
+    async def flush(self):
+        """Sends the changes still being coalesced right away."""
+        pending, self._pending = self._pending, {}
+        for kind, keys in pending.items():
+            await self._send(kind, keys)
+
+    def receive(self, message: dict):
+        """Applies a message sent by another worker; our own are skipped."""
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self.apply(message["kind"], message.get("key"), message.get("version"))
+
+    async def watch(self, collection):
+        """
+        Applies the messages inserted in the invalidations collection until cancelled.
+
+        The stream resumes after the last seen message when reopened. When it
+        opens without a resume point, or the resume point is gone from the oplog,
+        messages may have been missed and every kind is invalidated.
+
+        Args:
+            collection (AsyncIOMotorCollection): The invalidations collection.
+        """
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token = None
+        delay = CHANGE_STREAM_RETRY_DELAY
+        while True:
+            try:
+                async with collection.watch(
+                    pipeline, resume_after=resume_token
+                ) as stream:
+                    if resume_token is None:
+                        await self.sync()
+                    delay = CHANGE_STREAM_RETRY_DELAY
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.receive(change["fullDocument"])
+            except PyMongoError as exc:
+                print(f"⚠️ Invalidation stream failed, retrying in {delay}s: {exc}")
+                if isinstance(exc, OperationFailure):
+                    resume_token = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, CHANGE_STREAM_MAX_RETRY_DELAY)
+
+    async def start(self, collection):
+        """
+        Loads the shared versions and starts watching the collection, when the
+        change stream transport is used.
+        """
+        if self.transport == "change_stream" and self._watcher is None:
+            await self.sync()
+            self._watcher = asyncio.create_task(self.watch(collection))
+
+    async def stop(self):
+        """Sends the pending changes and stops the change stream watcher, if running."""
+        await self.flush()
+        await asyncio.gather(*self._senders)
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def stats(self) -> dict[str, int]:
+        """Returns the bus counters."""
+        return {
+            "published": self.published,
+            "sent": self.sent,
+            "received": self.received,
+            "resyncs": self.resyncs,
+        }
+
+
+def subscribe_caches(
+    bus: InvalidationBus, versions: CatalogVersions, categories: CategoryCache
+):
+    """
+    Connects the in-memory caches of a worker to its invalidation bus.
+
+    Every change bumps the catalog version of its kind, so listing ETags change
+    on all workers. With the change stream transport, versions follow the shared
+    counters and the epoch is fixed, so all workers give a listing the same ETag.
+    Category changes also evict the category from the cache.
+    """
+    if bus.transport == "change_stream":
+        versions.epoch = SHARED_EPOCH
+
+    def on_change(kind: str, version: Optional[int]):
+        if version is None:
+            versions.bump(kind)
+        else:
+            versions.advance(kind, version)
+
+    bus.subscribe("sweets", lambda key, version: on_change("sweets", version))
+
+    def on_category_change(key: Optional[str], version: Optional[int]):
+        on_change("categories", version)
+        categories.invalidate(key)
+
+    bus.subscribe("categories", on_category_change)
+
+
+invalidation_bus = InvalidationBus(
+    env_settings.INVALIDATION_BUS, coalesce_ms=env_settings.INVALIDATION_COALESCE_MS
+)
+subscribe_caches(invalidation_bus, catalog_versions, category_cache)
+
+__all__ = [
+    "invalidation_bus",
+    "subscribe_caches",
+    "InvalidationBus",
+    "LocalBroker",
+]
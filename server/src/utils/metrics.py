@@ -0,0 +1,284 @@
+from bisect import bisect_left
+from typing import Callable, Iterable
+import threading
+import time
+from fastapi import Request
+from pymongo import monitoring
+
+# Default Prometheus latency buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """Renders a Prometheus label set such as `{method="GET",status="200"}`."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base class of the metric types: a name, help text and label names.
+
+    Metrics are updated both from the event loop and from the driver threads
+    Motor runs pymongo on, so every update happens under a lock.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        """Returns the HELP and TYPE lines of the metric."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set."""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Adds `amount` to the value of the given label set."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Returns the current value of the given label set."""
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        """Returns the metric in Prometheus text format, one line per sample."""
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    """A value that can go up and down per label set."""
+
+    type_name = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        """Subtracts `amount` from the value of the given label set."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations per label set."""
+
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, *labels: str):
+        """Records one observation for the given label set."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(
+                labels, ([0] * len(self.buckets), 0.0, 0)
+            )
+            if index < len(counts):
+                counts[index] += 1
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def count(self, *labels: str) -> int:
+        """Returns the number of observations of the given label set."""
+        return self._values.get(labels, (None, 0.0, 0))[2]
+
+    def render(self) -> list[str]:
+        """Returns the buckets, sum and count lines in Prometheus text format."""
+        with self._lock:
+            items = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._values.items()
+            )
+        lines = self.header()
+        bucket_names = self.label_names + ("le",)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(bucket_names, labels + (repr(bound),))} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels(bucket_names, labels + ('+Inf',))} {count}"
+            )
+            lines.append(
+                f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}"
+            )
+            lines.append(
+                f"{self.name}_count{_format_labels(self.label_names, labels)} {count}"
+            )
+        return lines
+
+
+class Registry:
+    """Holds the metrics exported by `/metrics` and renders them as text.
+
+    Collectors are callables run at render time that return extra metrics, used
+    to export counters kept elsewhere (caches, connection pool).
+    """
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric):
+        """Adds a metric to the export and returns it."""
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]):
+        """Adds a callable returning extra metrics built at render time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Returns every metric in Prometheus text exposition format."""
+        lines = []
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests handled, by route template and status code.",
+        ["method", "route", "status"],
+    )
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency in seconds, by route template.",
+        ["method", "route"],
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge(
+        "http_requests_in_flight",
+        "HTTP requests currently being handled.",
+        ["method"],
+    )
+)
+mongo_commands_total = registry.register(
+    Counter(
+        "mongo_commands_total",
+        "MongoDB commands sent, by collection, command and outcome.",
+        ["collection", "command", "outcome"],
+    )
+)
+mongo_command_duration_seconds = registry.register(
+    Histogram(
+        "mongo_command_duration_seconds",
+        "MongoDB command round trip time in seconds, by collection and command.",
+        ["collection", "command"],
+    )
+)
+
+
+async def metrics_middleware(request: Request, call_next):
+    """
+    HTTP middleware recording request counts, latency and in-flight requests.
+
+    Requests are labelled with the matched route template (e.g.
+    `/api/sweets/{sweet_id}/purchase`) rather than the raw path, so IDs do not
+    create one time series each.
+    """
+    method = request.method
+    http_requests_in_flight.inc(method)
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        http_requests_in_flight.dec(method)
+        route = request.scope.get("route")
+        template = route.path if route is not None else "unmatched"
+        http_requests_total.inc(method, template, status)
+        http_request_duration_seconds.observe(elapsed, method, template)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    pymongo command listener feeding the `mongo_*` metrics.
+
+    The collection is read from the started event (the value of the command's
+    first key, or `collection` for `getMore`) and kept until the matching
+    succeeded or failed event, which carries the duration.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            target = event.command.get("collection", "")
+        if not isinstance(target, str):
+            target = ""
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                target,
+                event.command_name,
+            )
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            labels = self._pending.pop(
+                (event.connection_id, event.request_id), ("", event.command_name)
+            )
+        mongo_commands_total.inc(*labels, outcome)
+        mongo_command_duration_seconds.observe(event.duration_micros / 1e6, *labels)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+command_metrics = CommandMetrics()
+
+__all__ = [
+    "registry",
+    "metrics_middleware",
+    "command_metrics",
+    "Counter",
+    "Gauge",
+    "Histogram",
+]
@@ -1,6 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from .env import env_settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=env_settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL while hashing, so a thread pool spreads the work over
+# all cores without blocking the event loop.
+_executor = ThreadPoolExecutor(
+    max_workers=env_settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_pending = 0
 
 
 def hash_password(password: str) -> str:
@@ -28,3 +42,58 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         bool: True if the password is correct, False otherwise.
     """
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verifies a password and rehashes it if the stored hash uses stale settings.
+
+    Args:
+        plain_password (str): The plain-text password provided by the user.
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        tuple[bool, Optional[str]]: Whether the password is correct, and a new hash
+        to store when the old one was made with a different bcrypt cost.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def _run_in_pool(func, *args):
+    """
+    Runs a blocking password function on the bcrypt worker pool.
+
+    Raises:
+        HTTPException: 503 if the pool already has `PASSWORD_HASH_QUEUE_LIMIT`
+            jobs waiting on top of the ones being processed.
+    """
+    global _pending
+    limit = env_settings.PASSWORD_HASH_WORKERS + env_settings.PASSWORD_HASH_QUEUE_LIMIT
+    if _pending >= limit:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hashes a password on the worker pool, see `hash_password`."""
+    return await _run_in_pool(hash_password, password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Verifies a password on the worker pool, see `verify_and_update_password`."""
+    return await _run_in_pool(
+        verify_and_update_password, plain_password, hashed_password
+    )
@@ -0,0 +1,91 @@
+import threading
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener that keeps live counters of the Motor client's pool.
+
+    Counters are summed over every server the client talks to. pymongo calls the
+    listener synchronously from the driver, including from its background
+    threads, so each callback only does integer arithmetic under a lock.
+
+    Attributes:
+        open (int): Connections currently open.
+        checked_out (int): Connections currently lent to an operation.
+        waiting (int): Operations currently waiting for a free connection.
+        checkout_failures (int): Checkouts that failed, e.g. on wait queue timeout.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self._lock = threading.Lock()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self, max_pool_size: int) -> dict:
+        """
+        Returns the pool counters and how saturated the pool is.
+
+        Args:
+            max_pool_size (int): The configured maximum pool size.
+
+        Returns:
+            dict: Counters plus `saturation`, the share of the pool in use (0 to 1).
+        """
+        with self._lock:
+            return {
+                "max_pool_size": max_pool_size,
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "checkout_failures": self.checkout_failures,
+                "saturation": round(self.checked_out / max_pool_size, 3),
+            }
+
+
+pool_monitor = PoolMonitor()
+
+__all__ = ["pool_monitor", "PoolMonitor"]
@@ -0,0 +1,303 @@
+from collections import OrderedDict
+from typing import Optional
+import datetime
+import math
+import time
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from ..models import RateLimitModel
+from .clock import utcnow
+from .env import env_settings
+
+# Seconds in each period a limit like "10/minute" may use.
+PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+
+class RateLimit:
+    """
+    A token bucket allowing bursts of `requests` and refilling at the same pace.
+
+    Attributes:
+        requests (int): Bucket size, the number of requests allowed at once.
+        period (float): Seconds it takes for an empty bucket to fill up again.
+    """
+
+    def __init__(self, requests: int, period: float):
+        self.requests = requests
+        self.period = period
+
+    @property
+    def rate(self) -> float:
+        """Tokens added to the bucket per second."""
+        return self.requests / self.period
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimit":
+        """
+        Parses a limit written as "<requests>/<period>", e.g. "10/minute".
+
+        Raises:
+            ValueError: If the text is not a positive count over a known period.
+        """
+        requests, _, period = text.partition("/")
+        try:
+            count = int(requests)
+        except ValueError:
+            count = 0
+        if count < 1 or period.strip() not in PERIODS:
+            raise ValueError(f"Invalid rate limit '{text}', expected e.g. '10/minute'")
+        return cls(count, PERIODS[period.strip()])
+
+    def __repr__(self) -> str:
+        return f"RateLimit({self.requests}, {self.period})"
+
+
+class LocalRateLimitBackend:
+    """
+    Token buckets kept in process memory.
+
+    Buckets are held in LRU order and the least recently used ones are dropped
+    past `max_keys`; a dropped bucket simply starts full again.
+
+    Attributes:
+        max_keys (int): Maximum number of buckets kept.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(
+        self, key: str, limit: RateLimit, now: Optional[float] = None
+    ) -> float:
+        """
+        Takes a token from a bucket if one is left.
+
+        Args:
+            key (str): The bucket key.
+            limit (RateLimit): The limit of the bucket.
+            now (Optional[float]): Current monotonic time, for tests.
+
+        Returns:
+            float: 0 if the request is allowed, else the seconds until it would be.
+        """
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.pop(key, (limit.requests, now))
+        tokens = min(limit.requests, tokens + (now - updated) * limit.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def refund(self, key: str, limit: RateLimit):
+        """Gives back a token taken from a bucket for a request that was rejected."""
+        if key in self._buckets:
+            tokens, updated = self._buckets[key]
+            self._buckets[key] = (min(limit.requests, tokens + 1), updated)
+
+    def clear(self):
+        """Drops every bucket."""
+        self._buckets.clear()
+
+    def size(self) -> int:
+        """Returns the number of buckets kept."""
+        return len(self._buckets)
+
+
+class MongoRateLimitBackend:
+    """
+    Token buckets shared by every worker through the `rate_limits` collection.
+
+    Refilling and taking a token happen in a single `find_one_and_update` with an
+    update pipeline, so concurrent workers never both take the last token. Costs
+    one small write per bucket and request, still far cheaper than a bcrypt hash.
+    """
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        """Takes a token from a shared bucket, see `LocalRateLimitBackend.take`."""
+        now = utcnow()
+        elapsed = {
+            "$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]
+        }
+        refilled = {
+            "$min": [
+                limit.requests,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", limit.requests]},
+                        {"$multiply": [elapsed, limit.rate]},
+                    ]
+                },
+            ]
+        }
+        bucket = await RateLimitModel.get_pymongo_collection().find_one_and_update(
+            {"_id": key},
+            [
+                {
+                    "$set": {
+                        "tokens": refilled,
+                        "updated_at": now,
+                        # A bucket left alone for a whole period is full again.
+                        "expires_at": now + datetime.timedelta(seconds=limit.period),
+                    }
+                },
+                {
+                    "$set": {
+                        "allowed": {"$gte": ["$tokens", 1]},
+                        "tokens": {
+                            "$cond": [
+                                {"$gte": ["$tokens", 1]},
+                                {"$subtract": ["$tokens", 1]},
+                                "$tokens",
+                            ]
+                        },
+                    }
+                },
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / limit.rate
+
+    async def refund(self, key: str, limit: RateLimit):
+        """Gives back a token, see `LocalRateLimitBackend.refund`."""
+        await RateLimitModel.get_pymongo_collection().update_one(
+            {"_id": key},
+            [
+                {
+                    "$set": {
+                        "tokens": {"$min": [limit.requests, {"$add": ["$tokens", 1]}]}
+                    }
+                }
+            ],
+        )
+
+
+class RateLimiter:
+    """
+    Rate limits requests per route, by client IP and by account email.
+
+    Meant to be checked first thing in a route, so rejected requests cost no
+    password hashing and, with the local backend, no database work at all.
+
+    Attributes:
+        enabled (bool): Whether requests are limited at all.
+        backend: `LocalRateLimitBackend` or `MongoRateLimitBackend`.
+        limits (dict[str, RateLimit]): The limit of each route, applied to each
+            client IP and to each email separately.
+        trusted_proxies (int): Number of reverse proxies in front of the app that
+            append the address they see to `X-Forwarded-For`.
+        allowed (int): Number of requests let through.
+        rejected (int): Number of requests rejected.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        backend,
+        limits: dict[str, RateLimit],
+        trusted_proxies: int = 0,
+    ):
+        self.enabled = enabled
+        self.backend = backend
+        self.limits = limits
+        self.trusted_proxies = trusted_proxies
+        self.allowed = 0
+        self.rejected = 0
+
+    def client_ip(self, request: Request) -> str:
+        """
+        Returns the IP address of the client making the request.
+
+        Behind `trusted_proxies` proxies, it is the `X-Forwarded-For` entry added
+        by the outermost one, counted from the right. Entries left of it come
+        from the client and are never trusted.
+        """
+        if self.trusted_proxies:
+            forwarded = [
+                address.strip()
+                for address in request.headers.get("x-forwarded-for", "").split(",")
+                if address.strip()
+            ]
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        return request.client.host if request.client else "unknown"
+
+    async def check(self, route: str, request: Request, email: Optional[str] = None):
+        """
+        Takes a token from the route's buckets of the client IP and of the email.
+
+        A request is only charged when every bucket allows it: tokens already
+        taken are given back when a later bucket rejects. The client IP is
+        checked first, so flooding from one address stops at its own bucket and
+        cannot drain the bucket of the account it targets.
+
+        Args:
+            route (str): Key of the route in `limits`.
+            request (Request): The incoming request.
+            email (Optional[str]): The account the request is about, if any.
+
+        Raises:
+            HTTPException: 429 with a `Retry-After` header if either bucket is empty.
+        """
+        if not self.enabled:
+            return
+
+        limit = self.limits[route]
+        keys = [f"{route}:ip:{self.client_ip(request)}"]
+        if email:
+            keys.append(f"{route}:email:{email.strip().lower()}")
+
+        for taken, key in enumerate(keys):
+            wait = await self.backend.take(key, limit)
+            if wait > 0:
+                for charged in keys[:taken]:
+                    await self.backend.refund(charged, limit)
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please try again later",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+        self.allowed += 1
+
+    def stats(self) -> dict[str, int]:
+        """Returns the limiter counters."""
+        return {"allowed": self.allowed, "rejected": self.rejected}
+
+
+def auth_limits() -> dict[str, RateLimit]:
+    """Reads the per-route limits of the auth endpoints from the settings."""
+    return {
+        "login": RateLimit.parse(env_settings.RATE_LIMIT_LOGIN),
+        "register": RateLimit.parse(env_settings.RATE_LIMIT_REGISTER),
+    }
+
+
+auth_rate_limiter = RateLimiter(
+    enabled=env_settings.RATE_LIMIT_ENABLED,
+    backend=(
+        MongoRateLimitBackend()
+        if env_settings.RATE_LIMIT_BACKEND == "mongo"
+        else LocalRateLimitBackend()
+    ),
+    limits=auth_limits(),
+    trusted_proxies=env_settings.RATE_LIMIT_TRUSTED_PROXIES,
+)
+
+__all__ = [
+    "auth_rate_limiter",
+    "RateLimiter",
+    "RateLimit",
+    "LocalRateLimitBackend",
+    "MongoRateLimitBackend",
+]
@@ -0,0 +1,222 @@
+from typing import Optional
+import datetime
+import uuid
+from bson import ObjectId
+from pymongo import UpdateOne
+from ..models import ReservationModel, SweetModel
+from .background import PeriodicTask
+from .invalidation import invalidation_bus
+from .clock import utcnow
+from .env import env_settings
+from .stock import adjust_stock
+from .stock_events import stock_broadcaster, sweet_event
+
+# Seconds after which a sweep's claim is considered abandoned and taken over.
+RESERVATION_CLAIM_TIMEOUT_SECONDS = 5 * 60
+# Sweeps remembered per sweet; far more than can run within the claim timeout.
+RELEASED_CLAIMS_KEPT = 50
+
+
+async def reserve_stock(
+    sweet_id: str, user: str, quantity: int, minutes: int
+) -> Optional[tuple[ReservationModel, SweetModel]]:
+    """
+    Holds stock of a sweet for a user.
+
+    The held quantity moves from the sweet's `quantity` to its `reserved` count in
+    one guarded update, so reservations can never oversell and the available
+    quantity never needs the reservations to be counted.
+
+    Args:
+        sweet_id (str): The ID of the sweet to reserve.
+        user (str): Email of the user holding the reservation.
+        quantity (int): The quantity to hold.
+        minutes (int): How long the stock is held.
+
+    Returns:
+        Optional[tuple[ReservationModel, SweetModel]]: The reservation and the
+        updated sweet, or None if the sweet does not exist or lacks stock.
+    """
+    sweet = await adjust_stock(sweet_id, -quantity, reserved_delta=quantity)
+    if not sweet:
+        return None
+
+    reservation = ReservationModel(
+        sweet_id=sweet.id,
+        user=user,
+        quantity=quantity,
+        expires_at=utcnow() + datetime.timedelta(minutes=minutes),
+    )
+    try:
+        await reservation.insert()
+    except Exception:
+        await adjust_stock(sweet_id, quantity, reserved_delta=-quantity)
+        raise
+    return reservation, sweet
+
+
+async def _take_reservation(
+    reservation_id: str, user: str, active_only: bool
+) -> Optional[dict]:
+    """Deletes a reservation of the user not claimed by the sweeper and returns it."""
+    if not ObjectId.is_valid(reservation_id):
+        return None
+    query = {"_id": ObjectId(reservation_id), "user": user, "claim": None}
+    if active_only:
+        query["expires_at"] = {"$gt": utcnow()}
+    return await ReservationModel.get_pymongo_collection().find_one_and_delete(query)
+
+
+async def confirm_reservation(
+    reservation_id: str, user: str
+) -> Optional[tuple[SweetModel, int]]:
+    """
+    Turns an active reservation into a purchase.
+
+    The stock already left `quantity` when it was reserved, so confirming only
+    releases the `reserved` count.
+
+    Returns:
+        Optional[tuple[SweetModel, int]]: The updated sweet and the purchased
+        quantity, or None if the reservation does not exist, belongs to someone
+        else or has expired.
+    """
+    reservation = await _take_reservation(reservation_id, user, active_only=True)
+    if not reservation:
+        return None
+    sweet = await adjust_stock(
+        str(reservation["sweet_id"]), 0, reserved_delta=-reservation["quantity"]
+    )
+    if not sweet:
+        return None
+    return sweet, reservation["quantity"]
+
+
+async def cancel_reservation(reservation_id: str, user: str) -> Optional[SweetModel]:
+    """
+    Releases a reservation and puts its stock back on sale.
+
+    Returns:
+        Optional[SweetModel]: The updated sweet, or None if the reservation does
+        not exist or belongs to someone else.
+    """
+    reservation = await _take_reservation(reservation_id, user, active_only=False)
+    if not reservation:
+        return None
+    return await adjust_stock(
+        str(reservation["sweet_id"]),
+        reservation["quantity"],
+        reserved_delta=-reservation["quantity"],
+    )
+
+
+async def _return_claimed_stock(claim: str) -> int:
+    """
+    Puts back the stock of the reservations holding a claim, then deletes them.
+
+    Each sweet records the claim in the same update that returns its stock, and
+    that update skips sweets that already have it. Running this again for a
+    claim, after a crash part-way, therefore only returns what is still missing.
+
+    Returns:
+        int: The number of reservations released.
+    """
+    collection = ReservationModel.get_pymongo_collection()
+    totals = await collection.aggregate(
+        [
+            {"$match": {"claim": claim}},
+            {"$group": {"_id": "$sweet_id", "quantity": {"$sum": "$quantity"}}},
+        ]
+    ).to_list(None)
+    if totals:
+        await SweetModel.get_pymongo_collection().bulk_write(
+            [
+                UpdateOne(
+                    {"_id": total["_id"], "released_claims": {"$ne": claim}},
+                    {
+                        "$inc": {
+                            "quantity": total["quantity"],
+                            "reserved": -total["quantity"],
+                        },
+                        "$push": {
+                            "released_claims": {
+                                "$each": [claim],
+                                "$slice": -RELEASED_CLAIMS_KEPT,
+                            }
+                        },
+                    },
+                )
+                for total in totals
+            ],
+            ordered=False,
+        )
+    result = await collection.delete_many({"claim": claim})
+    if not totals:
+        return result.deleted_count
+
+    await invalidation_bus.publish("sweets")
+    sweets = await SweetModel.find(
+        {"_id": {"$in": [total["_id"] for total in totals]}}
+    ).to_list()
+    for sweet in sweets:
+        stock_broadcaster.publish(sweet_event(sweet))
+    return result.deleted_count
+
+
+async def release_expired_reservations(now: Optional[datetime.datetime] = None) -> int:
+    """
+    Returns the stock of every expired reservation in bulk.
+
+    Expired reservations are first claimed with a single `update_many`, so
+    several sweepers (one per worker) never return the same stock twice, and a
+    confirmation racing with the sweeper either wins or finds nothing. Claimed
+    quantities are summed per sweet with one aggregation, put back with one
+    `bulk_write`, and the claimed reservations are deleted with `delete_many`.
+
+    Claims older than `RESERVATION_CLAIM_TIMEOUT_SECONDS` were left by a sweep
+    that crashed or failed part-way, and are taken over with the same claim, see
+    `_return_claimed_stock`.
+
+    Args:
+        now (Optional[datetime.datetime]): The expiry cut-off, defaults to now.
+
+    Returns:
+        int: The number of reservations released.
+    """
+    collection = ReservationModel.get_pymongo_collection()
+    claimed_at = utcnow()
+    stale_before = claimed_at - datetime.timedelta(
+        seconds=RESERVATION_CLAIM_TIMEOUT_SECONDS
+    )
+    stale = {"claim": {"$ne": None}, "claimed_at": {"$not": {"$gt": stale_before}}}
+    released = 0
+    for claim in await collection.distinct("claim", stale):
+        result = await collection.update_many(
+            {**stale, "claim": claim}, {"$set": {"claimed_at": claimed_at}}
+        )
+        if result.modified_count:
+            released += await _return_claimed_stock(claim)
+
+    claim = uuid.uuid4().hex
+    result = await collection.update_many(
+        {"expires_at": {"$lte": now or claimed_at}, "claim": None},
+        {"$set": {"claim": claim, "claimed_at": claimed_at}},
+    )
+    if result.modified_count:
+        released += await _return_claimed_stock(claim)
+    return released
+
+
+reservation_sweeper = PeriodicTask(
+    "Reservation sweep",
+    env_settings.RESERVATION_SWEEP_INTERVAL_SECONDS,
+    release_expired_reservations,
+)
+
+__all__ = [
+    "reserve_stock",
+    "confirm_reservation",
+    "cancel_reservation",
+    "release_expired_reservations",
+    "reservation_sweeper",
+]
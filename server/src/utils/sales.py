@@ -0,0 +1,229 @@
+from typing import Literal, Optional
+import datetime
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from ..models import DailySalesModel, SaleModel, SweetModel
+from .clock import utc_today
+
+
+def sale_day(moment: datetime.datetime) -> str:
+    """Returns the UTC day of a moment as YYYY-MM-DD, the key of daily rollups."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc)
+    return moment.strftime("%Y-%m-%d")
+
+
+def day_range(days: int, today: Optional[datetime.date] = None) -> list[str]:
+    """Returns the last `days` UTC days, oldest first, ending with today."""
+    today = today or utc_today()
+    return [
+        (today - datetime.timedelta(days=offset)).isoformat()
+        for offset in range(days - 1, -1, -1)
+    ]
+
+
+async def record_stock_movement(
+    sweet: SweetModel,
+    kind: Literal["purchase", "restock"],
+    quantity: int,
+    user: str,
+) -> SaleModel:
+    """
+    Appends a purchase or restock to the sales ledger and updates the rollups.
+
+    Args:
+        sweet (SweetModel): The sweet after the stock change.
+        kind (str): "purchase" or "restock".
+        quantity (int): The quantity that moved.
+        user (str): Email of the user who made the change.
+
+    Returns:
+        SaleModel: The ledger entry.
+    """
+    (entry,) = await record_stock_movements([(sweet, quantity, user)], kind)
+    return entry
+
+
+async def record_committed_movements(
+    movements: list[tuple[SweetModel, int, str]],
+    kind: Literal["purchase", "restock"],
+) -> list[SaleModel]:
+    """
+    Records stock movements that are already committed to the sweets.
+
+    A failed ledger write is reported instead of raised: the stock change stands,
+    and failing the request would let a retry with the same `Idempotency-Key`
+    apply it a second time.
+
+    Args:
+        movements (list[tuple[SweetModel, int, str]]): As for
+            `record_stock_movements`.
+        kind (str): "purchase" or "restock".
+
+    Returns:
+        list[SaleModel]: The ledger entries, empty if they could not be written.
+    """
+    try:
+        return await record_stock_movements(movements, kind)
+    except PyMongoError as exc:
+        print(f"⚠️ Could not record {len(movements)} {kind}(s) in the ledger: {exc}")
+        return []
+
+
+async def record_stock_movements(
+    movements: list[tuple[SweetModel, int, str]],
+    kind: Literal["purchase", "restock"],
+) -> list[SaleModel]:
+    """
+    Appends purchases or restocks of several sweets to the ledger at once.
+
+    The entries are written with one `insert_many`. The day's rollups of the
+    shop, of each category and of each sweet are incremented with `$inc` upserts
+    in a single `bulk_write`, so reports never need to read the ledger. Each
+    rollup gets one update per batch, however many movements it sums.
+
+    Args:
+        movements (list[tuple[SweetModel, int, str]]): Each sweet after the stock
+            change, with the quantity that moved and the email of the user who
+            moved it.
+        kind (str): "purchase" or "restock".
+
+    Returns:
+        list[SaleModel]: The ledger entries.
+    """
+    if not movements:
+        return []
+
+    entries = [
+        SaleModel(
+            sweet_id=sweet.id,
+            category_id=sweet.category.ref.id if sweet.category else None,
+            kind=kind,
+            quantity=quantity,
+            unit_price=sweet.price,
+            user=user,
+        )
+        for sweet, quantity, user in movements
+    ]
+    await SaleModel.insert_many(entries)
+
+    rollups: dict[tuple, dict[str, float]] = {}
+    for entry in entries:
+        if kind == "purchase":
+            increments = {
+                "orders": 1,
+                "units_sold": entry.quantity,
+                "revenue": entry.quantity * entry.unit_price,
+            }
+        else:
+            increments = {"units_restocked": entry.quantity}
+
+        day = sale_day(entry.created_at)
+        scopes = [("shop", None), ("sweet", entry.sweet_id)]
+        if entry.category_id is not None:
+            scopes.append(("category", entry.category_id))
+        for scope, key in scopes:
+            totals = rollups.setdefault((scope, key, day), {})
+            for field, amount in increments.items():
+                totals[field] = totals.get(field, 0) + amount
+
+    await DailySalesModel.get_pymongo_collection().bulk_write(
+        [
+            UpdateOne(
+                {"scope": scope, "key": key, "day": day},
+                {"$inc": increments},
+                upsert=True,
+            )
+            for (scope, key, day), increments in rollups.items()
+        ],
+        ordered=False,
+    )
+    return entries
+
+
+async def daily_sales(scope: str, key, days: int) -> list[dict]:
+    """
+    Reads the daily rollups of the last `days` days.
+
+    Args:
+        scope (str): "shop", "category" or "sweet".
+        key: The category or sweet ID, None for the shop.
+        days (int): Number of days, ending today.
+
+    Returns:
+        list[dict]: One row per day, oldest first; days without sales are zero.
+    """
+    window = day_range(days)
+    rollups = await DailySalesModel.find(
+        DailySalesModel.scope == scope,
+        DailySalesModel.key == key,
+        DailySalesModel.day >= window[0],
+        DailySalesModel.day <= window[-1],
+    ).to_list()
+    by_day = {rollup.day: rollup for rollup in rollups}
+
+    rows = []
+    for day in window:
+        rollup = by_day.get(day)
+        rows.append(
+            {
+                "day": day,
+                "orders": rollup.orders if rollup else 0,
+                "units_sold": rollup.units_sold if rollup else 0,
+                "revenue": rollup.revenue if rollup else 0,
+                "units_restocked": rollup.units_restocked if rollup else 0,
+            }
+        )
+    return rows
+
+
+async def top_sellers(scope: str, days: int, limit: int) -> list[dict]:
+    """
+    Ranks the categories or sweets by revenue over the last `days` days.
+
+    Sums the daily rollups in one aggregation, so the cost depends on the number
+    of days and sellers, not on the number of sales.
+
+    Args:
+        scope (str): "category" or "sweet".
+        days (int): Number of days, ending today.
+        limit (int): Number of rows returned.
+
+    Returns:
+        list[dict]: The key and its totals, highest revenue first.
+    """
+    window = day_range(days)
+    return (
+        await DailySalesModel.get_pymongo_collection()
+        .aggregate(
+            [
+                {
+                    "$match": {
+                        "scope": scope,
+                        "day": {"$gte": window[0], "$lte": window[-1]},
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": "$key",
+                        "orders": {"$sum": "$orders"},
+                        "units_sold": {"$sum": "$units_sold"},
+                        "revenue": {"$sum": "$revenue"},
+                    }
+                },
+                {"$sort": {"revenue": -1, "_id": 1}},
+                {"$limit": limit},
+            ]
+        )
+        .to_list(None)
+    )
+
+
+__all__ = [
+    "record_committed_movements",
+    "record_stock_movement",
+    "record_stock_movements",
+    "daily_sales",
+    "top_sellers",
+    "sale_day",
+]
@@ -0,0 +1,217 @@
+from typing import Any, Callable, Optional
+import re
+
+# Longest substring stored for each sweet name. Search terms up to this length
+# are answered by a single index lookup; longer terms intersect their n-grams.
+MAX_GRAM = 3
+
+
+def normalize(text: str) -> str:
+    """Lower-cases and trims text so names and search terms compare equally."""
+    return text.strip().lower()
+
+
+def name_grams(name: str) -> list[str]:
+    """
+    Builds the n-grams stored with a sweet for name search.
+
+    Every substring of the normalized name of length 1 to `MAX_GRAM` is included,
+    so any search term of at most `MAX_GRAM` characters is an exact gram.
+
+    Args:
+        name (str): The sweet name.
+
+    Returns:
+        list[str]: The unique n-grams, sorted.
+    """
+    text = normalize(name)
+    grams = {
+        text[i : i + size]
+        for size in range(1, MAX_GRAM + 1)
+        for i in range(len(text) - size + 1)
+    }
+    return sorted(grams)
+
+
+def name_search_filter(term: str) -> dict:
+    """
+    Builds an index-backed MongoDB filter matching names that contain `term`.
+
+    Short terms are matched directly against the `search_grams` index. Longer
+    terms require all of their trigrams to be present, which the index narrows
+    down to a few candidates, and an escaped case-insensitive regex then keeps
+    only the names that really contain the term.
+
+    Args:
+        term (str): The raw search term from the user.
+
+    Returns:
+        dict: The filter to apply on the sweets collection.
+    """
+    text = normalize(term)
+    if len(text) <= MAX_GRAM:
+        return {"search_grams": text}
+
+    grams = sorted({text[i : i + MAX_GRAM] for i in range(len(text) - MAX_GRAM + 1)})
+    return {
+        "search_grams": {"$all": grams},
+        "name": {"$regex": re.escape(text), "$options": "i"},
+    }
+
+
+def rank_by_relevance(items: list, term: str, key: Callable[[Any], str]) -> list:
+    """
+    Orders search results by how well their name matches the term.
+
+    Exact matches come first, then names starting with the term, then names with
+    a word starting with the term, then any other match. Ties go to the shorter
+    name.
+
+    Args:
+        items (list): The search results.
+        term (str): The raw search term from the user.
+        key (Callable): Returns the name of a result.
+
+    Returns:
+        list: The results, best match first.
+    """
+    text = normalize(term)
+
+    def score(item):
+        name = normalize(key(item))
+        if name == text:
+            tier = 0
+        elif name.startswith(text):
+            tier = 1
+        elif any(word.startswith(text) for word in name.split()):
+            tier = 2
+        else:
+            tier = 3
+        return (tier, len(name), name)
+
+    return sorted(items, key=score)
+
+
+# Fields `relevance_stages` adds to rank the matches, dropped from the results.
+RELEVANCE_FIELDS = ("_relevance_tier", "_relevance_length", "_relevance_name")
+
+
+def relevance_stages(term: str) -> list[dict]:
+    """
+    Builds the aggregation stages ordering matches as `rank_by_relevance` does.
+
+    Ranking in the database, before `$skip` and `$limit`, keeps the best matches
+    on the first page rather than only ordering each page. Ties go to the lower
+    ID, so pages are stable.
+
+    Args:
+        term (str): The raw search term from the user.
+
+    Returns:
+        list[dict]: The `$addFields` stage computing the rank, then the `$sort`.
+    """
+    text = re.escape(normalize(term))
+
+    def matches(pattern: str) -> dict:
+        return {"$regexMatch": {"input": "$name", "regex": pattern, "options": "i"}}
+
+    return [
+        {
+            "$addFields": {
+                "_relevance_tier": {
+                    "$switch": {
+                        "branches": [
+                            {"case": matches(rf"^\s*{text}\s*$"), "then": 0},
+                            {"case": matches(rf"^\s*{text}"), "then": 1},
+                            {"case": matches(rf"(^|\s){text}"), "then": 2},
+                        ],
+                        "default": 3,
+                    }
+                },
+                "_relevance_length": {"$strLenCP": "$name"},
+                "_relevance_name": {"$toLower": "$name"},
+            }
+        },
+        {
+            "$sort": {
+                "_relevance_tier": 1,
+                "_relevance_length": 1,
+                "_relevance_name": 1,
+                "_id": 1,
+            }
+        },
+    ]
+
+
+def results_projection(projection: Optional[dict] = None) -> dict:
+    """Returns the projection of search results, never carrying the n-grams."""
+    return projection or {
+        "search_grams": 0,
+        **{field: 0 for field in RELEVANCE_FIELDS},
+    }
+
+
+def facet_pipeline(
+    match: dict,
+    price_bucket: float,
+    projection: Optional[dict] = None,
+    skip: int = 0,
+    limit: int = 1000,
+    term: Optional[str] = None,
+) -> list[dict]:
+    """
+    Builds the aggregation returning search results and their facets at once.
+
+    A single `$facet` stage runs over the matched sweets, so the results, the
+    number of sweets per category, a price histogram, the in-stock count and the
+    total all come from one scan and one round trip.
+
+    The whole output is a single document, which MongoDB caps at 16MB, so the
+    results are one page and never carry the search n-grams. The page is taken
+    in relevance order when a name is searched, in ID order otherwise.
+
+    Args:
+        match (dict): The search filter.
+        price_bucket (float): Width of the price histogram buckets.
+        projection (Optional[dict]): Fields kept in the results, all when omitted.
+        skip (int): Results skipped before the page.
+        limit (int): Most results returned.
+        term (Optional[str]): The searched name, to rank the results by.
+
+    Returns:
+        list[dict]: The pipeline; its single output document has the `results`,
+        `categories`, `prices`, `in_stock` and `total` arrays.
+    """
+    return [
+        {"$match": match},
+        {
+            "$facet": {
+                "results": [
+                    *(relevance_stages(term) if term else [{"$sort": {"_id": 1}}]),
+                    {"$skip": skip},
+                    {"$limit": limit},
+                    {"$project": results_projection(projection)},
+                ],
+                "categories": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+                "prices": [
+                    {
+                        "$group": {
+                            "_id": {
+                                "$multiply": [
+                                    {"$floor": {"$divide": ["$price", price_bucket]}},
+                                    price_bucket,
+                                ]
+                            },
+                            "count": {"$sum": 1},
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+                "in_stock": [
+                    {"$match": {"quantity": {"$gt": 0}}},
+                    {"$count": "count"},
+                ],
+                "total": [{"$count": "count"}],
+            }
+        },
+    ]
@@ -0,0 +1,256 @@
+from typing import Optional
+import asyncio
+from bson import ObjectId
+from beanie import UpdateResponse
+from beanie.operators import Inc
+from fastapi import HTTPException
+from ..models import SweetModel
+from .invalidation import invalidation_bus
+from .clock import start_of_day, utc_today
+from .env import env_settings
+from .sales import record_committed_movements
+from .stock_events import stock_broadcaster, sweet_event
+
+# Guarded batch updates retried after a concurrent stock change, before the
+# intents of a batch are settled one by one.
+COALESCE_MAX_ATTEMPTS = 3
+
+
+async def adjust_stock(
+    sweet_id: str, delta: int, reserved_delta: int = 0
+) -> Optional[SweetModel]:
+    """Atomically add `delta` to a sweet's quantity in one round trip.
+
+    Negative deltas are guarded so that the update only applies while enough stock
+    is left and the sweet has not expired, which keeps concurrent purchases from
+    overselling.
+
+    Args:
+        sweet_id (str): The ID of the sweet to update.
+        delta (int): The amount to add to the quantity, negative to remove stock.
+        reserved_delta (int): The amount to add to the quantity held by
+            reservations, in the same update.
+
+    Returns:
+        Optional[SweetModel]: The updated sweet, or None if the sweet does not exist,
+        does not have enough stock or has expired.
+    """
+    if not ObjectId.is_valid(sweet_id):
+        return None
+
+    conditions = [SweetModel.id == ObjectId(sweet_id)]
+    if delta < 0:
+        conditions.append(SweetModel.quantity >= -delta)
+        conditions.append(SweetModel.expiry_date >= start_of_day(utc_today()))
+
+    increments = {SweetModel.quantity: delta}
+    if reserved_delta:
+        increments[SweetModel.reserved] = reserved_delta
+
+    sweet = await SweetModel.find_one(*conditions).update(
+        Inc(increments),
+        response_type=UpdateResponse.NEW_DOCUMENT,
+    )
+    if sweet:
+        await invalidation_bus.publish("sweets")
+        stock_broadcaster.publish(sweet_event(sweet))
+    return sweet
+
+
+async def raise_stock_miss(sweet_id: str):
+    """
+    Explains why stock could not be taken from a sweet.
+
+    The guarded update does not say why it missed, so the sweet is only looked up
+    on this failure path.
+
+    Raises:
+        HTTPException:
+            - 404 if the sweet does not exist.
+            - 400 if the sweet has expired or does not have enough stock.
+    """
+    sweet = None
+    if ObjectId.is_valid(sweet_id):
+        sweet = await SweetModel.find_one(SweetModel.id == ObjectId(sweet_id))
+    if not sweet:
+        raise HTTPException(status_code=404, detail="Sweet not found")
+    if sweet.expiry_date < utc_today():
+        raise HTTPException(status_code=400, detail="Sweet has expired")
+    raise HTTPException(status_code=400, detail="Not enough stock available")
+
+
+def fit_intents(intents: list, available: int) -> list:
+    """Returns the intents accepted, in order, while their total fits `available`."""
+    accepted = []
+    for intent in intents:
+        if intent[0] <= available:
+            accepted.append(intent)
+            available -= intent[0]
+    return accepted
+
+
+class PurchaseCoalescer:
+    """
+    Coalesces concurrent purchases of the same sweet into one write.
+
+    Purchase intents are queued per sweet for `window_ms`, then each sweet's
+    queue is applied with a single guarded `$inc` for the total quantity. If the
+    stock no longer covers the total, the current quantity is read and intents
+    are accepted in arrival order while they fit, so stock never goes below zero.
+    Under a flash sale this turns thousands of contending updates of one document
+    into one update per window.
+
+    The purchases accepted in a window are then added to the sales ledger with
+    one `record_committed_movements` call, so the shared daily rollups also get
+    one update per window rather than one per purchase.
+
+    Attributes:
+        enabled (bool): Whether purchases go through the coalescer.
+        window_ms (float): How long intents are collected before a flush.
+        intents (int): Purchase intents received.
+        writes (int): Guarded batch updates sent.
+    """
+
+    def __init__(self, enabled: bool, window_ms: float):
+        self.enabled = enabled
+        self.window_ms = window_ms
+        self.intents = 0
+        self.writes = 0
+        self._queues: dict[str, list[tuple[int, asyncio.Future, str]]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def purchase(
+        self, sweet_id: str, quantity: int, user: str
+    ) -> Optional[SweetModel]:
+        """
+        Queues a purchase and waits for the batch it lands in.
+
+        Args:
+            sweet_id (str): The ID of the sweet to purchase.
+            quantity (int): The quantity to take.
+            user (str): Email of the buyer, recorded in the sales ledger.
+
+        Returns:
+            Optional[SweetModel]: The sweet as left by this purchase, or None if it
+            does not exist or the stock did not cover it.
+        """
+        if not ObjectId.is_valid(sweet_id):
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(sweet_id, []).append((quantity, future, user))
+        self.intents += 1
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window_ms / 1000)
+        queues, self._queues = self._queues, {}
+        self._flusher = None
+        batches = await asyncio.gather(
+            *[
+                self._flush_sweet(sweet_id, intents)
+                for sweet_id, intents in queues.items()
+            ]
+        )
+        outcomes = [outcome for batch in batches for outcome in batch]
+
+        # Stock taken for a request cancelled meanwhile is still a sale.
+        await record_committed_movements(
+            [
+                (result, quantity, user)
+                for (quantity, _, user), result in outcomes
+                if isinstance(result, SweetModel)
+            ],
+            "purchase",
+        )
+
+        for (_, future, _), result in outcomes:
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _flush_sweet(self, sweet_id: str, intents: list) -> list[tuple]:
+        """Applies one sweet's intents and returns each intent with its result."""
+        # Requests cancelled while queued no longer need stock.
+        intents = [intent for intent in intents if not intent[1].done()]
+        if not intents:
+            return []
+        try:
+            accepted = intents
+            for _ in range(COALESCE_MAX_ATTEMPTS):
+                self.writes += 1
+                sweet = await adjust_stock(
+                    sweet_id, -sum(intent[0] for intent in accepted)
+                )
+                if sweet:
+                    break
+                current = await SweetModel.find_one(SweetModel.id == ObjectId(sweet_id))
+                # An expired sweet refuses every purchase; no retry can succeed.
+                if current is None or current.expiry_date < utc_today():
+                    accepted = []
+                else:
+                    accepted = fit_intents(intents, current.quantity)
+                if not accepted:
+                    break
+            else:
+                # Stock kept changing under the batch: settle intents one by one.
+                return [
+                    (intent, await adjust_stock(sweet_id, -intent[0]))
+                    for intent in intents
+                ]
+
+            remaining = sweet.quantity if accepted else 0
+            results = {}
+            for quantity, future, _ in reversed(accepted):
+                results[id(future)] = sweet.model_copy(update={"quantity": remaining})
+                remaining += quantity
+            return [(intent, results.get(id(intent[1]))) for intent in intents]
+        except Exception as exc:
+            return [(intent, exc) for intent in intents]
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of purchase intents and batch writes."""
+        return {"intents": self.intents, "writes": self.writes}
+
+
+purchase_coalescer = PurchaseCoalescer(
+    env_settings.PURCHASE_COALESCING, env_settings.PURCHASE_COALESCE_WINDOW_MS
+)
+
+
+async def purchase_stock(
+    sweet_id: str, quantity: int, user: str
+) -> Optional[SweetModel]:
+    """
+    Takes purchased stock and records the sale, through the coalescer when it is
+    enabled.
+
+    Args:
+        sweet_id (str): The ID of the sweet to purchase.
+        quantity (int): The quantity to take.
+        user (str): Email of the buyer, recorded in the sales ledger.
+
+    Returns:
+        Optional[SweetModel]: The updated sweet, or None if the sweet does not exist
+        or does not have enough stock.
+    """
+    if purchase_coalescer.enabled:
+        return await purchase_coalescer.purchase(sweet_id, quantity, user)
+    sweet = await adjust_stock(sweet_id, -quantity)
+    if sweet:
+        await record_committed_movements([(sweet, quantity, user)], "purchase")
+    return sweet
+
+
+__all__ = [
+    "adjust_stock",
+    "purchase_stock",
+    "raise_stock_miss",
+    "purchase_coalescer",
+    "PurchaseCoalescer",
+]
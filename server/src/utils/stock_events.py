@@ -0,0 +1,239 @@
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+from pymongo.errors import OperationFailure, PyMongoError
+from .env import env_settings
+
+# Seconds to wait before reopening a change stream that failed.
+CHANGE_STREAM_RETRY_DELAY = 1
+CHANGE_STREAM_MAX_RETRY_DELAY = 30
+
+
+def sweet_event(sweet) -> dict:
+    """Builds the event pushed when a sweet is created or changed."""
+    return {
+        "type": "upsert",
+        "id": str(sweet.id),
+        "quantity": sweet.quantity,
+        "price": sweet.price,
+    }
+
+
+def deleted_event(sweet_id) -> dict:
+    """Builds the event pushed when a sweet is deleted."""
+    return {"type": "delete", "id": str(sweet_id)}
+
+
+class Subscription:
+    """
+    Pending stock events of one subscriber.
+
+    Events are coalesced per sweet: a sweet that changes several times before the
+    subscriber reads only keeps its latest event, since each event carries the
+    full stock level. A slow consumer therefore holds at most one event per sweet,
+    and is dropped (`overflowed`) once more than `max_pending` sweets are waiting,
+    so it can reconnect and re-fetch the list instead of lagging forever.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.overflowed = False
+        self._pending: OrderedDict[str, dict] = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def offer(self, event: dict) -> bool:
+        """
+        Queues an event without blocking.
+
+        Returns:
+            bool: False if the subscriber is too far behind and has been closed.
+        """
+        key = event["id"]
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            self.overflowed = True
+            self._ready.set()
+            return False
+        self._pending[key] = event
+        self._pending.move_to_end(key)
+        self._ready.set()
+        return True
+
+    def close(self):
+        """Closes the subscription, so the subscriber re-fetches the list."""
+        self.overflowed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> list[dict]:
+        """
+        Waits for pending events and takes all of them.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait before returning an empty list.
+
+        Returns:
+            list[dict]: The pending events, oldest first.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class StockBroadcaster:
+    """
+    Fans stock events out to the subscribers of this process.
+
+    With the `local` source, routes publish an event after each committed write,
+    which only reaches subscribers connected to the same process. With the
+    `change_stream` source, routes do not publish: a MongoDB change stream on the
+    sweets collection feeds every process instead, so subscribers see the writes
+    of all workers. Change streams need a replica set or sharded cluster.
+
+    Attributes:
+        source (str): "local" or "change_stream".
+        published (int): Events dispatched to subscribers.
+        dropped (int): Subscribers closed because they fell too far behind.
+        resyncs (int): Bulk writes that closed every subscriber.
+    """
+
+    def __init__(self, max_pending: int, source: str = "local"):
+        self.max_pending = max_pending
+        self.source = source
+        self.published = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self._subscribers: set[Subscription] = set()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> Subscription:
+        """Registers a new subscriber."""
+        subscription = Subscription(self.max_pending)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Removes a subscriber; unknown subscribers are ignored."""
+        self._subscribers.discard(subscription)
+
+    def dispatch(self, event: dict):
+        """Hands an event to every subscriber, dropping those that overflow."""
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if not subscription.offer(event):
+                self._subscribers.discard(subscription)
+                self.dropped += 1
+
+    def publish(self, event: dict):
+        """Publishes an event from a route, unless a change stream feeds events."""
+        if self.source == "local":
+            self.dispatch(event)
+
+    def publish_resync(self):
+        """
+        Tells every subscriber to re-fetch the list, after a bulk write.
+
+        Bulk writes do not return the documents they changed, so instead of one
+        event per sweet the subscribers get the same `resync` as when they fall
+        behind. Does nothing when a change stream feeds events.
+        """
+        if self.source == "local":
+            self.resync()
+
+    def resync(self):
+        """Closes every subscriber, which then re-fetches the list."""
+        self.resyncs += 1
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+
+    async def watch(self, collection):
+        """
+        Dispatches the changes of a collection until cancelled.
+
+        The stream is reopened after errors, resuming after the last seen change
+        when possible. When the resume point is gone from the oplog, the stream
+        restarts from now and every subscriber is told to resync, since changes
+        may have been missed.
+
+        Args:
+            collection (AsyncIOMotorCollection): The sweets collection.
+        """
+        pipeline = [
+            {
+                "$match": {
+                    "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+                }
+            }
+        ]
+        resume_token = None
+        delay = CHANGE_STREAM_RETRY_DELAY
+        while True:
+            try:
+                async with collection.watch(
+                    pipeline, full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    delay = CHANGE_STREAM_RETRY_DELAY
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.dispatch_change(change)
+            except PyMongoError as exc:
+                print(f"⚠️ Stock change stream failed, retrying in {delay}s: {exc}")
+                if isinstance(exc, OperationFailure) and resume_token is not None:
+                    resume_token = None
+                    self.resync()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, CHANGE_STREAM_MAX_RETRY_DELAY)
+
+    def dispatch_change(self, change: dict):
+        """Turns a change stream document into a stock event."""
+        sweet_id = change["documentKey"]["_id"]
+        if change["operationType"] == "delete":
+            self.dispatch(deleted_event(sweet_id))
+            return
+        document = change.get("fullDocument")
+        if document is None:
+            # Deleted again before the lookup; its delete event follows.
+            return
+        self.dispatch(
+            {
+                "type": "upsert",
+                "id": str(sweet_id),
+                "quantity": document.get("quantity"),
+                "price": document.get("price"),
+            }
+        )
+
+    def start(self, collection):
+        """Starts watching the collection when the change stream source is used."""
+        if self.source == "change_stream" and self._watcher is None:
+            self._watcher = asyncio.create_task(self.watch(collection))
+
+    async def stop(self):
+        """Stops the change stream watcher, if running."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def stats(self) -> dict[str, int]:
+        """Returns the broadcaster counters and the number of subscribers."""
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+        }
+
+
+stock_broadcaster = StockBroadcaster(
+    env_settings.STOCK_EVENTS_MAX_PENDING, env_settings.STOCK_EVENTS_SOURCE
+)
+
+__all__ = ["stock_broadcaster", "sweet_event", "deleted_event", "StockBroadcaster"]
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Optional
+import threading
+import time
+from .env import env_settings
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of already verified JWT claims, keyed on the raw token.
+
+    Each entry expires at the token's own `exp`, so a cached token is never
+    accepted for longer than the token itself is valid. Only tokens that passed
+    signature verification are stored; a tampered token is a different string
+    and therefore always a miss. The cache is used from the threadpool that runs
+    sync dependencies, so every access holds a lock.
+
+    Attributes:
+        max_size (int): Maximum number of cached tokens before the least recently
+            used one is evicted.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that required a full decode.
+        evictions (int): Number of entries dropped because the cache was full.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        """Returns the cached claims of a token, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                self._entries.pop(token, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict, expires_at: float):
+        """Stores the verified claims of a token until `expires_at` (epoch seconds)."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (expires_at, claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every cached token and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """Returns the cache counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+
+token_cache = TokenCache(env_settings.TOKEN_CACHE_SIZE)
+
+__all__ = ["token_cache", "TokenCache"]
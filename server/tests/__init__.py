@@ -0,0 +1,5 @@
+import os
+
+# The suites register and log in far more often than the auth rate limits allow;
+# the rate limiting tests enable the limiter themselves.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
@@ -1,16 +1,30 @@
 import pytest
 from httpx import AsyncClient, ASGITransport
 from src.main import app
-from src.models import UserModel
+from src.models import UserModel, RateLimitModel
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.utils.env import env_settings
 import pytest_asyncio
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from datetime import timedelta
+from fastapi import HTTPException
+from jose import jwt
+from src.utils.auth import create_access_token, get_current_user
+from src.utils.token_cache import token_cache, TokenCache
+from src.utils.password import hash_password_async
+from src.utils.rate_limit import auth_rate_limiter, RateLimit
+from src.utils.rate_limit import LocalRateLimitBackend, MongoRateLimitBackend
+from src.routes import auth as auth_routes
 
 # ----------------------------
 # FIXTURES
 # ----------------------------
 
+
 @pytest_asyncio.fixture(scope="function", autouse=True)
 async def clean_db():
     """
@@ -18,7 +32,9 @@ async def clean_db():
     Ensures a fresh and isolated test environment.
     """
     client = AsyncIOMotorClient(env_settings.MONGO_URI)
-    await init_beanie(database=client.sweet_shop, document_models=[UserModel])
+    await init_beanie(
+        database=client.sweet_shop, document_models=[UserModel, RateLimitModel]
+    )
     await UserModel.find_all().delete()
 
 
@@ -32,10 +48,12 @@ async def client():
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
 
+
 # ----------------------------
 # TEST CASES
 # ----------------------------
 
+
 @pytest.mark.asyncio
 async def test_register_user_success(client):
     """
@@ -80,6 +98,33 @@ async def test_register_user_duplicate(client):
     assert "User already registered" in response.text
 
 
+@pytest.mark.asyncio
+async def test_register_race_on_unique_email(client, monkeypatch):
+    """
+    Test that a registration losing the race to a concurrent one with the same
+    email gets the same 400 instead of a server error.
+    """
+
+    async def hash_while_racing(password):
+        # The concurrent request inserts its user between the check and insert.
+        await UserModel(username="Sam", email="alex@gmail.com", password="x").insert()
+        return await hash_password_async(password)
+
+    monkeypatch.setattr(auth_routes, "hash_password_async", hash_while_racing)
+
+    response = await client.post(
+        "/api/auth/register",
+        json={
+            "username": "Alex",
+            "email": "alex@gmail.com",
+            "password": "Password123",
+        },
+    )
+
+    assert response.status_code == 400, response.text
+    assert "User already registered" in response.text
+
+
 @pytest.mark.asyncio
 async def test_login_user_success(client):
     """
@@ -165,3 +210,311 @@ async def test_register_admin_user(client):
     assert data["status"] == "success"
     assert data["data"] is None
     assert data["message"] == "User successfully registered"
+
+
+# ----------------------------
+# TOKEN CACHE
+# ----------------------------
+
+
+@pytest.fixture
+def decode_counter(monkeypatch):
+    """
+    Fixture that counts how many times the JWT is actually decoded,
+    starting from an empty token cache.
+    """
+    token_cache.clear()
+    calls = {"count": 0}
+    original_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls["count"] += 1
+        return original_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    yield calls
+    token_cache.clear()
+
+
+def test_repeated_token_is_decoded_once(decode_counter):
+    """
+    Test that a token seen before is served from the cache.
+    """
+    token = create_access_token({"sub": "alex@gmail.com", "role": "user"})
+
+    first = get_current_user(token)
+    second = get_current_user(token)
+
+    assert first == second == {"email": "alex@gmail.com", "role": "user"}
+    assert decode_counter["count"] == 1
+    assert token_cache.stats()["hits"] == 1
+
+
+def test_expired_token_is_rejected(decode_counter):
+    """
+    Test that an expired token is rejected and never cached.
+    """
+    token = create_access_token(
+        {"sub": "alex@gmail.com", "role": "user"}, timedelta(seconds=-1)
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(token)
+    assert exc.value.status_code == 401
+    assert token_cache.stats()["size"] == 0
+
+
+def test_tampered_token_is_rejected(decode_counter):
+    """
+    Test that altering a cached token's signature makes it invalid.
+    """
+    token = create_access_token({"sub": "alex@gmail.com", "role": "user"})
+    get_current_user(token)
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(tampered)
+    assert exc.value.status_code == 401
+
+
+def test_token_cache_entries_expire_and_evict():
+    """
+    Test that cache entries expire at their `exp` and that the cache stays bounded.
+    """
+    cache = TokenCache(max_size=2)
+    cache.put("expired", {"email": "a"}, time.time() - 1)
+    assert cache.get("expired") is None
+
+    for token in ["a", "b", "c"]:
+        cache.put(token, {"email": token}, time.time() + 60)
+
+    assert cache.get("a") is None
+    assert cache.get("c") == {"email": "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_token_cache_is_safe_across_threads():
+    """
+    Test that concurrent lookups and stores from threadpool threads, as sync
+    dependencies make them, never corrupt the cache.
+    """
+    cache = TokenCache(max_size=8)
+
+    def use_cache(worker: int):
+        for i in range(2000):
+            token = f"token-{(worker + i) % 16}"
+            cache.put(token, {"email": token}, time.time() + (60 if i % 3 else -1))
+            cache.get(token)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(use_cache, range(8)))
+
+    stats = cache.stats()
+    assert stats["size"] <= 8
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+
+
+# ----------------------------
+# PASSWORD HASHING
+# ----------------------------
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_stale_password(client):
+    """
+    Test that logging in with a hash made at an old bcrypt cost
+    transparently upgrades the stored hash.
+    """
+    stale_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("Password123")
+    await UserModel(
+        username="Alex", email="alex@gmail.com", password=stale_hash
+    ).insert()
+
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "alex@gmail.com", "password": "Password123"},
+    )
+
+    assert response.status_code == 200, response.text
+    stored_user = await UserModel.find_one(UserModel.email == "alex@gmail.com")
+    assert stored_user.password != stale_hash
+    assert f"${env_settings.BCRYPT_ROUNDS:02d}$" in stored_user.password
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_does_not_block_event_loop():
+    """
+    Test that the event loop keeps ticking while several passwords are hashed.
+    """
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker_task = asyncio.create_task(ticker())
+    hashes = await asyncio.gather(*[hash_password_async(f"pw-{i}") for i in range(8)])
+    done.set()
+    await ticker_task
+
+    assert len(set(hashes)) == 8
+    assert max(gaps) < 0.1
+
+
+# ----------------------------
+# RATE LIMITING
+# ----------------------------
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    """Enables the auth rate limiter with fresh buckets of 3 requests a minute."""
+    monkeypatch.setattr(auth_rate_limiter, "enabled", True)
+    monkeypatch.setattr(auth_rate_limiter, "backend", LocalRateLimitBackend())
+    monkeypatch.setattr(
+        auth_rate_limiter,
+        "limits",
+        {"login": RateLimit(3, 60), "register": RateLimit(3, 60)},
+    )
+    return auth_rate_limiter
+
+
+@pytest.mark.asyncio
+async def test_login_is_rate_limited_before_hashing(client, rate_limited, monkeypatch):
+    """
+    Test that attempts over the limit get 429 with Retry-After and never
+    reach password verification.
+    """
+    verified = []
+
+    async def counting_verify(plain_password, hashed_password):
+        verified.append(plain_password)
+        return False, None
+
+    monkeypatch.setattr(
+        auth_routes, "verify_and_update_password_async", counting_verify
+    )
+    await UserModel(username="Alex", email="alex@gmail.com", password="x").insert()
+
+    statuses = []
+    for _ in range(5):
+        response = await client.post(
+            "/api/auth/login",
+            json={"email": "alex@gmail.com", "password": "wrong"},
+        )
+        statuses.append(response.status_code)
+
+    assert statuses == [401, 401, 401, 429, 429]
+    assert len(verified) == 3
+    assert response.headers["Retry-After"] == "20"
+    assert rate_limited.stats()["rejected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_is_kept_per_email_across_ips(
+    client, rate_limited, monkeypatch
+):
+    """
+    Test that spreading attempts on one account over many IPs still hits
+    the per-email limit, while other accounts are unaffected, and that the
+    client IP is the one added by the trusted proxy, not a spoofed entry.
+    """
+    monkeypatch.setattr(rate_limited, "trusted_proxies", 1)
+
+    async def login(email, ip, spoofed="198.51.100.1"):
+        response = await client.post(
+            "/api/auth/login",
+            json={"email": email, "password": "wrong"},
+            headers={"X-Forwarded-For": f"{spoofed}, {ip}"},
+        )
+        return response.status_code
+
+    statuses = [await login("alex@gmail.com", f"203.0.113.{i}") for i in range(4)]
+    assert statuses == [404, 404, 404, 429]
+    assert await login("sam@gmail.com", "203.0.113.9") == 404
+
+    # Rotating the client-supplied entries does not escape the per-IP limit.
+    statuses = [
+        await login(f"user{i}@gmail.com", "203.0.113.20", spoofed=f"192.0.2.{i}")
+        for i in range(4)
+    ]
+    assert statuses == [404, 404, 404, 429]
+
+
+@pytest.mark.asyncio
+async def test_flooding_one_ip_does_not_lock_out_the_account(client, rate_limited):
+    """
+    Test that attempts rejected by the per-IP limit do not use up the
+    per-email bucket, so the real user can still log in from elsewhere.
+    """
+    rate_limited.trusted_proxies = 1
+
+    async def login(email, ip):
+        response = await client.post(
+            "/api/auth/login",
+            json={"email": email, "password": "wrong"},
+            headers={"X-Forwarded-For": ip},
+        )
+        return response.status_code
+
+    # The attacker's IP bucket is spent on other accounts first.
+    for i in range(3):
+        await login(f"other{i}@gmail.com", "203.0.113.66")
+    flood = [await login("alex@gmail.com", "203.0.113.66") for _ in range(5)]
+
+    assert flood == [429] * 5
+    assert await login("alex@gmail.com", "198.51.100.7") == 404
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_refund_gives_back_a_token():
+    """
+    Test that a refunded token can be taken again, on both backends.
+    """
+    await RateLimitModel.find_all().delete()
+    limit = RateLimit(1, 60)
+    for backend in (LocalRateLimitBackend(), MongoRateLimitBackend()):
+        assert await backend.take("login:ip:203.0.113.1", limit) == 0
+        await backend.refund("login:ip:203.0.113.1", limit)
+        assert await backend.take("login:ip:203.0.113.1", limit) == 0
+        assert await backend.take("login:ip:203.0.113.1", limit) > 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_over_time():
+    """
+    Test that a bucket allows a burst, then one request per refill interval.
+    """
+    backend = LocalRateLimitBackend()
+    limit = RateLimit.parse("2/minute")
+
+    assert await backend.take("key", limit, now=0) == 0
+    assert await backend.take("key", limit, now=0) == 0
+    assert await backend.take("key", limit, now=0) == 30
+    assert await backend.take("key", limit, now=15) == 15
+    assert await backend.take("key", limit, now=30) == 0
+    assert await backend.take("other", limit, now=30) == 0
+    with pytest.raises(ValueError):
+        RateLimit.parse("10/fortnight")
+
+
+@pytest.mark.asyncio
+async def test_shared_rate_limit_backend():
+    """
+    Test that the MongoDB backend allows a burst and then rejects.
+    """
+    await RateLimitModel.find_all().delete()
+    backend = MongoRateLimitBackend()
+    limit = RateLimit(2, 60)
+
+    waits = [await backend.take("login:ip:203.0.113.1", limit) for _ in range(3)]
+
+    assert waits[:2] == [0, 0]
+    assert 29 < waits[2] <= 30
+    bucket = await RateLimitModel.get("login:ip:203.0.113.1")
+    assert bucket.tokens < 1
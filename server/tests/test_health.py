@@ -0,0 +1,77 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from httpx import AsyncClient, ASGITransport
+from pymongo.errors import ServerSelectionTimeoutError
+from src.main import app
+from src.routes import health
+from src.utils.db import init_db, close_db, get_client
+from src.utils.pool_monitor import PoolMonitor
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_pool_usage(client):
+    await init_db()
+    try:
+        response = await client.get("/api/health/ready")
+    finally:
+        await close_db()
+
+    assert response.status_code == 200, response.text
+    pool = response.json()["data"]["pool"]
+    assert pool["open"] >= 1
+    assert 0 <= pool["saturation"] <= 1
+    assert get_client() is None
+
+
+@pytest.mark.asyncio
+async def test_readiness_without_database(client):
+    await close_db()
+
+    response = await client.get("/api/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "fail"
+
+
+@pytest.mark.asyncio
+async def test_readiness_hides_driver_errors(client, monkeypatch):
+    class UnreachableAdmin:
+        async def command(self, name):
+            raise ServerSelectionTimeoutError("db-1.internal:27017, replicaSet rs0")
+
+    class UnreachableClient:
+        admin = UnreachableAdmin()
+
+    monkeypatch.setattr(health, "get_client", lambda: UnreachableClient())
+
+    response = await client.get("/api/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["message"] == "Database unavailable"
+    assert "db-1.internal" not in response.text
+
+
+def test_pool_counters_stay_exact_across_threads():
+    monitor = PoolMonitor()
+
+    def check_out_and_in():
+        for _ in range(10000):
+            monitor.connection_check_out_started(None)
+            monitor.connection_checked_out(None)
+            monitor.connection_checked_in(None)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(check_out_and_in) for _ in range(8)]:
+            future.result()
+
+    stats = monitor.stats(max_pool_size=10)
+    assert (stats["checked_out"], stats["waiting"]) == (0, 0)
@@ -0,0 +1,212 @@
+import pytest
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from httpx import AsyncClient, ASGITransport
+from pymongo import monitoring
+from pymongo.errors import DuplicateKeyError
+from src.main import app
+from src.models import UserModel
+from src.utils.db import DOCUMENT_MODELS
+from src.utils.category_cache import category_cache
+from src.utils.env import env_settings
+from src.utils.indexes import reconcile_indexes
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function.
+
+    Collections are dropped so that every test starts without any index, then the
+    models are initialized the same way `init_db` does it.
+    """
+    client = AsyncIOMotorClient(env_settings.MONGO_URI)
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=DOCUMENT_MODELS,
+        skip_indexes=True,
+    )
+    for model in DOCUMENT_MODELS:
+        await model.get_pymongo_collection().drop()
+
+
+def plan_stages(plan):
+    """Yields every stage name found in an explain plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_indexes_is_idempotent():
+    first = await reconcile_indexes(DOCUMENT_MODELS)
+    second = await reconcile_indexes(DOCUMENT_MODELS)
+
+    assert "email_unique" in first["users"]["created"]
+    assert "name_unique" in first["categories"]["created"]
+    assert set(first["sweets"]["created"]) == {
+        "category_price",
+        "price",
+        "quantity",
+        "expiry_date",
+        "expired_expiry_date",
+        "search_grams",
+    }
+    assert set(first["reservations"]["created"]) == {"expires_at_ttl", "claim"}
+    assert set(first["sales"]["created"]) == {"sweet_created_at"}
+    assert set(first["daily_sales"]["created"]) == {"scope_key_day", "scope_day"}
+    assert set(first["rate_limits"]["created"]) == {"expires_at_ttl"}
+    assert set(first["invalidations"]["created"]) == {"created_at_ttl"}
+    assert set(first["idempotency_keys"]["created"]) == {"created_at_ttl"}
+    for collection in second.values():
+        assert collection["created"] == []
+        assert collection["dropped"] == []
+
+
+@pytest.mark.asyncio
+async def test_reconcile_indexes_rebuilds_mismatched_index():
+    await UserModel.get_pymongo_collection().create_index("email", name="email_1")
+
+    report = await reconcile_indexes(DOCUMENT_MODELS)
+
+    assert report["users"]["dropped"] == ["email_1"]
+    assert report["users"]["created"] == ["email_unique"]
+
+
+@pytest.mark.asyncio
+async def test_unique_email_is_enforced():
+    await reconcile_indexes(DOCUMENT_MODELS)
+    await UserModel(username="A", email="a@example.com", password="x").insert()
+
+    with pytest.raises(DuplicateKeyError):
+        await UserModel(username="B", email="a@example.com", password="y").insert()
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps the read commands a client sends, to explain them afterwards."""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate"):
+            self.commands.append(dict(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def winning_plans(explain):
+    """Yields every winning plan of an explain output, including pipeline stages."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from winning_plans(value)
+
+
+def reads_everything(command) -> bool:
+    """Whether a command reads a whole collection on purpose, e.g. all categories."""
+    return (
+        command.get("find") is not None
+        and not command.get("filter")
+        and not command.get("sort")
+    )
+
+
+@pytest.mark.asyncio
+async def test_route_queries_do_not_collscan():
+    """
+    Every selective query the routes send must be answered by an index.
+
+    The commands are recorded from the driver while the routes are called, so the
+    test explains exactly what the routes send.
+    """
+    recorder = CommandRecorder()
+    client = AsyncIOMotorClient(env_settings.MONGO_URI, event_listeners=[recorder])
+    await init_beanie(
+        database=client.sweet_shop, document_models=DOCUMENT_MODELS, skip_indexes=True
+    )
+    await reconcile_indexes(DOCUMENT_MODELS)
+    category_cache.clear()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as api:
+        user = {
+            "username": "Admin",
+            "email": "admin@example.com",
+            "password": "Password123",
+            "is_admin": True,
+        }
+        await api.post("/api/auth/register", json=user)
+        login = await api.post(
+            "/api/auth/login",
+            json={"email": user["email"], "password": user["password"]},
+        )
+        headers = {"Authorization": f"Bearer {login.json()['data']['token']}"}
+        await api.post(
+            "/api/sweets/categories", json={"name": "Indian"}, headers=headers
+        )
+        created = await api.post(
+            "/api/sweets",
+            json={"name": "Ladoo", "category": "Indian", "price": 10, "quantity": 5},
+            headers=headers,
+        )
+        sweet_id = created.json()["data"]["_id"]
+        await api.post(
+            f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers
+        )
+
+        paths = [
+            "/api/sweets",
+            f"/api/sweets?limit=1&after={sweet_id}",
+            "/api/sweets/categories",
+            "/api/sweets/expiring",
+            "/api/sweets/search?name=la",
+            "/api/sweets/search?name=ladoo&facets=true",
+            "/api/sweets/search?category=Indian",
+            "/api/sweets/search?category=Indian&minPrice=5",
+            "/api/sweets/search?minPrice=5",
+            "/api/sweets/search?maxPrice=50",
+            "/api/sweets/search?min_quantity=1",
+            "/api/sweets/search?minPrice=5&skip=1&limit=10",
+            "/api/reports/sales/daily",
+            f"/api/reports/sales/daily?sweet_id={sweet_id}",
+            "/api/reports/sales/daily?category=Indian",
+            "/api/reports/sales/top",
+            "/api/reports/sales/top?by=category",
+        ]
+        for path in paths:
+            response = await api.get(path, headers=headers)
+            assert response.status_code == 200, (path, response.text)
+
+    checked = 0
+    for command in recorder.commands:
+        if reads_everything(command):
+            continue
+        body = {
+            key: value
+            for key, value in command.items()
+            if not key.startswith("$") and key not in ("lsid", "txnNumber")
+        }
+        explain = await client.sweet_shop.command(
+            {"explain": body, "verbosity": "queryPlanner"}
+        )
+        stages = {
+            stage for plan in winning_plans(explain) for stage in plan_stages(plan)
+        }
+        assert "COLLSCAN" not in stages, (body, stages)
+        checked += 1
+    assert checked >= len(paths)
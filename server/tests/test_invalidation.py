@@ -0,0 +1,197 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.models import UserModel, SweetModel, CategoryModel, InvalidationModel
+from src.models import CatalogVersionModel
+from src.serve import check_serving_settings
+from src.utils.env import env_settings
+from src.utils.catalog_version import CatalogVersions
+from src.utils.category_cache import CategoryCache, category_cache
+from src.utils.invalidation import InvalidationBus, LocalBroker, subscribe_caches
+from src.utils.invalidation import invalidation_bus
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function."""
+    client = AsyncIOMotorClient(env_settings.MONGO_URI)
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=[
+            UserModel,
+            SweetModel,
+            CategoryModel,
+            InvalidationModel,
+            CatalogVersionModel,
+        ],
+    )
+    for model in (
+        UserModel,
+        SweetModel,
+        CategoryModel,
+        InvalidationModel,
+        CatalogVersionModel,
+    ):
+        await model.find_all().delete()
+    category_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def register_and_login(client, is_admin=True):
+    """Registers and logs in a test user and returns its bearer token."""
+    user_data = {
+        "username": "TestAdmin" if is_admin else "TestUser",
+        "email": "admin@example.com" if is_admin else "user@example.com",
+        "password": "Password123",
+        "is_admin": is_admin,
+    }
+    await client.post("/api/auth/register", json=user_data)
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": user_data["email"], "password": user_data["password"]},
+    )
+    return f"Bearer {response.json()['data']['token']}"
+
+
+def make_worker(broker, transport="local", coalesce_ms=0):
+    """Builds the bus and caches of one simulated worker."""
+    versions, categories = CatalogVersions(), CategoryCache()
+    bus = InvalidationBus(transport, broker, coalesce_ms)
+    subscribe_caches(bus, versions, categories)
+    return bus, versions, categories
+
+
+@pytest.mark.asyncio
+async def test_changes_reach_every_worker_once():
+    broker = LocalBroker()
+    bus_a, versions_a, _ = make_worker(broker)
+    bus_b, versions_b, categories_b = make_worker(broker)
+    category = CategoryModel(name="Cached")
+    await category.insert()
+    categories_b.put(category)
+
+    await bus_a.publish("categories", str(category.id))
+    await bus_a.publish("sweets")
+
+    for versions in (versions_a, versions_b):
+        assert (versions.version("sweets"), versions.version("categories")) == (1, 1)
+    assert categories_b.stats()["size"] == 0
+    # The evicted category is fetched again on its next lookup.
+    assert (await categories_b.get_by_name("Cached")).id == category.id
+    assert bus_a.stats() == {"published": 2, "sent": 2, "received": 0, "resyncs": 0}
+    assert bus_b.stats() == {"published": 0, "sent": 0, "received": 2, "resyncs": 0}
+
+
+@pytest.mark.asyncio
+async def test_change_stream_transport_stores_messages():
+    bus_a, versions_a, _ = make_worker(LocalBroker(), "change_stream")
+    bus_b, versions_b, _ = make_worker(LocalBroker(), "change_stream")
+
+    await bus_a.publish("sweets")
+
+    (message,) = await InvalidationModel.get_pymongo_collection().find().to_list(None)
+    assert (message["kind"], message["origin"]) == ("sweets", bus_a.origin)
+    # What the change stream hands to each worker:
+    bus_a.receive(message)
+    bus_b.receive(message)
+    version = message["version"]
+    assert versions_a.version("sweets") == versions_b.version("sweets") == version
+
+    bus_b.resync()
+    assert versions_b.version("sweets") == version + 1
+    assert versions_b.version("categories") == 1
+
+
+@pytest.mark.asyncio
+async def test_workers_agree_on_listing_etags():
+    bus_a, versions_a, _ = make_worker(LocalBroker(), "change_stream")
+    bus_b, versions_b, _ = make_worker(LocalBroker(), "change_stream")
+    assert versions_a.etag(("sweets",)) == versions_b.etag(("sweets",))
+
+    for _ in range(3):
+        await bus_a.publish("sweets")
+    await bus_b.publish("categories")
+    for message in (
+        await InvalidationModel.get_pymongo_collection().find().to_list(None)
+    ):
+        bus_a.receive(message)
+        bus_b.receive(message)
+    kinds = ("sweets", "categories")
+    assert versions_a.etag(kinds, "page") == versions_b.etag(kinds, "page")
+
+    # A worker started later loads the shared versions instead of counting.
+    bus_c, versions_c, _ = make_worker(LocalBroker(), "change_stream")
+    await bus_c.sync()
+    assert versions_c.etag(kinds, "page") == versions_a.etag(kinds, "page")
+
+
+@pytest.mark.asyncio
+async def test_change_stream_transport_coalesces_changes():
+    """
+    Test that a burst of changes costs one shared version bump and one message,
+    while the publishing worker sees each change at once.
+    """
+    bus_a, versions_a, _ = make_worker(LocalBroker(), "change_stream", coalesce_ms=20)
+    bus_b, versions_b, _ = make_worker(LocalBroker(), "change_stream")
+    collection = InvalidationModel.get_pymongo_collection()
+
+    etags = set()
+    for _ in range(50):
+        await bus_a.publish("sweets")
+        etags.add(versions_a.etag(("sweets",)))
+    assert len(etags) == 50
+    assert await collection.count_documents({}) == 0
+
+    await asyncio.sleep(0.1)
+    (message,) = await collection.find().to_list(None)
+    bus_b.receive(message)
+    assert versions_a.etag(("sweets",)) == versions_b.etag(("sweets",))
+    assert bus_a.stats()["published"] == 50
+    assert bus_a.stats()["sent"] == 1
+
+    await bus_a.publish("categories")
+    await bus_a.stop()
+    assert await collection.count_documents({"kind": "categories"}) == 1
+
+
+@pytest.mark.asyncio
+async def test_listing_is_not_cached_across_another_workers_write(client):
+    token = await register_and_login(client)
+    first = await client.get("/api/sweets", headers={"Authorization": token})
+    etag = first.headers["ETag"]
+
+    invalidation_bus.receive({"kind": "sweets", "key": None, "origin": "other"})
+
+    again = await client.get(
+        "/api/sweets", headers={"Authorization": token, "If-None-Match": etag}
+    )
+    assert again.status_code == 200
+    assert again.headers["ETag"] != etag
+
+
+def test_several_workers_need_a_shared_bus():
+    with pytest.raises(ValueError):
+        check_serving_settings(env_settings.model_copy(update={"WORKERS": 4}))
+
+    warnings = check_serving_settings(
+        env_settings.model_copy(
+            update={
+                "WORKERS": 4,
+                "INVALIDATION_BUS": "change_stream",
+                "STOCK_EVENTS_SOURCE": "local",
+            }
+        )
+    )
+    assert any("STOCK_EVENTS_SOURCE" in warning for warning in warnings)
+    assert check_serving_settings(env_settings.model_copy(update={"WORKERS": 1})) == []
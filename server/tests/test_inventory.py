@@ -1,10 +1,22 @@
+import asyncio
 import pytest
+import datetime
+from datetime import timedelta
+from bson import ObjectId
+from pymongo.errors import PyMongoError
 from httpx import AsyncClient, ASGITransport
 from src.main import app
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.models import UserModel, SweetModel, CategoryModel
+from src.models import SaleModel, DailySalesModel, IdempotencyModel
 from src.utils.env import env_settings
+from src.utils.category_cache import category_cache
+from src.utils import sales
+from src.utils.clock import utc_today, utcnow
+from src.utils.idempotency import IDEMPOTENCY_LEASE_SECONDS, digest
+from src.utils.idempotency import idempotency_store
+from src.utils.stock import PurchaseCoalescer, purchase_coalescer
 import pytest_asyncio
 
 
@@ -22,11 +34,21 @@ async def clean_db():
     client = AsyncIOMotorClient(env_settings.MONGO_URI)
     await init_beanie(
         database=client.sweet_shop,
-        document_models=[UserModel, SweetModel, CategoryModel],
+        document_models=[
+            UserModel,
+            SweetModel,
+            CategoryModel,
+            SaleModel,
+            DailySalesModel,
+            IdempotencyModel,
+        ],
     )
     await UserModel.find_all().delete()
     await SweetModel.find_all().delete()
     await CategoryModel.find_all().delete()
+    await IdempotencyModel.find_all().delete()
+    category_cache.clear()
+    idempotency_store.clear()
 
 
 # ----------- HTTPX CLIENT -----------
@@ -193,3 +215,449 @@ async def test_restock_sweet_as_non_admin_should_fail(client):
     )
 
     assert restock_res.status_code in [401, 403]
+
+
+# ---------- TEST: Concurrent purchases never oversell ----------
+@pytest.mark.asyncio
+async def test_concurrent_purchases_never_oversell(client):
+    """
+    Test that hundreds of parallel purchases cannot drive stock below zero.
+    Verifies:
+    - Exactly as many purchases succeed as there is stock.
+    - Every other purchase is rejected with 400.
+    - The final quantity is zero.
+    """
+    token = await register_and_login(client)
+    category = await create_category(client, token, "Flash Sale")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={
+            "name": "Kaju Katli",
+            "category": category,
+            "price": 50,
+            "quantity": 50,
+        },
+        headers={"Authorization": token},
+    )
+    sweet_id = create_res.json()["data"]["_id"]
+
+    responses = await asyncio.gather(
+        *[
+            client.post(
+                f"/api/sweets/{sweet_id}/purchase",
+                json={"quantity": 1},
+                headers={"Authorization": token},
+            )
+            for _ in range(200)
+        ]
+    )
+    status_codes = [res.status_code for res in responses]
+
+    assert status_codes.count(200) == 50
+    assert status_codes.count(400) == 150
+    assert all(
+        res.json()["data"]["quantity"] >= 0
+        for res in responses
+        if res.status_code == 200
+    )
+
+    sweet = await SweetModel.get(sweet_id)
+    assert sweet.quantity == 0
+
+
+# ---------- TEST: Purchase more than available ----------
+@pytest.mark.asyncio
+async def test_purchase_more_than_stock_fails(client):
+    """
+    Test that purchasing more than the available stock is rejected
+    and leaves the quantity untouched.
+    """
+    token = await register_and_login(client)
+    category = await create_category(client, token, "Limited")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={"name": "Soan Papdi", "category": category, "price": 5, "quantity": 3},
+        headers={"Authorization": token},
+    )
+    sweet_id = create_res.json()["data"]["_id"]
+
+    purchase_res = await client.post(
+        f"/api/sweets/{sweet_id}/purchase",
+        json={"quantity": 4},
+        headers={"Authorization": token},
+    )
+    missing_res = await client.post(
+        "/api/sweets/000000000000000000000000/purchase",
+        json={"quantity": 1},
+        headers={"Authorization": token},
+    )
+
+    assert purchase_res.status_code == 400
+    assert missing_res.status_code == 404
+    sweet = await SweetModel.get(sweet_id)
+    assert sweet.quantity == 3
+
+
+# ---------- TEST: Coalesced purchases ----------
+@pytest.mark.asyncio
+async def test_coalesced_purchases_never_oversell(client, monkeypatch):
+    """
+    Test that with purchase coalescing enabled, a burst of purchases is written
+    in a few batches and still sells exactly the available stock.
+    """
+    monkeypatch.setattr(purchase_coalescer, "enabled", True)
+    monkeypatch.setattr(purchase_coalescer, "writes", 0)
+    token = await register_and_login(client)
+    category = await create_category(client, token, "Hot Items")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={"name": "Modak", "category": category, "price": 30, "quantity": 50},
+        headers={"Authorization": token},
+    )
+    sweet_id = create_res.json()["data"]["_id"]
+
+    responses = await asyncio.gather(
+        *[
+            client.post(
+                f"/api/sweets/{sweet_id}/purchase",
+                json={"quantity": 1},
+                headers={"Authorization": token},
+            )
+            for _ in range(200)
+        ]
+    )
+    status_codes = [res.status_code for res in responses]
+
+    assert status_codes.count(200) == 50
+    assert status_codes.count(400) == 150
+    quantities = sorted(
+        res.json()["data"]["quantity"] for res in responses if res.status_code == 200
+    )
+    assert quantities == list(range(50))
+    assert purchase_coalescer.writes < 50
+    sweet = await SweetModel.get(sweet_id)
+    assert sweet.quantity == 0
+
+    # Every sale is in the ledger, and the sweet's rollup was written per batch.
+    sales = SaleModel.find({"sweet_id": ObjectId(sweet_id), "kind": "purchase"})
+    assert await sales.count() == 50
+    rollup = await DailySalesModel.find_one({"scope": "sweet", "key": sweet.id})
+    assert (rollup.orders, rollup.units_sold, rollup.revenue) == (50, 50, 1500)
+
+
+# ---------- TEST: Coalesced intents are settled in order ----------
+@pytest.mark.asyncio
+async def test_coalesced_intents_accepted_in_order(client):
+    """
+    Test that when a batch does not fit the stock, intents are accepted in
+    arrival order while they fit, and the rest are rejected.
+    """
+    token = await register_and_login(client)
+    category = await create_category(client, token, "Batched")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={"name": "Barfi", "category": category, "price": 20, "quantity": 5},
+        headers={"Authorization": token},
+    )
+    sweet_id = create_res.json()["data"]["_id"]
+
+    coalescer = PurchaseCoalescer(enabled=True, window_ms=5)
+    first, second, third = await asyncio.gather(
+        coalescer.purchase(sweet_id, 3, "a@example.com"),
+        coalescer.purchase(sweet_id, 3, "b@example.com"),
+        coalescer.purchase(sweet_id, 2, "c@example.com"),
+    )
+
+    assert first.quantity == 2
+    assert second is None
+    assert third.quantity == 0
+    assert coalescer.stats() == {"intents": 3, "writes": 2}
+    sales = await SaleModel.find({"sweet_id": ObjectId(sweet_id)}).to_list()
+    assert sorted((sale.user, sale.quantity) for sale in sales) == [
+        ("a@example.com", 3),
+        ("c@example.com", 2),
+    ]
+    missing = await coalescer.purchase("000000000000000000000000", 1, "a@example.com")
+    assert missing is None
+
+
+# ---------- TEST: Coalesced intents for an expired sweet ----------
+@pytest.mark.asyncio
+async def test_coalesced_intents_for_expired_sweet_fail_at_once(client):
+    """
+    Test that a batch for an expired sweet is rejected after one write, instead
+    of being retried and then settled intent by intent.
+    """
+    token = await register_and_login(client)
+    category = await create_category(client, token, "Stale")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={"name": "Peda", "category": category, "price": 20, "quantity": 5},
+        headers={"Authorization": token},
+    )
+    sweet_id = create_res.json()["data"]["_id"]
+    yesterday = datetime.datetime.combine(utc_today(), datetime.time()) - timedelta(
+        days=1
+    )
+    await SweetModel.get_pymongo_collection().update_one(
+        {"_id": ObjectId(sweet_id)}, {"$set": {"expiry_date": yesterday}}
+    )
+
+    coalescer = PurchaseCoalescer(enabled=True, window_ms=5)
+    results = await asyncio.gather(
+        *[coalescer.purchase(sweet_id, 1, "a@example.com") for _ in range(5)]
+    )
+
+    assert results == [None] * 5
+    assert coalescer.stats() == {"intents": 5, "writes": 1}
+    assert (await SweetModel.get(sweet_id)).quantity == 5
+
+
+# ---------- TEST: BULK RESTOCK ----------
+@pytest.mark.asyncio
+async def test_bulk_restock(client):
+    """
+    Test that an admin restocks several sweets in one request, duplicates
+    adding up, unknown IDs reported and every restock ledgered.
+    """
+    token = await register_and_login(client)
+    category = await create_category(client, token, "Bulk")
+    sweet_ids = []
+    for name in ("Peda", "Barfi"):
+        response = await client.post(
+            "/api/sweets",
+            json={"name": name, "category": category, "price": 10, "quantity": 1},
+            headers={"Authorization": token},
+        )
+        sweet_ids.append(response.json()["data"]["_id"])
+    missing = "000000000000000000000000"
+    items = [
+        {"id": sweet_ids[0], "quantity": 5},
+        {"id": sweet_ids[1], "quantity": 2},
+        {"id": sweet_ids[0], "quantity": 3},
+        {"id": missing, "quantity": 1},
+    ]
+
+    dry_run = await client.post(
+        "/api/sweets/bulk/restock",
+        json={"items": items, "dry_run": True},
+        headers={"Authorization": token},
+    )
+    assert dry_run.json()["data"]["matched"] == 2
+    assert (await SweetModel.get(sweet_ids[0])).quantity == 1
+
+    response = await client.post(
+        "/api/sweets/bulk/restock",
+        json={"items": items},
+        headers={"Authorization": token},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "matched": 2,
+        "modified": 2,
+        "not_found": [missing],
+        "dry_run": False,
+    }
+    assert (await SweetModel.get(sweet_ids[0])).quantity == 9
+    assert (await SweetModel.get(sweet_ids[1])).quantity == 3
+    restocks = await SaleModel.find(
+        {"sweet_id": {"$in": [ObjectId(sweet_id) for sweet_id in sweet_ids]}}
+    ).to_list()
+    assert sorted(sale.quantity for sale in restocks) == [2, 8]
+
+    user_token = await register_and_login(client, is_admin=False)
+    forbidden = await client.post(
+        "/api/sweets/bulk/restock",
+        json={"items": items},
+        headers={"Authorization": user_token},
+    )
+    assert forbidden.status_code in [401, 403]
+
+
+# ---------- TEST: IDEMPOTENT PURCHASE ----------
+async def create_sweet(client, token, quantity=10):
+    """Creates a sweet in a fresh category and returns its ID."""
+    category = await create_category(client, token, "Idempotent")
+    response = await client.post(
+        "/api/sweets",
+        json={"name": "Jalebi", "category": category, "price": 5, "quantity": quantity},
+        headers={"Authorization": token},
+    )
+    return response.json()["data"]["_id"]
+
+
+@pytest.mark.asyncio
+async def test_purchase_with_idempotency_key_runs_once(client):
+    """
+    Test that retrying a purchase with the same Idempotency-Key replays the first
+    response, from memory and then from the collection, without buying twice.
+    """
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token)
+    headers = {"Authorization": token, "Idempotency-Key": "order-1"}
+
+    first = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers
+    )
+    retry = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers
+    )
+    idempotency_store.clear()
+    stored = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers
+    )
+
+    assert first.status_code == retry.status_code == stored.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == stored.json() == first.json()
+    assert first.json()["data"]["quantity"] == 7
+    assert (await SweetModel.get(sweet_id)).quantity == 7
+    assert idempotency_store.stats()["replays"] == 1
+
+    other = await client.post(
+        f"/api/sweets/{sweet_id}/purchase",
+        json={"quantity": 3},
+        headers={"Authorization": token, "Idempotency-Key": "order-2"},
+    )
+    assert other.json()["data"]["quantity"] == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_purchases_run_once(client):
+    """
+    Test that duplicates sent while the first purchase is running wait for it and
+    get its response.
+    """
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token)
+    headers = {"Authorization": token, "Idempotency-Key": "double-click"}
+
+    responses = await asyncio.gather(
+        *[
+            client.post(
+                f"/api/sweets/{sweet_id}/purchase",
+                json={"quantity": 2},
+                headers=headers,
+            )
+            for _ in range(20)
+        ]
+    )
+
+    assert {res.status_code for res in responses} == {200}
+    assert {res.json()["data"]["quantity"] for res in responses} == {8}
+    assert (await SweetModel.get(sweet_id)).quantity == 8
+    assert idempotency_store.stats()["runs"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("coalescing", [False, True])
+async def test_failed_ledger_write_does_not_repeat_a_purchase(
+    client, monkeypatch, coalescing
+):
+    """
+    Test that a purchase whose ledger write fails still succeeds, so a retry with
+    the same Idempotency-Key is replayed instead of taking the stock again.
+    """
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token)
+    headers = {"Authorization": token, "Idempotency-Key": "ledger-down"}
+
+    async def ledger_down(movements, kind):
+        raise PyMongoError("ledger unavailable")
+
+    monkeypatch.setattr(purchase_coalescer, "enabled", coalescing)
+    monkeypatch.setattr(sales, "record_stock_movements", ledger_down)
+    first = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers
+    )
+    retry = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers
+    )
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert (await SweetModel.get(sweet_id)).quantity == 7
+    assert idempotency_store.stats()["runs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_idempotency_claim_is_taken_over(client):
+    """
+    Test that a key claimed by a worker that died before completing it runs again
+    once the claim's lease has run out, instead of staying blocked.
+    """
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token)
+    path = f"/api/sweets/{sweet_id}/purchase"
+    crashed_at = utcnow() - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS + 1)
+    await IdempotencyModel.get_pymongo_collection().insert_one(
+        {
+            "_id": digest("admin@example.com", "POST", path, "crashed"),
+            "fingerprint": digest("{}"),
+            "created_at": crashed_at,
+            "claimed_at": crashed_at,
+        }
+    )
+
+    headers = {"Authorization": token, "Idempotency-Key": "crashed"}
+    response = await client.post(path, json={"quantity": 3}, headers=headers)
+    retry = await client.post(path, json={"quantity": 3}, headers=headers)
+
+    assert response.status_code == retry.status_code == 200
+    assert retry.json() == response.json()
+    assert (await SweetModel.get(sweet_id)).quantity == 7
+    assert idempotency_store.stats()["runs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_reused_for_another_request_fails(client):
+    """
+    Test that a key cannot be reused with a different body, and that a failed
+    purchase is replayed as the same failure.
+    """
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token, quantity=2)
+    headers = {"Authorization": token, "Idempotency-Key": "order-3"}
+
+    failed = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 5}, headers=headers
+    )
+    await client.post(
+        f"/api/sweets/{sweet_id}/restock",
+        json={"quantity": 10},
+        headers={"Authorization": token},
+    )
+    retry = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 5}, headers=headers
+    )
+    reused = await client.post(
+        f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers
+    )
+
+    assert failed.status_code == retry.status_code == 400
+    assert retry.json() == failed.json()
+    assert reused.status_code == 422
+    assert (await SweetModel.get(sweet_id)).quantity == 12
+
+
+@pytest.mark.asyncio
+async def test_restock_with_idempotency_key_runs_once(client):
+    """Test that a retried restock with the same key adds the stock only once."""
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token)
+    headers = {"Authorization": token, "Idempotency-Key": "delivery-7"}
+
+    for _ in range(3):
+        response = await client.post(
+            f"/api/sweets/{sweet_id}/restock", json={"quantity": 5}, headers=headers
+        )
+        assert response.json()["data"]["quantity"] == 15
+
+    assert (await SweetModel.get(sweet_id)).quantity == 15
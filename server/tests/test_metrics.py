@@ -0,0 +1,89 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.models import UserModel, SweetModel, CategoryModel
+from src.utils.env import env_settings
+from src.utils.category_cache import category_cache
+from src.utils.metrics import command_metrics, Counter, Histogram
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function.
+
+    The Motor client is created with the metrics command listener attached, the
+    way `init_db` creates it.
+    """
+    client = AsyncIOMotorClient(
+        env_settings.MONGO_URI, event_listeners=[command_metrics]
+    )
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=[UserModel, SweetModel, CategoryModel],
+    )
+    await UserModel.find_all().delete()
+    await SweetModel.find_all().delete()
+    await CategoryModel.find_all().delete()
+    category_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_metrics_exposes_route_and_mongo_metrics(client):
+    await client.post(
+        "/api/auth/register",
+        json={"username": "Alex", "email": "alex@gmail.com", "password": "Password123"},
+    )
+    await client.get("/api/sweets/000000000000000000000000/missing")
+
+    response = await client.get("/metrics")
+    body = response.text
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_requests_total{method="POST",route="/api/auth/register",status="200"}'
+        in body
+    )
+    assert 'route="unmatched",status="404"' in body
+    assert (
+        'http_request_duration_seconds_count{method="POST",route="/api/auth/register"}'
+        in body
+    )
+    assert 'http_requests_in_flight{method="GET"} 1' in body
+    assert (
+        'mongo_commands_total{collection="users",command="find",outcome="success"}'
+        in body
+    )
+    assert (
+        'mongo_command_duration_seconds_bucket{collection="users",command="insert"'
+        in body
+    )
+    assert 'category_cache{stat="hits"}' in body
+
+
+def test_counter_and_histogram_render():
+    counter = Counter("things_total", "Things.", ["kind"])
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    histogram = Histogram("latency_seconds", "Latency.", ["kind"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+
+    assert counter.render()[-1] == 'things_total{kind="a"} 3'
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{kind="a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{kind="a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{kind="a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{kind="a"} 3' in lines
@@ -0,0 +1,222 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from src.models import UserModel, SweetModel, CategoryModel
+from src.utils.env import env_settings
+from src.utils.category_cache import category_cache
+import pytest_asyncio
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Command listener that records every command sent to MongoDB."""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(
+            (event.command_name, event.command.get(event.command_name))
+        )
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.commands = []
+
+
+counter = CommandCounter()
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function.
+
+    The Motor client is created with the command counter attached, so every
+    command issued by the routes under test is recorded.
+    """
+    client = AsyncIOMotorClient(env_settings.MONGO_URI, event_listeners=[counter])
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=[UserModel, SweetModel, CategoryModel],
+    )
+    await UserModel.find_all().delete()
+    await SweetModel.find_all().delete()
+    await CategoryModel.find_all().delete()
+    category_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def register_and_login(client, is_admin=True):
+    """Registers and logs in a test user.
+
+    Args:
+        client (AsyncClient): Test client instance.
+        is_admin (bool): Whether to register the user as admin.
+
+    Returns:
+        str: Bearer token for authorization.
+    """
+    user_data = {
+        "username": "TestAdmin" if is_admin else "TestUser",
+        "email": "admin@example.com" if is_admin else "user@example.com",
+        "password": "Password123",
+        "is_admin": is_admin,
+    }
+    await client.post("/api/auth/register", json=user_data)
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": user_data["email"], "password": user_data["password"]},
+    )
+    return f"Bearer {response.json()['data']['token']}"
+
+
+async def seed_sweets(client, token, count, categories=("Indian", "Street")):
+    """Creates the given categories and `count` sweets spread across them."""
+    for name in categories:
+        await client.post(
+            "/api/sweets/categories",
+            json={"name": name},
+            headers={"Authorization": token},
+        )
+    for i in range(count):
+        await client.post(
+            "/api/sweets",
+            json={
+                "name": f"Sweet {i}",
+                "category": categories[i % len(categories)],
+                "price": 10 + i,
+                "quantity": 5,
+            },
+            headers={"Authorization": token},
+        )
+
+
+async def count_commands(client, token, url):
+    """Performs a GET request and returns the number of MongoDB commands it issued."""
+    counter.reset()
+    response = await client.get(url, headers={"Authorization": token})
+    assert response.status_code == 200, response.text
+    return len(counter.commands), response.json()["data"]
+
+
+@pytest.mark.asyncio
+async def test_list_sweets_query_count_is_constant(client):
+    token = await register_and_login(client)
+
+    await seed_sweets(client, token, 3)
+    small_count, small_data = await count_commands(client, token, "/api/sweets")
+
+    await seed_sweets(client, token, 20)
+    large_count, large_data = await count_commands(client, token, "/api/sweets")
+
+    assert len(large_data) > len(small_data)
+    assert small_count == large_count
+    for sweet in large_data:
+        assert sweet["category"]["name"] in ("Indian", "Street")
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_query_count_is_constant(client):
+    token = await register_and_login(client)
+
+    await seed_sweets(client, token, 3)
+    small_count, _ = await count_commands(
+        client, token, "/api/sweets/search?minPrice=0"
+    )
+
+    await seed_sweets(client, token, 20)
+    large_count, large_data = await count_commands(
+        client, token, "/api/sweets/search?minPrice=0"
+    )
+
+    assert len(large_data) == 23
+    assert small_count == large_count
+
+
+@pytest.mark.asyncio
+async def test_categories_are_served_from_cache(client):
+    token = await register_and_login(client)
+    await seed_sweets(client, token, 5)
+    await category_cache.warm()
+
+    counter.reset()
+    list_res = await client.get("/api/sweets", headers={"Authorization": token})
+    search_res = await client.get(
+        "/api/sweets/search?category=Indian", headers={"Authorization": token}
+    )
+    categories_res = await client.get(
+        "/api/sweets/categories", headers={"Authorization": token}
+    )
+
+    assert list_res.status_code == 200
+    assert search_res.status_code == 200
+    assert len(categories_res.json()["data"]) == 2
+    assert not [cmd for cmd in counter.commands if cmd[1] == "categories"]
+    assert category_cache.stats()["hits"] > 0
+
+
+@pytest.mark.asyncio
+async def test_not_modified_listings_skip_the_database(client):
+    token = await register_and_login(client)
+    await seed_sweets(client, token, 5)
+
+    for url in ("/api/sweets", "/api/sweets/categories"):
+        first = await client.get(url, headers={"Authorization": token})
+        etag = first.headers["ETag"]
+
+        counter.reset()
+        response = await client.get(
+            url, headers={"Authorization": token, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert not [
+            cmd for cmd in counter.commands if cmd[1] in ("sweets", "categories")
+        ]
+
+
+@pytest.mark.asyncio
+async def test_search_facets_use_one_query(client):
+    token = await register_and_login(client)
+    await seed_sweets(client, token, 10)
+    await category_cache.warm()
+
+    count, data = await count_commands(
+        client, token, "/api/sweets/search?minPrice=0&facets=true"
+    )
+
+    assert len(data["results"]) == 10
+    assert sum(c["count"] for c in data["facets"]["categories"]) == 10
+    assert [cmd for cmd in counter.commands if cmd[1] == "sweets"] == [
+        ("aggregate", "sweets")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sparse_fields_skip_the_category_lookup(client):
+    token = await register_and_login(client)
+    await seed_sweets(client, token, 4)
+    category_cache.clear()
+
+    _, sweets = await count_commands(client, token, "/api/sweets?fields=id,name,price")
+    assert ("find", "categories") not in counter.commands
+    assert all(set(sweet) == {"id", "name", "price"} for sweet in sweets)
+
+    _, sweets = await count_commands(
+        client, token, "/api/sweets/search?name=sweet&fields=category"
+    )
+    assert {sweet["category"]["name"] for sweet in sweets} == {"Indian", "Street"}
+    assert all(set(sweet) == {"category"} for sweet in sweets)
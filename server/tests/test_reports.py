@@ -0,0 +1,148 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.models import UserModel, SweetModel, CategoryModel
+from src.models import SaleModel, DailySalesModel
+from src.utils.env import env_settings
+from src.utils.category_cache import category_cache
+from src.utils.sales import day_range
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function."""
+    client = AsyncIOMotorClient(env_settings.MONGO_URI)
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=[
+            UserModel,
+            SweetModel,
+            CategoryModel,
+            SaleModel,
+            DailySalesModel,
+        ],
+    )
+    for model in (UserModel, SweetModel, CategoryModel, SaleModel, DailySalesModel):
+        await model.find_all().delete()
+    category_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def register_and_login(client, is_admin=True):
+    """Registers and logs in a test user and returns its bearer token."""
+    user_data = {
+        "username": "TestAdmin" if is_admin else "TestUser",
+        "email": "admin@example.com" if is_admin else "user@example.com",
+        "password": "Password123",
+        "is_admin": is_admin,
+    }
+    await client.post("/api/auth/register", json=user_data)
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": user_data["email"], "password": user_data["password"]},
+    )
+    return f"Bearer {response.json()['data']['token']}"
+
+
+async def seed_sales(client, token):
+    """Creates two sweets in two categories, then sells and restocks them."""
+    headers = {"Authorization": token}
+    sweet_ids = {}
+    for name, category, price in [("Peda", "Milk", 10), ("Chikki", "Nut", 4)]:
+        await client.post(
+            "/api/sweets/categories", json={"name": category}, headers=headers
+        )
+        response = await client.post(
+            "/api/sweets",
+            json={"name": name, "category": category, "price": price, "quantity": 50},
+            headers=headers,
+        )
+        sweet_ids[name] = response.json()["data"]["_id"]
+
+    for name, quantity in [("Peda", 2), ("Peda", 3), ("Chikki", 5)]:
+        await client.post(
+            f"/api/sweets/{sweet_ids[name]}/purchase",
+            json={"quantity": quantity},
+            headers=headers,
+        )
+    await client.post(
+        f"/api/sweets/{sweet_ids['Peda']}/restock",
+        json={"quantity": 7},
+        headers=headers,
+    )
+    return sweet_ids
+
+
+@pytest.mark.asyncio
+async def test_purchases_and_restocks_are_ledgered_and_rolled_up(client):
+    token = await register_and_login(client)
+    sweet_ids = await seed_sales(client, token)
+
+    assert await SaleModel.find(SaleModel.kind == "purchase").count() == 3
+    assert await SaleModel.find(SaleModel.kind == "restock").count() == 1
+    # One rollup per scope and day, however many sales there were.
+    assert await DailySalesModel.count() == 5
+
+    response = await client.get(
+        "/api/reports/sales/daily?days=7", headers={"Authorization": token}
+    )
+    assert response.status_code == 200
+    rows = response.json()["data"]
+    assert [row["day"] for row in rows] == day_range(7)
+    assert rows[-1] == {
+        "day": day_range(1)[0],
+        "orders": 3,
+        "units_sold": 10,
+        "revenue": 70,
+        "units_restocked": 7,
+    }
+    assert all(row["orders"] == 0 for row in rows[:-1])
+
+    sweet_report = await client.get(
+        f"/api/reports/sales/daily?days=1&sweet_id={sweet_ids['Peda']}",
+        headers={"Authorization": token},
+    )
+    assert sweet_report.json()["data"][0]["revenue"] == 50
+
+
+@pytest.mark.asyncio
+async def test_top_sellers_report(client):
+    token = await register_and_login(client)
+    await seed_sales(client, token)
+
+    by_sweet = await client.get(
+        "/api/reports/sales/top?by=sweet", headers={"Authorization": token}
+    )
+    by_category = await client.get(
+        "/api/reports/sales/top?by=category&limit=1",
+        headers={"Authorization": token},
+    )
+
+    assert [(row["name"], row["revenue"]) for row in by_sweet.json()["data"]] == [
+        ("Peda", 50),
+        ("Chikki", 20),
+    ]
+    assert [(row["name"], row["units_sold"]) for row in by_category.json()["data"]] == [
+        ("Milk", 5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reports_require_admin(client):
+    token = await register_and_login(client, is_admin=False)
+
+    response = await client.get(
+        "/api/reports/sales/daily", headers={"Authorization": token}
+    )
+
+    assert response.status_code in [401, 403]
@@ -0,0 +1,231 @@
+import asyncio
+import datetime
+import pytest
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.models import UserModel, SweetModel, CategoryModel, ReservationModel
+from src.models import SaleModel, DailySalesModel
+from src.utils.env import env_settings
+from src.utils.category_cache import category_cache
+from src.utils.clock import utcnow
+from src.utils import reservations
+from bson import ObjectId
+from src.utils.reservations import release_expired_reservations
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function."""
+    client = AsyncIOMotorClient(env_settings.MONGO_URI)
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=[
+            UserModel,
+            SweetModel,
+            CategoryModel,
+            ReservationModel,
+            SaleModel,
+            DailySalesModel,
+        ],
+    )
+    await UserModel.find_all().delete()
+    await SweetModel.find_all().delete()
+    await CategoryModel.find_all().delete()
+    await ReservationModel.find_all().delete()
+    category_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def register_and_login(client, is_admin=True):
+    """Registers and logs in a test user and returns its bearer token."""
+    user_data = {
+        "username": "TestAdmin" if is_admin else "TestUser",
+        "email": "admin@example.com" if is_admin else "user@example.com",
+        "password": "Password123",
+        "is_admin": is_admin,
+    }
+    await client.post("/api/auth/register", json=user_data)
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": user_data["email"], "password": user_data["password"]},
+    )
+    return f"Bearer {response.json()['data']['token']}"
+
+
+async def create_sweet(client, token, quantity):
+    """Creates a category and a sweet with the given stock and returns its ID."""
+    await client.post(
+        "/api/sweets/categories",
+        json={"name": "Checkout"},
+        headers={"Authorization": token},
+    )
+    response = await client.post(
+        "/api/sweets",
+        json={
+            "name": "Laddu",
+            "category": "Checkout",
+            "price": 10,
+            "quantity": quantity,
+        },
+        headers={"Authorization": token},
+    )
+    return response.json()["data"]["_id"]
+
+
+async def reserve(client, token, sweet_id, quantity, minutes=15):
+    return await client.post(
+        "/api/reservations",
+        json={"sweet_id": sweet_id, "quantity": quantity, "minutes": minutes},
+        headers={"Authorization": token},
+    )
+
+
+@pytest.mark.asyncio
+async def test_reservation_holds_and_confirms_stock(client):
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token, 5)
+
+    response = await reserve(client, token, sweet_id, 3)
+    assert response.status_code == 201
+    reservation = response.json()["data"]
+    assert reservation["available"] == 2
+
+    # Held stock cannot be bought or reserved by anyone else.
+    assert (await reserve(client, token, sweet_id, 3)).status_code == 400
+    purchase = await client.post(
+        f"/api/sweets/{sweet_id}/purchase",
+        json={"quantity": 3},
+        headers={"Authorization": token},
+    )
+    assert purchase.status_code == 400
+
+    other_token = await register_and_login(client, is_admin=False)
+    stolen = await client.post(
+        f"/api/reservations/{reservation['id']}/confirm",
+        headers={"Authorization": other_token},
+    )
+    assert stolen.status_code == 404
+
+    confirmed = await client.post(
+        f"/api/reservations/{reservation['id']}/confirm",
+        headers={"Authorization": token},
+    )
+    assert confirmed.status_code == 200
+    assert confirmed.json()["data"]["quantity"] == 2
+    assert confirmed.json()["data"]["reserved"] == 0
+
+    again = await client.post(
+        f"/api/reservations/{reservation['id']}/confirm",
+        headers={"Authorization": token},
+    )
+    assert again.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_cancel_returns_stock(client):
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token, 5)
+    reservation = (await reserve(client, token, sweet_id, 4)).json()["data"]
+
+    response = await client.delete(
+        f"/api/reservations/{reservation['id']}", headers={"Authorization": token}
+    )
+
+    assert response.status_code == 200
+    sweet = await SweetModel.get(sweet_id)
+    assert (sweet.quantity, sweet.reserved) == (5, 0)
+    assert (
+        await reserve(client, token, "000000000000000000000000", 1)
+    ).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_expired_reservations_are_released_in_bulk(client):
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token, 10)
+    reservations = [
+        (await reserve(client, token, sweet_id, 2, minutes=1)).json()["data"]
+        for _ in range(3)
+    ]
+    assert (await SweetModel.get(sweet_id)).quantity == 4
+
+    assert await release_expired_reservations() == 0
+    released = await release_expired_reservations(
+        utcnow() + datetime.timedelta(minutes=2)
+    )
+
+    assert released == 3
+    sweet = await SweetModel.get(sweet_id)
+    assert (sweet.quantity, sweet.reserved) == (10, 0)
+    assert await ReservationModel.count() == 0
+    late = await client.post(
+        f"/api/reservations/{reservations[0]['id']}/confirm",
+        headers={"Authorization": token},
+    )
+    assert late.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_crashed_sweep_is_taken_over_without_double_return(client):
+    """
+    Test that reservations left claimed by a sweep that died are taken over
+    once the claim is stale: stock the sweep already returned is not returned
+    twice, and stock it never returned is not lost.
+    """
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token, 10)
+    for _ in range(2):
+        await reserve(client, token, sweet_id, 3, minutes=1)
+    await reserve(client, token, sweet_id, 2, minutes=1)
+    await reserve(client, token, sweet_id, 1, minutes=60)
+
+    # One crashed sweep returned the stock of its reservations but never deleted
+    # them, another died right after claiming.
+    claimed_at = utcnow() - datetime.timedelta(
+        seconds=reservations.RESERVATION_CLAIM_TIMEOUT_SECONDS + 1
+    )
+    collection = ReservationModel.get_pymongo_collection()
+    await collection.update_many(
+        {"quantity": 3}, {"$set": {"claim": "crashed", "claimed_at": claimed_at}}
+    )
+    await collection.update_many(
+        {"quantity": 2}, {"$set": {"claim": "lost", "claimed_at": claimed_at}}
+    )
+    await SweetModel.get_pymongo_collection().update_one(
+        {"_id": ObjectId(sweet_id)},
+        {
+            "$inc": {"quantity": 6, "reserved": -6},
+            "$push": {"released_claims": "crashed"},
+        },
+    )
+
+    assert await release_expired_reservations() == 3
+
+    sweet = await SweetModel.get(sweet_id)
+    assert (sweet.quantity, sweet.reserved) == (9, 1)
+    assert await ReservationModel.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_never_oversell(client):
+    token = await register_and_login(client)
+    sweet_id = await create_sweet(client, token, 20)
+
+    responses = await asyncio.gather(
+        *[reserve(client, token, sweet_id, 1) for _ in range(100)]
+    )
+
+    assert [res.status_code for res in responses].count(201) == 20
+    sweet = await SweetModel.get(sweet_id)
+    assert (sweet.quantity, sweet.reserved) == (0, 20)
+    assert await ReservationModel.count() == 20
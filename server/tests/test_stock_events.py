@@ -0,0 +1,231 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from httpx import AsyncClient, ASGITransport
+from src.main import app
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+from src.models import UserModel, SweetModel, CategoryModel
+from src.models import SaleModel, DailySalesModel
+from src.routes.sweets import stream_stock_events
+from src.utils import stock_events
+from src.utils.env import env_settings
+from src.utils.category_cache import category_cache
+from src.utils.stock_events import StockBroadcaster, stock_broadcaster
+import pytest_asyncio
+import json
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clean_db():
+    """Clean database before each test function."""
+    client = AsyncIOMotorClient(env_settings.MONGO_URI)
+    await init_beanie(
+        database=client.sweet_shop,
+        document_models=[
+            UserModel,
+            SweetModel,
+            CategoryModel,
+            SaleModel,
+            DailySalesModel,
+        ],
+    )
+    await UserModel.find_all().delete()
+    await SweetModel.find_all().delete()
+    await CategoryModel.find_all().delete()
+    category_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Returns an HTTPX AsyncClient instance for making async API calls during tests."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def register_and_login(client):
+    """Registers and logs in an admin user and returns its bearer token."""
+    user_data = {
+        "username": "TestAdmin",
+        "email": "admin@example.com",
+        "password": "Password123",
+        "is_admin": True,
+    }
+    await client.post("/api/auth/register", json=user_data)
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": user_data["email"], "password": user_data["password"]},
+    )
+    return f"Bearer {response.json()['data']['token']}"
+
+
+@pytest.mark.asyncio
+async def test_writes_push_stock_events(client):
+    token = await register_and_login(client)
+    headers = {"Authorization": token}
+    await client.post("/api/sweets/categories", json={"name": "Live"}, headers=headers)
+
+    subscription = stock_broadcaster.subscribe()
+    try:
+        create_res = await client.post(
+            "/api/sweets",
+            json={"name": "Jalebi", "category": "Live", "price": 12, "quantity": 10},
+            headers=headers,
+        )
+        sweet_id = create_res.json()["data"]["_id"]
+        assert await subscription.next_batch(timeout=1) == [
+            {"type": "upsert", "id": sweet_id, "quantity": 10, "price": 12}
+        ]
+
+        await client.post(
+            f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers
+        )
+        await client.post(
+            f"/api/sweets/{sweet_id}/restock", json={"quantity": 1}, headers=headers
+        )
+        await client.put(
+            f"/api/sweets/{sweet_id}",
+            json={"name": "Jalebi", "price": 15, "quantity": None},
+            headers=headers,
+        )
+        # Changes to one sweet are coalesced into its latest state.
+        assert await subscription.next_batch(timeout=1) == [
+            {"type": "upsert", "id": sweet_id, "quantity": 8, "price": 15}
+        ]
+
+        await client.delete(f"/api/sweets/{sweet_id}", headers=headers)
+        assert await subscription.next_batch(timeout=1) == [
+            {"type": "delete", "id": sweet_id}
+        ]
+
+        # A rejected purchase changes nothing and pushes nothing.
+        await client.post(
+            f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers
+        )
+        assert await subscription.next_batch(timeout=0.1) == []
+    finally:
+        stock_broadcaster.unsubscribe(subscription)
+
+
+@pytest.mark.asyncio
+async def test_event_stream_frames_and_slow_consumers():
+    broadcaster = StockBroadcaster(max_pending=2)
+    subscription = broadcaster.subscribe()
+    stream = stream_stock_events(subscription, heartbeat=0.01)
+
+    assert await anext(stream) == b": keep-alive\n\n"
+
+    broadcaster.dispatch({"type": "upsert", "id": "a", "quantity": 1, "price": 2})
+    frame = await anext(stream)
+    assert frame.startswith(b"event: stock\ndata: ")
+    assert json.loads(frame.split(b"data: ")[1])["id"] == "a"
+
+    # A third distinct sweet overflows the subscriber, which is told to resync.
+    for sweet_id in ("a", "b", "c"):
+        broadcaster.dispatch({"type": "delete", "id": sweet_id})
+    assert broadcaster.stats() == {
+        "subscribers": 0,
+        "published": 4,
+        "dropped": 1,
+        "resyncs": 0,
+    }
+    assert await anext(stream) == b"event: resync\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+
+
+@pytest.mark.asyncio
+async def test_event_stream_ends_when_client_disconnects():
+    subscription = stock_broadcaster.subscribe()
+    subscribers = stock_broadcaster.stats()["subscribers"]
+
+    class DisconnectingRequest:
+        """Reports the client as connected once, then disconnected."""
+
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 1
+
+    stream = stream_stock_events(
+        subscription, heartbeat=0.01, request=DisconnectingRequest()
+    )
+
+    assert await anext(stream) == b": keep-alive\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert stock_broadcaster.stats()["subscribers"] == subscribers - 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_tells_subscribers_to_resync(client):
+    token = await register_and_login(client)
+    headers = {"Authorization": token}
+    await client.post("/api/sweets/categories", json={"name": "Live"}, headers=headers)
+    subscription = stock_broadcaster.subscribe()
+    resyncs = stock_broadcaster.stats()["resyncs"]
+
+    row = {"name": "Imported", "category": "Live", "price": 3, "quantity": 7}
+    response = await client.post(
+        "/api/sweets/bulk",
+        content=json.dumps(row).encode(),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.json()["data"]["inserted"] == 1
+    assert subscription.overflowed
+    assert stock_broadcaster.stats()["resyncs"] == resyncs + 1
+
+
+class LostResumePointCollection:
+    """Fake collection whose first stream fails once its resume point is lost."""
+
+    def __init__(self):
+        self.resume_points = []
+
+    @asynccontextmanager
+    async def watch(self, pipeline, full_document=None, resume_after=None):
+        self.resume_points.append(resume_after)
+        if len(self.resume_points) == 1:
+            yield FailingStream()
+        else:
+            await asyncio.Event().wait()
+            yield
+
+
+class FailingStream:
+    """Yields one change, then fails as if its resume point fell off the oplog."""
+
+    def __init__(self):
+        self.resume_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.resume_token is not None:
+            raise OperationFailure("resume point no longer in the oplog", code=286)
+        self.resume_token = {"_data": "token"}
+        return {"operationType": "delete", "documentKey": {"_id": "a"}}
+
+
+@pytest.mark.asyncio
+async def test_change_stream_restarts_when_its_resume_point_is_lost(monkeypatch):
+    monkeypatch.setattr(stock_events, "CHANGE_STREAM_RETRY_DELAY", 0)
+    broadcaster = StockBroadcaster(max_pending=10, source="change_stream")
+    subscription = broadcaster.subscribe()
+    collection = LostResumePointCollection()
+
+    watcher = asyncio.create_task(broadcaster.watch(collection))
+    while len(collection.resume_points) < 2:
+        await asyncio.sleep(0.01)
+    watcher.cancel()
+
+    assert collection.resume_points[0] is None
+    assert collection.resume_points[1] is None
+    assert subscription.overflowed
+    assert broadcaster.stats()["resyncs"] == 1
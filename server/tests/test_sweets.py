@@ -4,9 +4,14 @@ from src.main import app
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.models import UserModel, SweetModel, CategoryModel
+from src.models import SaleModel, DailySalesModel
 from src.utils.env import env_settings
+from src.utils.bulk_import import MAX_LINE_LENGTH, iter_lines
+from src.utils.category_cache import category_cache
+from src.utils.expiry import flag_expired_sweets
 import pytest_asyncio
 import datetime
+import json
 
 
 @pytest_asyncio.fixture(scope="function", autouse=True)
@@ -21,11 +26,18 @@ async def clean_db():
     client = AsyncIOMotorClient(env_settings.MONGO_URI)
     await init_beanie(
         database=client.sweet_shop,
-        document_models=[UserModel, SweetModel, CategoryModel],
+        document_models=[
+            UserModel,
+            SweetModel,
+            CategoryModel,
+            SaleModel,
+            DailySalesModel,
+        ],
     )
     await UserModel.find_all().delete()
     await SweetModel.find_all().delete()
     await CategoryModel.find_all().delete()
+    category_cache.clear()
 
 
 @pytest_asyncio.fixture
@@ -204,3 +216,687 @@ async def test_delete_sweet_as_admin(client):
 
     assert delete_res.status_code == 200
     assert "deleted" in delete_res.json()["message"].lower()
+
+
+@pytest.mark.asyncio
+async def test_list_sweets_keyset_pagination(client):
+    token = await register_and_login(client)
+    category_name = await create_category(client, token, "Paged")
+
+    for i in range(5):
+        await client.post(
+            "/api/sweets",
+            json={
+                "name": f"Sweet {i}",
+                "category": category_name,
+                "price": 10,
+                "quantity": 10,
+            },
+            headers={"Authorization": token},
+        )
+
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 2}
+        if after:
+            params["after"] = after
+        response = await client.get(
+            "/api/sweets", params=params, headers={"Authorization": token}
+        )
+        assert response.status_code == 200
+        page = response.json()["data"]
+        assert len(page) <= 2
+        seen.extend(sweet["id"] for sweet in page)
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+
+@pytest.mark.asyncio
+async def test_list_sweets_invalid_cursor(client):
+    token = await register_and_login(client)
+
+    response = await client.get(
+        "/api/sweets?after=not-an-id", headers={"Authorization": token}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_sweets_ndjson_stream(client):
+    token = await register_and_login(client)
+    category_name = await create_category(client, token, "Streamed")
+
+    for name in ["Ladoo", "Barfi", "Peda"]:
+        await client.post(
+            "/api/sweets",
+            json={"name": name, "category": category_name, "price": 5, "quantity": 1},
+            headers={"Authorization": token},
+        )
+
+    response = await client.get(
+        "/api/sweets",
+        headers={"Authorization": token, "Accept": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [row["name"] for row in rows] == ["Ladoo", "Barfi", "Peda"]
+    assert rows[0]["category"]["name"] == "Streamed"
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_by_name_is_ranked(client):
+    token = await register_and_login(client)
+    category_name = await create_category(client, token, "Ranked")
+
+    for name in ["Chocolate Barfi", "Barfi", "Kaju Barfi Deluxe", "Ladoo"]:
+        await client.post(
+            "/api/sweets",
+            json={"name": name, "category": category_name, "price": 5, "quantity": 1},
+            headers={"Authorization": token},
+        )
+
+    response = await client.get(
+        "/api/sweets/search?name=barfi", headers={"Authorization": token}
+    )
+    short_response = await client.get(
+        "/api/sweets/search?name=ar", headers={"Authorization": token}
+    )
+
+    assert response.status_code == 200
+    names = [sweet["name"] for sweet in response.json()["data"]]
+    assert names == ["Barfi", "Chocolate Barfi", "Kaju Barfi Deluxe"]
+    assert len(short_response.json()["data"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_escapes_special_characters(client):
+    token = await register_and_login(client)
+    category_name = await create_category(client, token, "Special")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={
+            "name": "Ladoo (Large)",
+            "category": category_name,
+            "price": 5,
+            "quantity": 1,
+        },
+        headers={"Authorization": token},
+    )
+    await client.post(
+        "/api/sweets",
+        json={
+            "name": "Ladoo Small",
+            "category": category_name,
+            "price": 5,
+            "quantity": 1,
+        },
+        headers={"Authorization": token},
+    )
+
+    exact = await client.get(
+        "/api/sweets/search",
+        params={"name": "(large)"},
+        headers={"Authorization": token},
+    )
+    wildcard = await client.get(
+        "/api/sweets/search",
+        params={"name": "ladoo.*"},
+        headers={"Authorization": token},
+    )
+
+    assert "search_grams" not in create_res.json()["data"]
+    assert [sweet["name"] for sweet in exact.json()["data"]] == ["Ladoo (Large)"]
+    assert wildcard.json()["data"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_after_rename(client):
+    token = await register_and_login(client)
+    category_name = await create_category(client, token, "Renamed")
+
+    create_res = await client.post(
+        "/api/sweets",
+        json={"name": "Peda", "category": category_name, "price": 5, "quantity": 1},
+        headers={"Authorization": token},
+    )
+    sweet_id = create_res.json()["data"]["_id"]
+    await client.put(
+        f"/api/sweets/{sweet_id}",
+        json={"name": "Kesar Peda", "price": 5, "quantity": 1},
+        headers={"Authorization": token},
+    )
+
+    response = await client.get(
+        "/api/sweets/search?name=kesar", headers={"Authorization": token}
+    )
+
+    assert [sweet["id"] for sweet in response.json()["data"]] == [sweet_id]
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_csv(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Imported")
+
+    body = (
+        "name,category,price,quantity,expiry_date\n"
+        "Ladoo,Imported,10,100,2030-01-01\n"
+        "Barfi,Imported,20,50,\n"
+        "Jalebi,Unknown,5,10,\n"
+        "Peda,Imported,not-a-number,10,\n"
+        "Halwa,Imported,15,5,2030-01-01\n"
+    )
+    response = await client.post(
+        "/api/sweets/bulk?chunk_size=2",
+        content=body.encode(),
+        headers={"Authorization": token, "Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 200, response.text
+    report = response.json()["data"]
+    assert report["inserted"] == 3
+    assert report["failed"] == 2
+    assert sorted(error["row"] for error in report["errors"]) == [3, 4]
+
+    search = await client.get(
+        "/api/sweets/search?name=halwa", headers={"Authorization": token}
+    )
+    assert search.json()["data"][0]["category"]["name"] == "Imported"
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_ndjson(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Imported")
+
+    rows = [
+        {"name": "Kaju Katli", "category": "Imported", "price": 50, "quantity": 20},
+        {"name": "Rasgulla", "category": "Imported", "price": 25, "quantity": 40},
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n{broken\n"
+    response = await client.post(
+        "/api/sweets/bulk",
+        content=body.encode(),
+        headers={"Authorization": token, "Content-Type": "application/x-ndjson"},
+    )
+
+    report = response.json()["data"]
+    assert report["inserted"] == 2
+    assert report["errors"][0]["row"] == 3
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_rejects_overlong_lines(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Imported")
+    row = {"name": "Kaju Katli", "category": "Imported", "price": 50, "quantity": 20}
+
+    async def body():
+        yield (json.dumps(row) + "\n").encode()
+        # One line without a break, sent in chunks well past the limit.
+        yield b'{"name": "'
+        for _ in range(4):
+            yield b"x" * MAX_LINE_LENGTH
+        yield b'"}\n'
+        yield json.dumps({**row, "name": "Rasgulla"}).encode()
+
+    response = await client.post(
+        "/api/sweets/bulk",
+        content=body(),
+        headers={"Authorization": token, "Content-Type": "application/x-ndjson"},
+    )
+
+    report = response.json()["data"]
+    assert report["inserted"] == 2
+    assert report["errors"] == [
+        {"row": 2, "error": f"Line longer than {MAX_LINE_LENGTH} characters"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_drops_overlong_lines_as_they_stream():
+    async def chunks():
+        for chunk in [b"ab\nfirst", b" way too long", b" still\nok", b"\nlast"]:
+            yield chunk
+
+    lines = [line async for line in iter_lines(chunks(), max_length=8)]
+
+    assert lines == ["ab", None, "ok", "last"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_requires_admin_and_known_format(client):
+    user_token = await register_and_login(client, is_admin=False)
+    admin_token = await register_and_login(client, is_admin=True)
+
+    forbidden = await client.post(
+        "/api/sweets/bulk",
+        content=b"",
+        headers={"Authorization": user_token, "Content-Type": "text/csv"},
+    )
+    unsupported = await client.post(
+        "/api/sweets/bulk",
+        content=b"{}",
+        headers={"Authorization": admin_token, "Content-Type": "application/json"},
+    )
+
+    assert forbidden.status_code == 403
+    assert unsupported.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_list_sweets_conditional_get(client):
+    token = await register_and_login(client)
+    category_name = await create_category(client, token, "Tagged")
+    response = await client.post(
+        "/api/sweets",
+        json={"name": "Peda", "category": category_name, "price": 10, "quantity": 5},
+        headers={"Authorization": token},
+    )
+    sweet_id = response.json()["data"]["_id"]
+
+    first = await client.get("/api/sweets", headers={"Authorization": token})
+    etag = first.headers["ETag"]
+
+    cached = await client.get(
+        "/api/sweets", headers={"Authorization": token, "If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    # Another page of the same data gets its own tag.
+    paged = await client.get(
+        "/api/sweets?limit=1",
+        headers={"Authorization": token, "If-None-Match": etag},
+    )
+    assert paged.status_code == 200
+    assert paged.headers["ETag"] != etag
+
+    # Any write to a sweet invalidates the tag.
+    await client.post(
+        f"/api/sweets/{sweet_id}/purchase",
+        json={"quantity": 1},
+        headers={"Authorization": token},
+    )
+    changed = await client.get(
+        "/api/sweets", headers={"Authorization": token, "If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["data"][0]["quantity"] == 4
+
+
+@pytest.mark.asyncio
+async def test_categories_conditional_get(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "First")
+
+    first = await client.get("/api/sweets/categories", headers={"Authorization": token})
+    etag = first.headers["ETag"]
+
+    cached = await client.get(
+        "/api/sweets/categories",
+        headers={"Authorization": token, "If-None-Match": f'W/{etag}, "other"'},
+    )
+    assert cached.status_code == 304
+
+    await create_category(client, token, "Second")
+    changed = await client.get(
+        "/api/sweets/categories",
+        headers={"Authorization": token, "If-None-Match": etag},
+    )
+    assert changed.status_code == 200
+    assert len(changed.json()["data"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_with_facets(client):
+    token = await register_and_login(client)
+    for category in ("Faceted", "Other"):
+        await create_category(client, token, category)
+    for name, category, price, quantity in [
+        ("Kalakand", "Faceted", 5, 10),
+        ("Kaju Roll", "Faceted", 12, 0),
+        ("Kachori", "Other", 18, 3),
+        ("Rabri", "Other", 40, 3),
+    ]:
+        await client.post(
+            "/api/sweets",
+            json={
+                "name": name,
+                "category": category,
+                "price": price,
+                "quantity": quantity,
+            },
+            headers={"Authorization": token},
+        )
+
+    response = await client.get(
+        "/api/sweets/search",
+        params={"name": "ka", "facets": "true", "price_bucket": 10},
+        headers={"Authorization": token},
+    )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert {sweet["name"] for sweet in data["results"]} == {
+        "Kalakand",
+        "Kaju Roll",
+        "Kachori",
+    }
+    facets = data["facets"]
+    assert facets["total"] == 3
+    assert facets["in_stock"] == 2
+    assert [(c["name"], c["count"]) for c in facets["categories"]] == [
+        ("Faceted", 2),
+        ("Other", 1),
+    ]
+    assert [(b["min"], b["max"], b["count"]) for b in facets["price_histogram"]] == [
+        (0, 10, 1),
+        (10, 20, 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_facets_page_the_results(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Paged")
+    for i in range(5):
+        await client.post(
+            "/api/sweets",
+            json={"name": f"Peda {i}", "category": "Paged", "price": 10, "quantity": 1},
+            headers={"Authorization": token},
+        )
+
+    response = await client.get(
+        "/api/sweets/search",
+        params={"facets": "true", "skip": 1, "limit": 2},
+        headers={"Authorization": token},
+    )
+
+    data = response.json()["data"]
+    assert [sweet["name"] for sweet in data["results"]] == ["Peda 1", "Peda 2"]
+    assert "search_grams" not in data["results"][0]
+    assert data["facets"]["total"] == 5
+    assert data["facets"]["categories"][0]["count"] == 5
+
+    plain = await client.get(
+        "/api/sweets/search",
+        params={"skip": 3},
+        headers={"Authorization": token},
+    )
+    assert [sweet["name"] for sweet in plain.json()["data"]] == ["Peda 3", "Peda 4"]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_name_matches_before_paging(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Ranked")
+    # Created worst match first, so ID order is the reverse of relevance.
+    for name in ["Sweet Peda Mix", "Kesar Peda", "Peda Roll", "Peda"]:
+        await client.post(
+            "/api/sweets",
+            json={"name": name, "category": "Ranked", "price": 10, "quantity": 1},
+            headers={"Authorization": token},
+        )
+
+    async def page(**params):
+        response = await client.get(
+            "/api/sweets/search",
+            params={"name": "peda", **params},
+            headers={"Authorization": token},
+        )
+        data = response.json()["data"]
+        results = data["results"] if params.get("facets") else data
+        assert all("_relevance_tier" not in sweet for sweet in results)
+        return [sweet["name"] for sweet in results]
+
+    assert await page(limit=2) == ["Peda", "Peda Roll"]
+    assert await page(skip=2, limit=2) == ["Kesar Peda", "Sweet Peda Mix"]
+    assert await page(skip=1, limit=1, fields="id,name") == ["Peda Roll"]
+    assert await page(facets="true", limit=3) == ["Peda", "Peda Roll", "Kesar Peda"]
+
+
+@pytest.mark.asyncio
+async def test_expired_sweets_are_hidden_and_not_sold(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Seasonal")
+    today = datetime.date.today()
+    sweet_ids = {}
+    for name, expiry_date in [
+        ("Ghevar", today - datetime.timedelta(days=1)),
+        ("Gujiya", today + datetime.timedelta(days=3)),
+        ("Modak", today + datetime.timedelta(days=30)),
+    ]:
+        response = await client.post(
+            "/api/sweets",
+            json={
+                "name": name,
+                "category": "Seasonal",
+                "price": 10,
+                "quantity": 5,
+                "expiry_date": expiry_date.isoformat(),
+            },
+            headers={"Authorization": token},
+        )
+        sweet_ids[name] = response.json()["data"]["_id"]
+
+    listed = await client.get("/api/sweets", headers={"Authorization": token})
+    assert {sweet["name"] for sweet in listed.json()["data"]} == {"Gujiya", "Modak"}
+    everything = await client.get(
+        "/api/sweets?include_expired=true", headers={"Authorization": token}
+    )
+    assert len(everything.json()["data"]) == 3
+    found = await client.get(
+        "/api/sweets/search?name=gh", headers={"Authorization": token}
+    )
+    assert found.json()["data"] == []
+
+    purchase = await client.post(
+        f"/api/sweets/{sweet_ids['Ghevar']}/purchase",
+        json={"quantity": 1},
+        headers={"Authorization": token},
+    )
+    assert purchase.status_code == 400
+    assert purchase.json()["detail"] == "Sweet has expired"
+
+    expiring = await client.get(
+        "/api/sweets/expiring?days=7", headers={"Authorization": token}
+    )
+    assert expiring.status_code == 200
+    assert [
+        (sweet["name"], sweet["expiry_date"]) for sweet in expiring.json()["data"]
+    ] == [("Gujiya", (today + datetime.timedelta(days=3)).isoformat())]
+
+
+@pytest.mark.asyncio
+async def test_expiry_sweeper_flags_sweets_in_batches(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Seasonal")
+    for index in range(5):
+        await client.post(
+            "/api/sweets",
+            json={
+                "name": f"Barfi {index}",
+                "category": "Seasonal",
+                "price": 10,
+                "quantity": 5,
+            },
+            headers={"Authorization": token},
+        )
+    # Expire three sweets behind the model's back, as time passing would.
+    past = datetime.datetime.combine(
+        datetime.date.today() - datetime.timedelta(days=1), datetime.time()
+    )
+    collection = SweetModel.get_pymongo_collection()
+    sweets = await collection.find({}, projection={"_id": 1}).to_list(None)
+    await collection.update_many(
+        {"_id": {"$in": [sweet["_id"] for sweet in sweets[:3]]}},
+        {"$set": {"expiry_date": past}},
+    )
+
+    assert await flag_expired_sweets(batch_size=2) == 3
+    assert await flag_expired_sweets(batch_size=2) == 0
+    assert await SweetModel.find(SweetModel.expired == True).count() == 3
+    listed = await client.get("/api/sweets", headers={"Authorization": token})
+    assert len(listed.json()["data"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_sparse_fields(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Sparse")
+    for name, price in [("Halwa", 30), ("Imarti", 15)]:
+        await client.post(
+            "/api/sweets",
+            json={"name": name, "category": "Sparse", "price": price, "quantity": 2},
+            headers={"Authorization": token},
+        )
+
+    listed = await client.get(
+        "/api/sweets?fields=name,price&limit=1", headers={"Authorization": token}
+    )
+    assert listed.json()["data"] == [{"name": "Halwa", "price": 30}]
+    assert listed.headers["X-Next-Cursor"]
+
+    # Ranking still works when the name itself is not returned.
+    searched = await client.get(
+        "/api/sweets/search?name=a&fields=price&facets=true",
+        headers={"Authorization": token},
+    )
+    assert searched.json()["data"]["results"] == [{"price": 30}, {"price": 15}]
+
+    unknown = await client.get(
+        "/api/sweets?fields=name,secret", headers={"Authorization": token}
+    )
+    assert unknown.status_code == 400
+
+
+async def create_sweets(client, token, category, prices):
+    """Creates one sweet per name and price in the given category."""
+    for name, price in prices.items():
+        await client.post(
+            "/api/sweets",
+            json={"name": name, "category": category, "price": price, "quantity": 1},
+            headers={"Authorization": token},
+        )
+
+
+async def prices():
+    """Returns the price of every sweet, keyed by name."""
+    return {sweet.name: sweet.price for sweet in await SweetModel.find().to_list()}
+
+
+@pytest.mark.asyncio
+async def test_bulk_price_update(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Bulk")
+    await create_sweets(
+        client, token, "Bulk", {"Kaju Katli": 40, "Kaju Roll": 3.33, "Rasgulla": 10}
+    )
+
+    dry_run = await client.post(
+        "/api/sweets/bulk/price",
+        json={"filter": {"name": "kaju"}, "percent": 10, "dry_run": True},
+        headers={"Authorization": token},
+    )
+    assert dry_run.json()["data"] == {"matched": 2, "modified": 0, "dry_run": True}
+    assert (await prices())["Kaju Katli"] == 40
+
+    raised = await client.post(
+        "/api/sweets/bulk/price",
+        json={"filter": {"name": "kaju"}, "percent": 10},
+        headers={"Authorization": token},
+    )
+    assert raised.json()["data"]["modified"] == 2
+    assert await prices() == {"Kaju Katli": 44, "Kaju Roll": 3.66, "Rasgulla": 10}
+
+    lowered = await client.post(
+        "/api/sweets/bulk/price",
+        json={"filter": {"max_price": 20}, "amount": -5},
+        headers={"Authorization": token},
+    )
+    assert lowered.json()["data"]["modified"] == 2
+    assert await prices() == {"Kaju Katli": 44, "Kaju Roll": 0, "Rasgulla": 5}
+
+    for body in (
+        {"filter": {}, "percent": 10},
+        {"filter": {"name": "kaju"}},
+        {"filter": {"name": "kaju"}, "percent": 10, "amount": 1},
+    ):
+        response = await client.post(
+            "/api/sweets/bulk/price", json=body, headers={"Authorization": token}
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bulk_price_update_by_category(client):
+    token = await register_and_login(client)
+    for category in ("Repriced", "Untouched"):
+        await create_category(client, token, category)
+    await create_sweets(client, token, "Repriced", {"Peda": 10, "Barfi": 20})
+    await create_sweets(client, token, "Untouched", {"Jalebi": 10})
+
+    response = await client.post(
+        "/api/sweets/bulk/price",
+        json={"filter": {"category": "Repriced"}, "percent": -50},
+        headers={"Authorization": token},
+    )
+
+    assert response.json()["data"]["modified"] == 2
+    assert await prices() == {"Peda": 5, "Barfi": 10, "Jalebi": 10}
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Bulk")
+    await create_sweets(client, token, "Bulk", {"Cheap": 1, "Cheaper": 2, "Dear": 50})
+
+    dry_run = await client.post(
+        "/api/sweets/bulk/delete",
+        json={"filter": {"max_price": 5}, "dry_run": True},
+        headers={"Authorization": token},
+    )
+    assert dry_run.json()["data"]["matched"] == 2
+    assert await SweetModel.count() == 3
+
+    response = await client.post(
+        "/api/sweets/bulk/delete",
+        json={"filter": {"max_price": 5}},
+        headers={"Authorization": token},
+    )
+    assert response.json()["data"] == {"matched": 2, "deleted": 2, "dry_run": False}
+    assert list(await prices()) == ["Dear"]
+
+    empty = await client.post(
+        "/api/sweets/bulk/delete", json={"filter": {}}, headers={"Authorization": token}
+    )
+    assert empty.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_refuses_an_empty_name(client):
+    token = await register_and_login(client)
+    await create_category(client, token, "Bulk")
+    await create_sweets(client, token, "Bulk", {"Cheap": 1, "Dear": 50})
+
+    for name in ("", "   "):
+        response = await client.post(
+            "/api/sweets/bulk/delete",
+            json={"filter": {"name": name}},
+            headers={"Authorization": token},
+        )
+        assert response.status_code == 400
+    assert await SweetModel.count() == 2